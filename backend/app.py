@@ -1,20 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail, Message
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
-from itsdangerous import URLSafeTimedSerializer
+from itsdangerous import URLSafeTimedSerializer, BadData
 import os
 import json
-import sys
+import base64
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
 from dotenv import load_dotenv
-from cities import get_cities
+from sqlalchemy import and_, exists, func, insert, or_, select, tuple_, inspect
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from cities import is_valid_city, suggest_cities, nearby_cities, CITIES_JSON, CITIES_ETAG
+from route_index import route_stops, parse_on_route_cities
+from migrations import run_migrations
+from email_queue import EmailQueue
+from mail_transport import SMTPPool, SendGridTransport, SMTP_MESSAGE_ERRORS
+from events import EventBus, backend_from_url, stream_slots
+from search_cache import SearchCache, route_corridors, backend_from_url as search_cache_backend_from_url
+from journey_planner import JourneyIndex
+from ride_ranking import score_candidates, rank, parse_weights
+from request_metrics import RequestMetrics
+from app_logging import setup_logging, dropped_records
+from serializers import (FastJSONProvider, ride_to_dict, requested_fields, project, RIDE_DETAIL_FIELDS,
+                         CREATED_RIDE_FIELDS, PUBLISHED_RIDE_FIELDS, REQUESTED_RIDE_FIELDS)
 
-# Try to import SendGrid (optional - falls back to Flask-Mail if not available)
+# Try to import SendGrid helpers (optional - falls back to SMTP if not available)
 try:
-    from sendgrid import SendGridAPIClient
     from sendgrid.helpers.mail import Mail as SendGridMail
     SENDGRID_AVAILABLE = True
 except ImportError:
@@ -22,7 +40,17 @@ except ImportError:
 
 load_dotenv()
 
+# Structured JSON logs written by a background thread (see app_logging.py); LOG_LEVEL_<SUBSYSTEM> sets levels
+setup_logging()
+auth_log = logging.getLogger('linklift.auth')
+email_log = logging.getLogger('linklift.email')
+rides_log = logging.getLogger('linklift.rides')
+http_log = logging.getLogger('linklift.http')
+db_log = logging.getLogger('linklift.db')
+events_log = logging.getLogger('linklift.events')
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
@@ -48,7 +76,7 @@ CORS(
     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
     allow_headers=['Content-Type', 'Authorization'],
     supports_credentials=True,
-    expose_headers=['Content-Type'],
+    expose_headers=['Content-Type', 'Retry-After'],
     automatic_options=True
 )
 jwt = JWTManager(app)
@@ -72,10 +100,10 @@ serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
 
 # Log email method being used
 if USE_SENDGRID:
-    print("Email: Using SendGrid API")
+    email_log.info('Email: using SendGrid API', extra={'transport': 'sendgrid'})
 else:
-    print(f"Email: Using SMTP (SendGrid not available: SENDGRID_AVAILABLE={SENDGRID_AVAILABLE}, SENDGRID_API_KEY={'SET' if SENDGRID_API_KEY else 'NOT SET'})")
-sys.stdout.flush()
+    email_log.info('Email: using SMTP', extra={'transport': 'smtp', 'sendgrid_available': SENDGRID_AVAILABLE,
+                                              'sendgrid_api_key_set': bool(SENDGRID_API_KEY)})
 
 # Database Models
 class User(db.Model):
@@ -89,6 +117,8 @@ class User(db.Model):
     email_verified = db.Column(db.Boolean, default=False, nullable=False)
     verification_token = db.Column(db.String(200), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever the user's my-published or my-requests listing changes (see bump_versions)
+    listing_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     # Relationships
     published_rides = db.relationship('Ride', backref='publisher', lazy=True, foreign_keys='Ride.publisher_id')
@@ -104,6 +134,8 @@ class Ride(db.Model):
     on_route_cities = db.Column(db.Text, nullable=True)  # JSON string of cities array
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.Time, nullable=False)
+    # date + time in one column (rides are never rescheduled) so past-ride and cutoff checks are SQL predicates
+    departs_at = db.Column(db.DateTime, nullable=False)
     available_seats = db.Column(db.Integer, nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
     cost_per_person = db.Column(db.Float, nullable=False)
@@ -111,10 +143,72 @@ class Ride(db.Model):
     license_plate = db.Column(db.String(50), nullable=False)
     women_only = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever the ride's details (seats, requests, passengers) change (see bump_versions)
+    version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Set on rides created from a recurring RideTemplate (see materialize_rides)
+    template_id = db.Column(db.Integer, db.ForeignKey('ride_template.id'), nullable=True)
     
     # Relationships
     requests = db.relationship('Request', backref='ride', lazy=True, cascade='all, delete-orphan')
     messages = db.relationship('ChatMessage', backref='ride', lazy=True, cascade='all, delete-orphan')
+    stops = db.relationship('RideStop', backref='ride', lazy=True, cascade='all, delete-orphan', order_by='RideStop.ordinal')
+    
+    # Indexes (existing databases get them from migrations.py)
+    __table_args__ = (
+        # Search: date range/equality plus seats filter, ordered by date/time
+        db.Index('ix_ride_date_time_seats', 'date', 'time', 'available_seats'),
+        # My published rides: publisher_id = ? ORDER BY departs_at DESC
+        db.Index('ix_ride_publisher_departs_at', 'publisher_id', 'departs_at'),
+        # Upcoming rides (journey index), departure cutoffs
+        db.Index('ix_ride_departs_at', 'departs_at'),
+        # A template's rides by date; unique so overlapping materialize_rides() runs can't repeat a day
+        db.Index('ix_ride_template_date', 'template_id', 'date', unique=True),
+    )
+
+class RideStop(db.Model):
+    """One city on a ride's full route with its position (see route_index.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    ride_id = db.Column(db.Integer, db.ForeignKey('ride.id', ondelete='CASCADE'), nullable=False)
+    city = db.Column(db.String(100), nullable=False)
+    ordinal = db.Column(db.Integer, nullable=False)
+    # Copied from the ride (rides are never rescheduled) so search can walk a city's stops in departure order
+    date = db.Column(db.Date, nullable=True)
+    time = db.Column(db.Time, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('ride_id', 'city', name='uq_ride_stop_ride_city'),
+        db.Index('ix_ride_stop_city_ride', 'city', 'ride_id', 'ordinal'),
+        # Search: city = ? keyset-paged by (date, time, ride_id)
+        db.Index('ix_ride_stop_city_date_time', 'city', 'date', 'time', 'ride_id'),
+    )
+
+class RideTemplate(db.Model):
+    """A ride repeated on some weekdays until end_date; materialize_rides() creates its Ride rows"""
+    id = db.Column(db.Integer, primary_key=True)
+    publisher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    pickup_city = db.Column(db.String(100), nullable=False)
+    drop_city = db.Column(db.String(100), nullable=False)
+    pickup_address = db.Column(db.String(200), nullable=False)
+    drop_address = db.Column(db.String(200), nullable=False)
+    on_route_cities = db.Column(db.Text, nullable=True)  # JSON string of cities array
+    time = db.Column(db.Time, nullable=False)
+    weekdays = db.Column(db.Integer, nullable=False)  # bit n set = runs on date.weekday() == n (Monday = 0)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    seats = db.Column(db.Integer, nullable=False)
+    cost_per_person = db.Column(db.Float, nullable=False)
+    car_model = db.Column(db.String(100), nullable=False)
+    license_plate = db.Column(db.String(50), nullable=False)
+    women_only = db.Column(db.Boolean, default=False, nullable=False)
+    # Last date rides have been created through (None = none yet)
+    materialized_until = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # materialize_rides(): templates whose rides don't reach the horizon yet
+        db.Index('ix_ride_template_materialized_until', 'materialized_until'),
+        db.Index('ix_ride_template_publisher', 'publisher_id'),
+    )
 
 class Request(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -128,6 +222,17 @@ class Request(db.Model):
     price_request = db.Column(db.Float, nullable=True)  # Optional price requested by requestor
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Ride details and duplicate/approved-passenger checks: ride_id = ? [AND requestor_id = ? AND status = ?]
+        db.Index('ix_request_ride_requestor_status', 'ride_id', 'requestor_id', 'status'),
+        # My requests: requestor_id = ? ORDER BY created_at DESC
+        db.Index('ix_request_requestor_created', 'requestor_id', 'created_at'),
+        # Pending request counts per ride - only the (few) pending rows are indexed
+        db.Index('ix_request_pending_ride', 'ride_id',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    )
 
 class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -137,13 +242,190 @@ class ChatMessage(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     author = db.relationship('User', backref='messages')
+    
+    __table_args__ = (
+        # Chat pages: ride_id = ? AND id > / < cursor ORDER BY id
+        db.Index('ix_chat_message_ride_id', 'ride_id', 'id'),
+    )
+
+class SavedSearch(db.Model):
+    """A standing search; rides published on its corridor within the date window alert the user"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    pickup_city = db.Column(db.String(100), nullable=False)
+    drop_city = db.Column(db.String(100), nullable=False)
+    date_from = db.Column(db.Date, nullable=False)
+    date_to = db.Column(db.Date, nullable=False)
+    passengers = db.Column(db.Integer, default=1, nullable=False)
+    women_only = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Publishing a ride: (pickup_city, drop_city) IN (corridors of its route) AND date_to >= ride date
+        db.Index('ix_saved_search_corridor_date', 'pickup_city', 'drop_city', 'date_to'),
+        # My saved searches
+        db.Index('ix_saved_search_user', 'user_id'),
+    )
+
+class EmailOutbox(db.Model):
+    """Queued outgoing email, delivered by the workers in email_queue.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Workers poll: status = 'pending' AND next_attempt_at <= now
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+class RideArchive(db.Model):
+    """A past ride moved out of the hot tables by archive_rides.py, with its stops, requests and chat"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Not unique - SQLite can hand a deleted ride's id to a new ride
+    ride_id = db.Column(db.Integer, nullable=False, index=True)
+    publisher_id = db.Column(db.Integer, nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON (see archive_rides.read_archive)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # Initialize database
 with app.app_context():
     db.create_all()
+    run_migrations(db)
+
+# Per-endpoint latency, SQL and response size metrics (served at /api/metrics)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+request_metrics = RequestMetrics(slow_ms=SLOW_REQUEST_MS)
+with app.app_context():
+    request_metrics.init_app(app, db.engine)
+
+http_log.info('CORS allowed origins', extra={'origins': allowed_origins})
+
+# Real-time events (SSE) - EVENTS_BACKEND shares them between gunicorn workers (see events.py)
+event_bus = EventBus(backend_from_url(os.getenv('EVENTS_BACKEND', '')))
+EVENTS_STREAM_SECONDS = int(os.getenv('EVENTS_STREAM_SECONDS', 55))
+EVENTS_HEARTBEAT_SECONDS = 15
+# Each open stream holds a gunicorn thread, so the cap follows --threads ${GUNICORN_THREADS} (Procfile)
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 8))
+EVENTS_MAX_STREAMS = stream_slots(GUNICORN_THREADS, int(os.getenv('EVENTS_MAX_STREAMS')) if os.getenv('EVENTS_MAX_STREAMS') else None)
+EVENTS_RETRY_MS = 3000
+# Past the cap clients wait this long before trying again (Retry-After); a slot frees up when a stream ends
+EVENTS_BUSY_RETRY_SECONDS = 15
+event_stream_slots = threading.BoundedSemaphore(EVENTS_MAX_STREAMS)
+if not EVENTS_MAX_STREAMS:
+    events_log.warning('Event streams disabled: GUNICORN_THREADS leaves no thread for them', extra={'threads': GUNICORN_THREADS})
+# EventSource can't set headers, so the stream takes a short-lived token instead of the access JWT
+EVENTS_TOKEN_SECONDS = int(os.getenv('EVENTS_TOKEN_SECONDS', 300))
+
+# Search result cache - SEARCH_CACHE_BACKEND shares it between gunicorn workers (see search_cache.py)
+search_cache = SearchCache(
+    search_cache_backend_from_url(os.getenv('SEARCH_CACHE_BACKEND', ''), max_bytes=int(os.getenv('SEARCH_CACHE_MAX_MB', 16)) * 1024 * 1024),
+    ttl_seconds=int(os.getenv('SEARCH_CACHE_TTL', 30))
+)
+
+# Multi-leg journey planner (see journey_planner.py). Each worker holds its own in-memory index: its own
+# writes update it immediately, rides published elsewhere are picked up by id on every plan, chosen
+# rides are re-checked against the database, and it is rebuilt every JOURNEY_INDEX_REFRESH_SECONDS.
+journey_index = JourneyIndex(
+    minutes_per_stop=int(os.getenv('JOURNEY_MINUTES_PER_STOP', 60)),
+    min_connection_minutes=int(os.getenv('JOURNEY_MIN_CONNECTION_MINUTES', 30)),
+    max_wait_minutes=int(os.getenv('JOURNEY_MAX_WAIT_MINUTES', 12 * 60)),
+    max_journey_hours=int(os.getenv('JOURNEY_MAX_HOURS', 48))
+)
+JOURNEY_INDEX_REFRESH_SECONDS = int(os.getenv('JOURNEY_INDEX_REFRESH_SECONDS', 600))
+journey_sync_lock = threading.Lock()
+
+def journey_entry(ride_id, publisher_id, pickup_city, on_route_cities, drop_city, departs_at, seats, women_only, cost):
+    """A ride as JourneyIndex.add()/rebuild() take it"""
+    cities = [city for city, _ in route_stops(pickup_city, parse_on_route_cities(on_route_cities), drop_city)]
+    return ride_id, publisher_id, cities, departs_at, seats, women_only, cost
 
-# Debug: Print allowed origins on startup
-print(f"CORS Allowed Origins: {allowed_origins}")
+JOURNEY_COLUMNS = (Ride.id, Ride.publisher_id, Ride.pickup_city, Ride.on_route_cities, Ride.drop_city,
+                   Ride.departs_at, Ride.available_seats, Ride.women_only, Ride.cost_per_person)
+
+def sync_journey_index():
+    """Rebuild the journey index when it is missing or old, otherwise add rides published since (by any worker)"""
+    # Only the very first build makes other requests wait; otherwise they plan on the current index
+    if not journey_sync_lock.acquire(blocking=journey_index.built_at is None):
+        return
+    try:
+        now = datetime.now()
+        built_at = journey_index.built_at
+        if built_at is None or built_at.date() != now.date() or (now - built_at).total_seconds() > JOURNEY_INDEX_REFRESH_SECONDS:
+            # Catch-ups start after the newest ride, departed or not, so they never rescan the history
+            max_ride_id = db.session.query(func.max(Ride.id)).scalar() or 0
+            rows = db.session.query(*JOURNEY_COLUMNS).filter(Ride.departs_at >= now)
+            journey_index.rebuild((journey_entry(*row) for row in rows), now, max_ride_id=max_ride_id)
+            rides_log.info('Journey index rebuilt', extra={'rides': len(journey_index)})
+        else:
+            for row in db.session.query(*JOURNEY_COLUMNS).filter(Ride.id > journey_index.max_ride_id, Ride.departs_at >= now):
+                journey_index.add(*journey_entry(*row))
+    finally:
+        journey_sync_lock.release()
+
+def invalidate_ride_searches(ride):
+    """Drop cached search pages this ride can appear in and update the journey index.
+
+    Call after a ride is created/cancelled or its seats change (after commit).
+    """
+    on_route_list = parse_on_route_cities(ride.on_route_cities)
+    # radiusKm searches from cities near the route can show this ride too
+    search_cache.invalidate_route((city for city, _ in route_stops(ride.pickup_city, on_route_list, ride.drop_city)),
+                                  nearby=lambda city: nearby_cities(city, SEARCH_MAX_RADIUS_KM))
+    if journey_index.built_at is None:
+        return
+    if inspect(ride).was_deleted:
+        journey_index.remove(ride.id)
+    else:
+        journey_index.add(*journey_entry(
+            ride.id, ride.publisher_id, ride.pickup_city, ride.on_route_cities, ride.drop_city,
+            ride.departs_at, ride.available_seats, ride.women_only, ride.cost_per_person
+        ))
+
+def ride_member_ids(ride_id, publisher_id):
+    """Publisher plus approved passengers of a ride"""
+    approved = db.session.query(Request.requestor_id).filter_by(ride_id=ride_id, status='approved')
+    return {publisher_id} | {requestor_id for (requestor_id,) in approved}
+
+# Conditional GETs - my-published, my-requests and ride details carry an ETag derived from a
+# version counter that every write bumps in its own transaction, so checking whether the
+# client's copy is still current costs one primary key lookup instead of the full query
+def bump_versions(user_ids=(), ride_id=None):
+    """Mark these users' listings and this ride's details as changed (call before commit)"""
+    user_ids = set(user_ids)
+    if user_ids:
+        User.query.filter(User.id.in_(user_ids)).update(
+            {User.listing_version: User.listing_version + 1}, synchronize_session=False
+        )
+    if ride_id is not None:
+        Ride.query.filter(Ride.id == ride_id).update({Ride.version: Ride.version + 1}, synchronize_session=False)
+
+def version_etag(*parts):
+    """Opaque ETag for a response identified by parts (endpoint, row id, version row, query string)"""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+def revalidate(response, etag):
+    """Tag a per-user response so browsers revalidate it with If-None-Match on every use"""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified(etag):
+    """An empty 304 if the client's copy already has this ETag, otherwise None"""
+    if etag not in request.if_none_match:
+        return None
+    return revalidate(app.response_class(status=304), etag)
 
 # After request handler to ensure CORS headers are always added
 # This runs AFTER Flask-CORS, so we override/ensure headers are set
@@ -165,7 +447,7 @@ def after_request(response):
                 response.headers['Access-Control-Max-Age'] = '3600'
     except Exception as e:
         # Don't let CORS handler crash the app
-        print(f"Error in after_request CORS handler: {e}")
+        http_log.exception('Error in after_request CORS handler')
     
     return response
 
@@ -175,13 +457,134 @@ def extract_email_domain(email):
         return ''
     return email.split('@')[1].lower()
 
+# Email delivery - called by the email queue workers with a batch of EmailOutbox rows
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', 2))
+
+# Pooled, reused connections (see mail_transport.py) - one per email worker
+smtp_pool = SMTPPool(
+    host=app.config['MAIL_SERVER'],
+    port=app.config['MAIL_PORT'],
+    username=app.config['MAIL_USERNAME'],
+    password=app.config['MAIL_PASSWORD'],
+    use_tls=app.config['MAIL_USE_TLS'],
+    timeout=app.config['MAIL_TIMEOUT'],
+    size=max(EMAIL_WORKERS, 1),
+    idle_timeout=int(os.getenv('MAIL_IDLE_TIMEOUT', 60))
+)
+sendgrid_transport = SendGridTransport(SENDGRID_API_KEY, timeout=app.config['MAIL_TIMEOUT']) if USE_SENDGRID else None
+
+def deliver_emails_sendgrid(emails, errors):
+    """Send each email through the shared SendGrid client; failures are recorded in errors"""
+    from_email = os.getenv('SENDGRID_FROM_EMAIL', os.getenv('MAIL_DEFAULT_SENDER', 'noreply@linklift.com'))
+    if not from_email:
+        email_log.error('SENDGRID_FROM_EMAIL is not set')
+        for email in emails:
+            errors[email.id] = 'SENDGRID_FROM_EMAIL is not set'
+        return
+    
+    for email in emails:
+        try:
+            message = SendGridMail(
+                from_email=from_email,
+                to_emails=email.to_email,
+                subject=email.subject,
+                html_content=email.html
+            )
+            status_code, body = sendgrid_transport.send(message.get())
+            
+            # SendGrid returns 202 for accepted emails
+            if status_code in [200, 202]:
+                email_log.info('Email accepted by SendGrid', extra={'to': email.to_email, 'status': status_code})
+            else:
+                email_log.error('SendGrid returned non-success status', extra={'to': email.to_email, 'status': status_code})
+                email_log.debug('SendGrid response', extra={'status': status_code, 'body': body})
+                errors[email.id] = f'SendGrid status {status_code}'
+        except Exception as sg_error:
+            email_log.error('SendGrid failed to send email', extra={'to': email.to_email, 'error_type': type(sg_error).__name__,
+                                                                    'error': str(sg_error)})
+            errors[email.id] = f'{type(sg_error).__name__}: {sg_error}'
+
+def deliver_emails_smtp(emails, errors):
+    """Send the batch over a pooled SMTP connection; failures are recorded in errors"""
+    if not smtp_pool.username or not smtp_pool.password:
+        email_log.error('MAIL_USERNAME or MAIL_PASSWORD not set. Email will not be sent.')
+        for email in emails:
+            errors[email.id] = 'MAIL_USERNAME or MAIL_PASSWORD not set'
+        return
+    
+    remaining = list(emails)
+    try:
+        with smtp_pool.session() as session:
+            while remaining:
+                email = remaining[0]
+                msg = Message(subject=email.subject, recipients=[email.to_email], html=email.html)
+                try:
+                    session.send(msg.sender, list(msg.send_to), msg.as_bytes())
+                    email_log.info('Email sent via SMTP', extra={'to': email.to_email})
+                except SMTP_MESSAGE_ERRORS as smtp_error:
+                    # Rejected message - the connection is still usable
+                    email_log.error('SMTP rejected email', extra={'to': email.to_email, 'error': str(smtp_error)})
+                    errors[email.id] = f'{type(smtp_error).__name__}: {smtp_error}'
+                remaining.pop(0)
+    except Exception as smtp_error:
+        # Connection-level failure - everything not yet sent is retried later
+        fields = {'error_type': type(smtp_error).__name__, 'error': str(smtp_error), 'host': smtp_pool.host,
+                  'port': smtp_pool.port, 'unsent': len(remaining)}
+        error_str = str(smtp_error).lower()
+        if 'authentication' in error_str or '535' in error_str:
+            email_log.error('SMTP authentication failed. Check MAIL_USERNAME and MAIL_PASSWORD.', extra=fields)
+        elif 'connection' in error_str or 'timed out' in error_str or 'unreachable' in error_str:
+            email_log.error('SMTP connection failed. Railway may block SMTP. Use SendGrid API instead.', extra=fields)
+        else:
+            email_log.error('SMTP error', extra=fields)
+        for email in remaining:
+            errors[email.id] = f'{type(smtp_error).__name__}: {smtp_error}'
+
+def deliver_emails(emails):
+    """Deliver a batch of queued emails - SendGrid API if available, otherwise SMTP"""
+    start = time.perf_counter()
+    errors = {}
+    if USE_SENDGRID:
+        deliver_emails_sendgrid(emails, errors)
+        if errors:
+            # Fall back to SMTP for the ones SendGrid did not accept
+            email_log.warning('Falling back to SMTP', extra={'emails': len(errors)})
+            failed = [email for email in emails if email.id in errors]
+            errors = {}
+            deliver_emails_smtp(failed, errors)
+    else:
+        deliver_emails_smtp(emails, errors)
+    
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    email_log.info('Email batch delivered', extra={'sent': len(emails) - len(errors), 'emails': len(emails),
+                                                   'ms': round(elapsed_ms), 'ms_per_email': round(elapsed_ms / len(emails))})
+    return errors
+
+def get_mail_metrics():
+    """Per-transport send latency and connection counters"""
+    metrics = {'smtp': smtp_pool.metrics.snapshot()}
+    if sendgrid_transport:
+        metrics['sendgrid'] = sendgrid_transport.metrics.snapshot()
+    return metrics
+
+email_queue = EmailQueue(
+    app, db, EmailOutbox, deliver_emails,
+    workers=EMAIL_WORKERS,
+    batch_size=int(os.getenv('EMAIL_BATCH_SIZE', 20)),
+    max_attempts=int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+)
+
+@app.before_request
+def start_email_workers():
+    # Started lazily so scripts importing app (reset_database.py, migrate.py) don't spawn workers
+    email_queue.start()
+
 # Helper function to send verification email
 def send_verification_email(user):
-    """Send verification email to user - uses SendGrid API if available, otherwise SMTP"""
+    """Queue verification email for user - delivered in the background by the email workers"""
     try:
         token = serializer.dumps(user.email, salt='email-verification')
         user.verification_token = token
-        db.session.commit()
         
         frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
         verification_url = f"{frontend_url}/verify-email?token={token}"
@@ -206,133 +609,12 @@ def send_verification_email(user):
         </div>
         """
         
-        # Try SendGrid first (works on Railway)
-        if USE_SENDGRID:
-            try:
-                from_email = os.getenv('SENDGRID_FROM_EMAIL', os.getenv('MAIL_DEFAULT_SENDER', 'noreply@linklift.com'))
-                
-                # Validate configuration
-                if not from_email:
-                    print("ERROR: SENDGRID_FROM_EMAIL is not set")
-                    sys.stdout.flush()
-                    return False
-                
-                print(f"Using SendGrid to send verification email to {user.email}")
-                print(f"From email: {from_email}")
-                print(f"API Key present: {bool(SENDGRID_API_KEY)}")
-                print(f"API Key length: {len(SENDGRID_API_KEY) if SENDGRID_API_KEY else 0}")
-                sys.stdout.flush()
-                
-                message = SendGridMail(
-                    from_email=from_email,
-                    to_emails=user.email,
-                    subject='Verify Your LinkLift Account',
-                    html_content=email_html
-                )
-                
-                sg = SendGridAPIClient(SENDGRID_API_KEY)
-                response = sg.send(message)
-                
-                # Check response status code
-                status_code = response.status_code
-                print(f"SendGrid Response Status Code: {status_code}")
-                print(f"SendGrid Response Headers: {dict(response.headers) if hasattr(response, 'headers') else 'N/A'}")
-                print(f"SendGrid Response Body: {response.body if hasattr(response, 'body') else 'N/A'}")
-                sys.stdout.flush()
-                
-                # SendGrid returns 202 for accepted emails
-                if status_code in [200, 202]:
-                    print(f"SUCCESS: Verification email accepted by SendGrid to {user.email}, Status: {status_code}")
-                    sys.stdout.flush()
-                    return True
-                else:
-                    print(f"ERROR: SendGrid returned non-success status {status_code}")
-                    print(f"Response body: {response.body if hasattr(response, 'body') else 'N/A'}")
-                    sys.stdout.flush()
-                    return False
-                    
-            except Exception as sg_error:
-                print(f"SendGrid EXCEPTION: Failed to send email to {user.email}")
-                print(f"Error type: {type(sg_error).__name__}")
-                print(f"Error message: {str(sg_error)}")
-                
-                # Try to get more details from SendGrid exceptions
-                if hasattr(sg_error, 'body'):
-                    print(f"SendGrid error body: {sg_error.body}")
-                if hasattr(sg_error, 'status_code'):
-                    print(f"SendGrid error status: {sg_error.status_code}")
-                if hasattr(sg_error, 'headers'):
-                    print(f"SendGrid error headers: {sg_error.headers}")
-                
-                sys.stdout.flush()
-                import traceback
-                traceback.print_exc()
-                sys.stdout.flush()
-                # Fall through to SMTP if SendGrid fails
-        
-        # Fallback to SMTP (may not work on Railway)
-        print(f"Falling back to SMTP for {user.email}")
-        sys.stdout.flush()
-        
-        mail_username = os.getenv('MAIL_USERNAME')
-        mail_password = os.getenv('MAIL_PASSWORD')
-        mail_server = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-        mail_port = int(os.getenv('MAIL_PORT', 587))
-        
-        if not mail_username or not mail_password:
-            print("ERROR: MAIL_USERNAME or MAIL_PASSWORD not set. Email will not be sent.")
-            sys.stdout.flush()
-            return False
-        
-        msg = Message(
-            subject='Verify Your LinkLift Account',
-            recipients=[user.email],
-            html=email_html
-        )
-        
-        print(f"Attempting to send email to {user.email} via {mail_server}:{mail_port}")
-        sys.stdout.flush()
-        
-        # Try to send email with detailed error handling and timeout
-        try:
-            import socket
-            socket.setdefaulttimeout(10)  # 10 seconds
-            
-            mail.send(msg)
-            print(f"SUCCESS: Verification email sent to {user.email} via SMTP")
-            sys.stdout.flush()
-            return True
-        except socket.timeout:
-            print(f"SMTP TIMEOUT: Connection to {mail_server}:{mail_port} timed out after 10 seconds")
-            sys.stdout.flush()
-            return False
-        except Exception as smtp_error:
-            print(f"SMTP ERROR: Failed to send email to {user.email}")
-            print(f"SMTP Error type: {type(smtp_error).__name__}")
-            print(f"SMTP Error message: {str(smtp_error)}")
-            sys.stdout.flush()
-            
-            # Check for common SMTP errors
-            error_str = str(smtp_error).lower()
-            if 'authentication' in error_str or '535' in error_str:
-                print("ERROR: SMTP Authentication failed. Check MAIL_USERNAME and MAIL_PASSWORD.")
-            elif 'connection' in error_str or 'timeout' in error_str or 'unreachable' in error_str:
-                print("ERROR: SMTP Connection failed. Railway may block SMTP. Use SendGrid API instead.")
-            elif '550' in error_str or '553' in error_str:
-                print("ERROR: Email rejected by server. Check recipient email address.")
-            sys.stdout.flush()
-            
-            import traceback
-            traceback.print_exc()
-            sys.stdout.flush()
-            return False
-            
-    except Exception as e:
-        print(f"CRITICAL ERROR in send_verification_email: {str(e)}")
-        print(f"Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
-        sys.stdout.flush()
+        # Saves the token and the outbox row in one commit
+        email_queue.enqueue(user.email, 'Verify Your LinkLift Account', email_html)
+        auth_log.info('Verification email queued', extra={'user_id': user.id, 'to': user.email})
+        return True
+    except Exception:
+        auth_log.exception('Failed to queue verification email', extra={'user_id': user.id})
         try:
             db.session.rollback()
         except:
@@ -379,33 +661,13 @@ def signup():
             db.session.commit()
         except Exception as db_error:
             db.session.rollback()
-            print(f"Database error in signup: {db_error}")
-            import traceback
-            traceback.print_exc()
+            auth_log.exception('Database error in signup')
             return jsonify({'error': f'Database error: {str(db_error)}'}), 500
         
-        # Send verification email in background (don't block the response)
-        import threading
-        
-        def send_email_background():
-            # Create a new app context for the background thread
-            with app.app_context():
-                try:
-                    print(f"BACKGROUND THREAD: Starting email send for {user.email}")
-                    sys.stdout.flush()
-                    result = send_verification_email(user)
-                    print(f"BACKGROUND THREAD: Email send result: {result}")
-                    sys.stdout.flush()
-                except Exception as e:
-                    print(f"BACKGROUND THREAD ERROR: {e}")
-                    sys.stdout.flush()
-                    import traceback
-                    traceback.print_exc()
-                    sys.stdout.flush()
+        auth_log.info('Account created', extra={'user_id': user.id, 'college': user.college})
         
-        # Start email sending in background thread (non-blocking)
-        email_thread = threading.Thread(target=send_email_background, daemon=True)
-        email_thread.start()
+        # Queue verification email - the email workers send it in the background
+        send_verification_email(user)
         
         # Return immediately - don't wait for email to be sent
         return jsonify({
@@ -420,9 +682,7 @@ def signup():
         }), 201
     except Exception as e:
         db.session.rollback()
-        print(f"Signup endpoint error: {e}")
-        import traceback
-        traceback.print_exc()
+        auth_log.exception('Signup endpoint error')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -439,6 +699,7 @@ def login():
     user = User.query.filter_by(email=email).first()
     
     if not user or not check_password_hash(user.password_hash, password):
+        auth_log.info('Login failed', extra={'user_id': user.id if user else None})
         return jsonify({'error': 'Invalid credentials'}), 401
     
     # Check if email is verified
@@ -452,6 +713,7 @@ def login():
     
     # Create access token (identity must be a string)
     access_token = create_access_token(identity=str(user.id))
+    auth_log.debug('Login', extra={'user_id': user.id})
     
     return jsonify({
         'access_token': access_token,
@@ -625,6 +887,26 @@ def health_check():
             'error': str(e)
         }), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (with METRICS_TOKEN set, requires Authorization: Bearer <token>)"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    cache = search_cache.stats()
+    mail = get_mail_metrics()
+    extra = [
+        ('search_cache_hits_total', 'counter', 'Search cache hits', cache['hits']),
+        ('search_cache_misses_total', 'counter', 'Search cache misses', cache['misses']),
+        ('search_cache_entries', 'gauge', 'Search pages cached by this worker', cache.get('entries', 0)),
+        ('search_cache_bytes', 'gauge', 'Bytes of search pages cached by this worker', cache.get('bytes', 0)),
+        ('email_sends_total', 'counter', 'Emails handed to a transport', sum(m['sends'] for m in mail.values())),
+        ('email_send_failures_total', 'counter', 'Emails a transport failed to send', sum(m['failures'] for m in mail.values())),
+        ('journey_index_rides', 'gauge', 'Rides in this worker\'s journey planner index', len(journey_index)),
+        ('log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full', dropped_records()),
+    ]
+    return Response(request_metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
 # Email test endpoint (for debugging email configuration)
 @app.route('/api/test-email', methods=['POST'])
 def test_email():
@@ -647,11 +929,10 @@ def test_email():
                         'suggestion': 'Set SENDGRID_FROM_EMAIL environment variable to your verified sender email'
                     }), 500
                 
-                print(f"TEST EMAIL: Using SendGrid to send to {test_email_address}")
-                print(f"From email: {from_email}")
-                print(f"API Key present: {bool(SENDGRID_API_KEY)}")
-                print(f"API Key starts with: {SENDGRID_API_KEY[:10] + '...' if SENDGRID_API_KEY and len(SENDGRID_API_KEY) > 10 else 'N/A'}")
-                sys.stdout.flush()
+                email_log.info('Test email: sending via SendGrid', extra={'to': test_email_address, 'from': from_email})
+                email_log.debug('Test email: SendGrid key', extra={
+                    'api_key_prefix': SENDGRID_API_KEY[:10] + '...' if SENDGRID_API_KEY and len(SENDGRID_API_KEY) > 10 else 'N/A'
+                })
                 
                 message = SendGridMail(
                     from_email=from_email,
@@ -660,14 +941,10 @@ def test_email():
                     html_content='<p>This is a test email from LinkLift. If you receive this, email configuration is working correctly!</p>'
                 )
                 
-                sg = SendGridAPIClient(SENDGRID_API_KEY)
-                response = sg.send(message)
+                status_code, response_body = sendgrid_transport.send(message.get())
                 
-                status_code = response.status_code
-                print(f"TEST EMAIL SendGrid Response Status: {status_code}")
-                print(f"TEST EMAIL SendGrid Response Headers: {dict(response.headers) if hasattr(response, 'headers') else 'N/A'}")
-                print(f"TEST EMAIL SendGrid Response Body: {response.body if hasattr(response, 'body') else 'N/A'}")
-                sys.stdout.flush()
+                email_log.info('Test email: SendGrid responded', extra={'to': test_email_address, 'status': status_code})
+                email_log.debug('Test email: SendGrid response', extra={'status': status_code, 'body': response_body})
                 
                 # SendGrid returns 202 for accepted emails
                 if status_code in [200, 202]:
@@ -680,13 +957,12 @@ def test_email():
                     return jsonify({
                         'error': f'SendGrid returned non-success status {status_code}',
                         'status_code': status_code,
-                        'response_body': str(response.body) if hasattr(response, 'body') else 'N/A',
+                        'response_body': str(response_body),
                         'suggestion': 'Check SendGrid dashboard for errors. Verify your sender email is verified.'
                     }), 500
                     
             except Exception as sg_error:
-                print(f"TEST EMAIL SendGrid EXCEPTION: {str(sg_error)}")
-                print(f"TEST EMAIL SendGrid ERROR TYPE: {type(sg_error).__name__}")
+                email_log.exception('Test email: SendGrid failed', extra={'to': test_email_address})
                 
                 error_details = {
                     'error': 'Failed to send test email via SendGrid',
@@ -694,33 +970,16 @@ def test_email():
                     'error_message': str(sg_error)
                 }
                 
-                # Try to get more details from SendGrid exceptions
-                if hasattr(sg_error, 'body'):
-                    error_details['sendgrid_error_body'] = str(sg_error.body)
-                    print(f"SendGrid error body: {sg_error.body}")
-                if hasattr(sg_error, 'status_code'):
-                    error_details['sendgrid_error_status'] = sg_error.status_code
-                    print(f"SendGrid error status: {sg_error.status_code}")
-                if hasattr(sg_error, 'headers'):
-                    error_details['sendgrid_error_headers'] = str(sg_error.headers)
-                    print(f"SendGrid error headers: {sg_error.headers}")
-                
                 error_details['suggestion'] = 'Check your SENDGRID_API_KEY and SENDGRID_FROM_EMAIL. Verify the sender email in SendGrid dashboard.'
-                
-                sys.stdout.flush()
-                import traceback
-                traceback.print_exc()
-                sys.stdout.flush()
                 return jsonify(error_details), 500
         
         # Fallback to SMTP (may not work on Railway)
-        print(f"TEST EMAIL: SendGrid not available, falling back to SMTP")
-        sys.stdout.flush()
+        email_log.info('Test email: SendGrid not available, falling back to SMTP', extra={'to': test_email_address})
         
-        mail_username = os.getenv('MAIL_USERNAME')
-        mail_password = os.getenv('MAIL_PASSWORD')
-        mail_server = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-        mail_port = int(os.getenv('MAIL_PORT', 587))
+        mail_username = smtp_pool.username
+        mail_password = smtp_pool.password
+        mail_server = smtp_pool.host
+        mail_port = smtp_pool.port
         
         if not mail_username or not mail_password:
             return jsonify({
@@ -739,16 +998,13 @@ def test_email():
         )
         
         try:
-            import socket
-            socket.setdefaulttimeout(10)  # 10 seconds
-            
-            mail.send(msg)
-            print(f"TEST EMAIL: Successfully sent to {test_email_address} via SMTP")
-            sys.stdout.flush()
+            with smtp_pool.session() as session:
+                session.send(msg.sender, list(msg.send_to), msg.as_bytes())
+            email_log.info('Test email: sent via SMTP', extra={'to': test_email_address})
             return jsonify({'message': f'Test email sent successfully to {test_email_address} via SMTP'}), 200
-        except socket.timeout:
-            print(f"TEST EMAIL TIMEOUT: Connection to {mail_server}:{mail_port} timed out after 10 seconds")
-            sys.stdout.flush()
+        except TimeoutError:
+            email_log.error('Test email: SMTP connection timed out', extra={'host': mail_server, 'port': mail_port,
+                                                                            'timeout': smtp_pool.timeout})
             return jsonify({
                 'error': 'SMTP connection timeout',
                 'error_type': 'TimeoutError',
@@ -756,12 +1012,7 @@ def test_email():
                 'suggestion': 'Use SendGrid API instead. Set SENDGRID_API_KEY and SENDGRID_FROM_EMAIL environment variables.'
             }), 500
         except Exception as e:
-            print(f"TEST EMAIL ERROR: {str(e)}")
-            print(f"TEST EMAIL ERROR TYPE: {type(e).__name__}")
-            sys.stdout.flush()
-            import traceback
-            traceback.print_exc()
-            sys.stdout.flush()
+            email_log.exception('Test email: SMTP failed', extra={'to': test_email_address})
             return jsonify({
                 'error': 'Failed to send test email via SMTP',
                 'error_type': type(e).__name__,
@@ -770,16 +1021,43 @@ def test_email():
             }), 500
             
     except Exception as e:
-        print(f"TEST EMAIL ENDPOINT ERROR: {e}")
-        sys.stdout.flush()
+        email_log.exception('Test email endpoint error')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 # Cities endpoint
 @app.route('/api/cities', methods=['GET'])
 def get_cities_list():
-    return jsonify({'cities': get_cities()}), 200
+    # The catalog is static, so serve the pre-encoded body and let clients revalidate with If-None-Match
+    response = app.response_class(CITIES_JSON, mimetype='application/json')
+    response.set_etag(CITIES_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400  # 1 day
+    return response.make_conditional(request)
+
+@app.route('/api/cities/suggest', methods=['GET'])
+def suggest_cities_list():
+    """Autocomplete cities by prefix (case/diacritic-insensitive, matches each part of hyphenated names)"""
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    response = jsonify({'cities': suggest_cities(query, limit)})
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400  # 1 day - the catalog only changes on deploy
+    return response, 200
 
 # Ride Routes
+def on_route_cities_to_json(on_route_cities):
+    """What Ride/RideTemplate.on_route_cities stores for a request's onRouteCities (cities not in the list are dropped)"""
+    if on_route_cities and isinstance(on_route_cities, list):
+        # Validate all cities are in the cities list
+        valid_cities = [city for city in on_route_cities if is_valid_city(city)]
+        if valid_cities:
+            return json.dumps(valid_cities)
+    return None
+
 @app.route('/api/rides', methods=['POST'])
 @jwt_required()
 def create_ride():
@@ -794,10 +1072,9 @@ def create_ride():
         return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
     
     # Validate cities are in the list
-    cities = get_cities()
-    if data['pickupCity'] not in cities:
+    if not is_valid_city(data['pickupCity']):
         return jsonify({'error': 'Invalid pickup city'}), 400
-    if data['dropCity'] not in cities:
+    if not is_valid_city(data['dropCity']):
         return jsonify({'error': 'Invalid drop city'}), 400
     
     # Addresses are required
@@ -818,14 +1095,7 @@ def create_ride():
         return jsonify({'error': 'Cannot publish a ride in the past'}), 400
     
     # Handle on-route cities (optional)
-    on_route_cities = data.get('onRouteCities', [])
-    on_route_cities_json = None
-    if on_route_cities and isinstance(on_route_cities, list):
-        # Validate all cities are in the cities list
-        cities_list = get_cities()
-        valid_cities = [city for city in on_route_cities if city in cities_list]
-        if valid_cities:
-            on_route_cities_json = json.dumps(valid_cities)
+    on_route_cities_json = on_route_cities_to_json(data.get('onRouteCities', []))
     
     # Create ride
     ride = Ride(
@@ -837,6 +1107,7 @@ def create_ride():
         on_route_cities=on_route_cities_json,
         date=ride_date,
         time=ride_time,
+        departs_at=ride_datetime,
         available_seats=int(data['availableSeats']),
         capacity=int(data['availableSeats']),
         cost_per_person=float(data['costPerPerson']),
@@ -845,25 +1116,535 @@ def create_ride():
         women_only=data.get('womenOnly', False)
     )
     
+    # Index the full route so search can match it in SQL
+    for city, ordinal in route_stops(ride.pickup_city, parse_on_route_cities(on_route_cities_json), ride.drop_city):
+        ride.stops.append(RideStop(city=city, ordinal=ordinal, date=ride.date, time=ride.time))
+    
     db.session.add(ride)
+    bump_versions([user_id])
     db.session.commit()
     
+    invalidate_ride_searches(ride)
+    alerted = alert_saved_searches([ride])
+    rides_log.info('Ride published', extra={'ride_id': ride.id, 'publisher_id': user_id, 'pickup': ride.pickup_city,
+                                            'drop': ride.drop_city, 'date': ride.date.isoformat(), 'alerted': alerted})
+    
     return jsonify({
         'message': 'Ride published successfully',
-        'ride': {
-            'id': ride.id,
-            'pickupCity': ride.pickup_city,
-            'dropCity': ride.drop_city,
-            'pickupAddress': ride.pickup_address,
-            'dropAddress': ride.drop_address,
-            'onRouteCities': json.loads(ride.on_route_cities) if ride.on_route_cities else [],
-            'date': ride.date.isoformat(),
-            'time': ride.time.strftime('%H:%M'),
-            'availableSeats': ride.available_seats,
-            'costPerPerson': ride.cost_per_person
-        }
+        'ride': ride_to_dict(ride, CREATED_RIDE_FIELDS)
     }), 201
 
+# Recurring rides: rides are created RIDE_TEMPLATE_HORIZON_DAYS ahead (materialize_rides.py keeps that rolling)
+RIDE_TEMPLATE_HORIZON_DAYS = int(os.getenv('RIDE_TEMPLATE_HORIZON_DAYS', 14))
+RIDE_TEMPLATE_MAX_DAYS = int(os.getenv('RIDE_TEMPLATE_MAX_DAYS', 180))
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+def ride_template_to_dict(template):
+    return {
+        'id': template.id,
+        'pickupCity': template.pickup_city,
+        'dropCity': template.drop_city,
+        'pickupAddress': template.pickup_address,
+        'dropAddress': template.drop_address,
+        'onRouteCities': list(parse_on_route_cities(template.on_route_cities)),
+        'time': template.time.isoformat(timespec='minutes'),
+        'weekdays': [day for n, day in enumerate(WEEKDAYS) if template.weekdays >> n & 1],
+        'startDate': template.start_date.isoformat(),
+        'endDate': template.end_date.isoformat(),
+        'availableSeats': template.seats,
+        'costPerPerson': template.cost_per_person,
+        'carModel': template.car_model,
+        'licensePlate': template.license_plate,
+        'womenOnly': template.women_only,
+        'materializedUntil': template.materialized_until.isoformat() if template.materialized_until else None
+    }
+
+def template_dates(template, first, last):
+    """Dates from first to last (inclusive) on the template's weekdays"""
+    days = (first + timedelta(days=offset) for offset in range((last - first).days + 1))
+    return [day for day in days if template.weekdays >> day.weekday() & 1]
+
+def materialize_batch(templates, now, horizon):
+    """Create the rides of these templates through the horizon in one transaction; returns the new ride ids"""
+    rides = []
+    for template in templates:
+        first = max(template.start_date, now.date())
+        if template.materialized_until is not None:
+            first = max(first, template.materialized_until + timedelta(days=1))
+        last = min(template.end_date, horizon)
+        # Claim the window - a concurrent run that read the same materialized_until updates nothing and skips it
+        claimed = RideTemplate.query.filter(
+            RideTemplate.id == template.id,
+            RideTemplate.materialized_until.is_not_distinct_from(template.materialized_until)
+        ).update({RideTemplate.materialized_until: last}, synchronize_session=False) == 1
+        if not claimed:
+            continue
+        for day in template_dates(template, first, last):
+            departs_at = datetime.combine(day, template.time)
+            if departs_at > now:
+                rides.append((template, {
+                    'publisher_id': template.publisher_id,
+                    'pickup_city': template.pickup_city,
+                    'drop_city': template.drop_city,
+                    'pickup_address': template.pickup_address,
+                    'drop_address': template.drop_address,
+                    'on_route_cities': template.on_route_cities,
+                    'date': day,
+                    'time': template.time,
+                    'departs_at': departs_at,
+                    'available_seats': template.seats,
+                    'capacity': template.seats,
+                    'cost_per_person': template.cost_per_person,
+                    'car_model': template.car_model,
+                    'license_plate': template.license_plate,
+                    'women_only': template.women_only,
+                    'template_id': template.id
+                }))
+    
+    ride_ids = []
+    if rides:
+        # One multi-row INSERT for the rides and one for their route stops. RETURNING order is not
+        # guaranteed (and asking for it makes SQLite insert row by row), so rides are matched back
+        # to their rows by (template_id, date), which ix_ride_template_date keeps unique
+        inserted = db.session.execute(insert(Ride).returning(Ride.id, Ride.template_id, Ride.date), [row for _, row in rides]).all()
+        ride_id_by_day = {(template_id, day): ride_id for ride_id, template_id, day in inserted}
+        ride_ids = [ride_id_by_day[(template.id, row['date'])] for template, row in rides]
+        stops = [
+            {'ride_id': ride_id, 'city': city, 'ordinal': ordinal, 'date': row['date'], 'time': row['time']}
+            for ride_id, (template, row) in zip(ride_ids, rides)
+            for city, ordinal in route_stops(template.pickup_city, parse_on_route_cities(template.on_route_cities), template.drop_city)
+        ]
+        db.session.execute(insert(RideStop), stops)
+        bump_versions({template.publisher_id for template, _ in rides})
+    db.session.commit()
+    return ride_ids
+
+def due_ride_templates(horizon):
+    """Templates with rides still to create through the horizon"""
+    return RideTemplate.query.filter(or_(
+        RideTemplate.materialized_until.is_(None),
+        and_(RideTemplate.materialized_until < horizon, RideTemplate.materialized_until < RideTemplate.end_date)
+    ))
+
+def materialize_rides(horizon_days=RIDE_TEMPLATE_HORIZON_DAYS, template_ids=None, batch_size=200):
+    """Create the rides of recurring templates up to horizon_days ahead; returns the new ride ids.
+
+    Templates are handled batch_size at a time, one transaction per batch. The rides are ordinary
+    rides: searched, requested and chatted about like any other.
+    """
+    now = datetime.now()
+    horizon = now.date() + timedelta(days=horizon_days)
+    query = due_ride_templates(horizon)
+    if template_ids is not None:
+        query = query.filter(RideTemplate.id.in_(template_ids))
+    
+    ride_ids = []
+    templates = alerted = 0
+    # Alert emails for the whole run, so a user gets one summary rather than one email per new ride
+    emails = []
+    while True:
+        # Claimed templates no longer match, so each pass picks up the next ones
+        batch = query.order_by(RideTemplate.id).limit(batch_size).all()
+        if not batch:
+            break
+        templates += len(batch)
+        new_ids = materialize_batch(batch, now, horizon)
+        ride_ids.extend(new_ids)
+        # Like create_ride: search caches, the journey index and saved searches see every new ride
+        if new_ids:
+            by_template = {}
+            for ride in Ride.query.filter(Ride.id.in_(new_ids)).order_by(Ride.id):
+                invalidate_ride_searches(ride)
+                by_template.setdefault(ride.template_id, []).append(ride)
+            # One saved-search lookup per template rather than per ride
+            for template_rides in by_template.values():
+                alerted += alert_saved_searches(template_rides, emails)
+    if emails:
+        queue_ride_alert_emails(emails)
+    if ride_ids:
+        rides_log.info('Rides materialized', extra={'templates': templates, 'rides': len(ride_ids),
+                                                    'alerted': alerted, 'horizon': horizon.isoformat()})
+    return ride_ids
+
+@app.route('/api/ride-templates', methods=['POST'])
+@jwt_required()
+def create_ride_template():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    # Same fields as publishing a ride, with weekdays and a date range instead of a date
+    required_fields = ['pickupCity', 'dropCity', 'pickupAddress', 'dropAddress', 'time', 'weekdays', 'endDate', 'availableSeats', 'costPerPerson', 'carModel', 'licensePlate']
+    missing_fields = [field for field in required_fields if field not in data or not str(data[field]).strip()]
+    
+    if missing_fields:
+        return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+    
+    if not is_valid_city(data['pickupCity']):
+        return jsonify({'error': 'Invalid pickup city'}), 400
+    if not is_valid_city(data['dropCity']):
+        return jsonify({'error': 'Invalid drop city'}), 400
+    
+    pickup_address = data['pickupAddress'].strip()
+    drop_address = data['dropAddress'].strip()
+    if not pickup_address:
+        return jsonify({'error': 'Pickup address is required'}), 400
+    if not drop_address:
+        return jsonify({'error': 'Drop address is required'}), 400
+    
+    weekdays = data['weekdays']
+    if not isinstance(weekdays, list) or not weekdays or any(day not in WEEKDAYS for day in weekdays):
+        return jsonify({'error': f'weekdays must be a list of {", ".join(WEEKDAYS)}'}), 400
+    
+    today = datetime.now().date()
+    try:
+        ride_time = datetime.strptime(data['time'], '%H:%M').time()
+        start_date = datetime.strptime(data['startDate'], '%Y-%m-%d').date() if data.get('startDate') else today
+        end_date = datetime.strptime(data['endDate'], '%Y-%m-%d').date()
+        seats = int(data['availableSeats'])
+        cost_per_person = float(data['costPerPerson'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid time, startDate, endDate, availableSeats or costPerPerson'}), 400
+    
+    if start_date < today or end_date < start_date:
+        return jsonify({'error': 'startDate must be today or later and endDate on or after it'}), 400
+    if (end_date - today).days > RIDE_TEMPLATE_MAX_DAYS:
+        return jsonify({'error': f'Recurring rides can run at most {RIDE_TEMPLATE_MAX_DAYS} days ahead'}), 400
+    if seats < 1:
+        return jsonify({'error': 'Available seats must be at least 1'}), 400
+    
+    template = RideTemplate(
+        publisher_id=user_id,
+        pickup_city=data['pickupCity'],
+        drop_city=data['dropCity'],
+        pickup_address=pickup_address,
+        drop_address=drop_address,
+        on_route_cities=on_route_cities_to_json(data.get('onRouteCities', [])),
+        time=ride_time,
+        weekdays=sum(1 << WEEKDAYS.index(day) for day in set(weekdays)),
+        start_date=start_date,
+        end_date=end_date,
+        seats=seats,
+        cost_per_person=cost_per_person,
+        car_model=data['carModel'],
+        license_plate=data['licensePlate'],
+        women_only=bool(data.get('womenOnly', False))
+    )
+    db.session.add(template)
+    db.session.commit()
+    
+    # The first RIDE_TEMPLATE_HORIZON_DAYS of rides right away; materialize_rides.py adds the rest as days pass
+    ride_ids = materialize_rides(template_ids=[template.id])
+    rides_log.info('Ride template created', extra={'template_id': template.id, 'publisher_id': user_id,
+                                                   'pickup': template.pickup_city, 'drop': template.drop_city,
+                                                   'rides': len(ride_ids)})
+    
+    return jsonify({
+        'message': 'Recurring ride published successfully',
+        'template': ride_template_to_dict(template),
+        'rideIds': ride_ids
+    }), 201
+
+@app.route('/api/ride-templates', methods=['GET'])
+@jwt_required()
+def get_ride_templates():
+    user_id = int(get_jwt_identity())
+    templates = RideTemplate.query.filter(RideTemplate.publisher_id == user_id).order_by(RideTemplate.id.desc()).all()
+    return jsonify({'templates': [ride_template_to_dict(template) for template in templates]}), 200
+
+@app.route('/api/ride-templates/<int:template_id>', methods=['DELETE'])
+@jwt_required()
+def delete_ride_template(template_id):
+    user_id = int(get_jwt_identity())
+    template = RideTemplate.query.get_or_404(template_id)
+    
+    if template.publisher_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # Upcoming rides nobody has an open request on go with the template; the rest stay as one-off rides
+    now = datetime.now()
+    rides = Ride.query.filter(Ride.template_id == template_id).options(selectinload(Ride.requests)).all()
+    cancelled = [ride for ride in rides
+                 if ride.departs_at > now and not any(r.status in ('pending', 'approved') for r in ride.requests)]
+    bump_versions([user_id] + [r.requestor_id for ride in cancelled for r in ride.requests])
+    for ride in rides:
+        if ride in cancelled:
+            db.session.delete(ride)
+        else:
+            ride.template_id = None
+    db.session.delete(template)
+    db.session.commit()
+    
+    for ride in cancelled:
+        invalidate_ride_searches(ride)
+    rides_log.info('Ride template deleted', extra={'template_id': template_id, 'publisher_id': user_id,
+                                                   'cancelled': len(cancelled)})
+    
+    return jsonify({
+        'message': 'Recurring ride stopped',
+        'cancelledRides': len(cancelled),
+        'keptRides': len(rides) - len(cancelled)
+    }), 200
+
+# Saved searches (ride alerts)
+SAVED_SEARCH_MAX_PER_USER = int(os.getenv('SAVED_SEARCH_MAX_PER_USER', 10))
+SAVED_SEARCH_MAX_DAYS = int(os.getenv('SAVED_SEARCH_MAX_DAYS', 30))
+SAVED_SEARCH_EMAILS = os.getenv('SAVED_SEARCH_EMAILS', 'true').lower() == 'true'
+
+def saved_search_to_dict(saved):
+    return {
+        'id': saved.id,
+        'pickupCity': saved.pickup_city,
+        'dropCity': saved.drop_city,
+        'dateFrom': saved.date_from.isoformat(),
+        'dateTo': saved.date_to.isoformat(),
+        'passengers': saved.passengers,
+        'womenOnly': saved.women_only,
+        'createdAt': saved.created_at.isoformat() if saved.created_at else None
+    }
+
+def ride_alert_email_html(name, corridor, ride):
+    frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+    departs = f"{ride.date.strftime('%d %b %Y')} at {ride.time.strftime('%H:%M')}"
+    return f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h2 style="color: #2563eb;">A ride matches your saved search</h2>
+            <p>Hi {name},</p>
+            <p>A ride from {ride.pickup_city} to {ride.drop_city} leaving {departs} goes from
+               {corridor[0]} to {corridor[1]} and has {ride.available_seats} seat(s) free.</p>
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{frontend_url}/dashboard" 
+                   style="background-color: #2563eb; color: white; padding: 12px 30px; 
+                          text-decoration: none; border-radius: 5px; display: inline-block;">
+                    Find Rides
+                </a>
+            </div>
+            <p style="color: #999; font-size: 12px;">You get this email because you saved this search on LinkLift.</p>
+        </div>
+        """
+
+def ride_alerts_summary_email_html(name, alerts):
+    frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+    items = ''.join(
+        f"<li>{ride.pickup_city} to {ride.drop_city} leaving {ride.date.strftime('%d %b %Y')} at {ride.time.strftime('%H:%M')}"
+        f" - {match['corridor'][0]} to {match['corridor'][1]}, {ride.available_seats} seat(s) free</li>"
+        for match, ride in alerts
+    )
+    return f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h2 style="color: #2563eb;">{len(alerts)} rides match your saved searches</h2>
+            <p>Hi {name},</p>
+            <ul>{items}</ul>
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{frontend_url}/dashboard" 
+                   style="background-color: #2563eb; color: white; padding: 12px 30px; 
+                          text-decoration: none; border-radius: 5px; display: inline-block;">
+                    Find Rides
+                </a>
+            </div>
+            <p style="color: #999; font-size: 12px;">You get this email because you saved these searches on LinkLift.</p>
+        </div>
+        """
+
+def queue_ride_alert_emails(alerts):
+    """Queue one email per user for (match, ride) alerts: the ride itself, or a summary of all their rides"""
+    by_email = {}
+    for match, ride in alerts:
+        by_email.setdefault(match['email'], []).append((match, ride))
+    try:
+        email_queue.enqueue_many([
+            (email, f"New ride: {user_alerts[0][0]['corridor'][0]} to {user_alerts[0][0]['corridor'][1]}",
+             ride_alert_email_html(user_alerts[0][0]['name'], user_alerts[0][0]['corridor'], user_alerts[0][1]))
+            if len(user_alerts) == 1 else
+            (email, f"{len(user_alerts)} new rides match your saved searches",
+             ride_alerts_summary_email_html(user_alerts[0][0]['name'], user_alerts))
+            for email, user_alerts in by_email.items()
+        ])
+    except Exception:
+        # The rides are published either way
+        rides_log.exception('Failed to queue ride alert emails', extra={'users': len(by_email)})
+        db.session.rollback()
+
+def alert_saved_searches(rides, emails=None):
+    """Alert every user with a saved search these new rides match; returns how many alerts were sent.
+
+    The rides share a route, publisher, seats and women_only (one ride, or the dates of one
+    template). The route is turned into its (pickup, drop) corridors and looked up in one indexed
+    query over the rides' dates, instead of every saved search polling /api/rides/search.
+    Each alert is pushed as a ride_alert event right away. The emails are queued now, or, with an
+    emails list, appended to it so the caller sends one email per user for a whole run
+    (queue_ride_alert_emails). Call after commit.
+    """
+    ride = rides[0]
+    on_route_list = parse_on_route_cities(ride.on_route_cities)
+    corridors = route_corridors([city for city, _ in route_stops(ride.pickup_city, on_route_list, ride.drop_city)])
+    if not corridors:
+        return 0
+    try:
+        query = db.session.query(SavedSearch.id, SavedSearch.user_id, SavedSearch.pickup_city, SavedSearch.drop_city,
+                                 SavedSearch.date_from, SavedSearch.date_to, User.email, User.name).join(
+            User, User.id == SavedSearch.user_id).filter(
+            # One equality range per corridor on ix_saved_search_corridor_date (a row-value IN isn't indexed by SQLite)
+            or_(*(and_(SavedSearch.pickup_city == pickup, SavedSearch.drop_city == drop) for pickup, drop in corridors)),
+            SavedSearch.date_to >= min(r.date for r in rides),
+            SavedSearch.date_from <= max(r.date for r in rides),
+            SavedSearch.passengers <= ride.available_seats,
+            SavedSearch.user_id != ride.publisher_id
+        )
+        if not ride.women_only:
+            query = query.filter(SavedSearch.women_only == False)
+        saved = query.all()
+        
+        alerts = []
+        for ride in rides:
+            # One alert per user and ride, however many of their saved searches match
+            matches = {}
+            for saved_id, user_id, pickup_city, drop_city, date_from, date_to, email, name in saved:
+                if date_from <= ride.date <= date_to:
+                    match = matches.setdefault(user_id, {'email': email, 'name': name, 'savedSearchIds': [], 'corridor': (pickup_city, drop_city)})
+                    match['savedSearchIds'].append(saved_id)
+            
+            for user_id, match in matches.items():
+                event_bus.publish([user_id], 'ride_alert', {
+                    'rideId': ride.id, 'savedSearchIds': match['savedSearchIds'],
+                    'pickupCity': match['corridor'][0], 'dropCity': match['corridor'][1],
+                    'date': ride.date.isoformat(), 'time': ride.time.strftime('%H:%M')
+                })
+                alerts.append((match, ride))
+        
+        if SAVED_SEARCH_EMAILS and alerts:
+            if emails is None:
+                queue_ride_alert_emails(alerts)
+            else:
+                emails.extend(alerts)
+        return len(alerts)
+    except Exception:
+        # The rides are published either way
+        rides_log.exception('Failed to send ride alerts', extra={'ride_ids': [r.id for r in rides]})
+        db.session.rollback()
+        return 0
+
+@app.route('/api/saved-searches', methods=['POST'])
+@jwt_required()
+def create_saved_search():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    pickup_city = data.get('pickupCity', '').strip()
+    drop_city = data.get('dropCity', '').strip()
+    if not is_valid_city(pickup_city):
+        return jsonify({'error': 'Invalid pickup city'}), 400
+    if not is_valid_city(drop_city):
+        return jsonify({'error': 'Invalid drop city'}), 400
+    if pickup_city == drop_city:
+        return jsonify({'error': 'Pickup and drop city must differ'}), 400
+    
+    today = datetime.now().date()
+    try:
+        date_from = datetime.strptime(data['dateFrom'], '%Y-%m-%d').date() if data.get('dateFrom') else today
+        # Without dates: any day from today as far ahead as allowed
+        if data.get('dateTo'):
+            date_to = datetime.strptime(data['dateTo'], '%Y-%m-%d').date()
+        else:
+            date_to = date_from if data.get('dateFrom') else today + timedelta(days=SAVED_SEARCH_MAX_DAYS)
+        passengers = int(data.get('passengers', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid dateFrom, dateTo or passengers'}), 400
+    
+    if date_from < today or date_to < date_from:
+        return jsonify({'error': 'dateFrom must be today or later and dateTo on or after it'}), 400
+    if (date_to - today).days > SAVED_SEARCH_MAX_DAYS:
+        return jsonify({'error': f'Saved searches can look at most {SAVED_SEARCH_MAX_DAYS} days ahead'}), 400
+    if passengers < 1:
+        return jsonify({'error': 'Passengers must be at least 1'}), 400
+    
+    # Expired searches don't count against the limit
+    active = SavedSearch.query.filter(SavedSearch.user_id == user_id, SavedSearch.date_to >= today).count()
+    if active >= SAVED_SEARCH_MAX_PER_USER:
+        return jsonify({'error': f'You can save at most {SAVED_SEARCH_MAX_PER_USER} searches'}), 400
+    
+    saved = SavedSearch(
+        user_id=user_id,
+        pickup_city=pickup_city,
+        drop_city=drop_city,
+        date_from=date_from,
+        date_to=date_to,
+        passengers=passengers,
+        women_only=bool(data.get('womenOnly', False))
+    )
+    db.session.add(saved)
+    db.session.commit()
+    
+    return jsonify({
+        'message': "Search saved - we'll alert you when a matching ride is published",
+        'savedSearch': saved_search_to_dict(saved)
+    }), 201
+
+@app.route('/api/saved-searches', methods=['GET'])
+@jwt_required()
+def get_saved_searches():
+    user_id = int(get_jwt_identity())
+    saved_searches = SavedSearch.query.filter(
+        SavedSearch.user_id == user_id,
+        SavedSearch.date_to >= datetime.now().date()
+    ).order_by(SavedSearch.date_from, SavedSearch.id).all()
+    return jsonify({'savedSearches': [saved_search_to_dict(saved) for saved in saved_searches]}), 200
+
+@app.route('/api/saved-searches/<int:saved_search_id>', methods=['DELETE'])
+@jwt_required()
+def delete_saved_search(saved_search_id):
+    user_id = int(get_jwt_identity())
+    saved = SavedSearch.query.get_or_404(saved_search_id)
+    
+    if saved.user_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    db.session.delete(saved)
+    db.session.commit()
+    
+    return jsonify({'message': 'Saved search deleted'}), 200
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# dateRange searches date ± this many days at most
+SEARCH_MAX_DATE_RANGE = 7
+# radiusKm also matches cities this many km from pickup/drop at most
+SEARCH_MAX_RADIUS_KM = int(os.getenv('SEARCH_MAX_RADIUS_KM', 50))
+# sort=best ranks the earliest SEARCH_RANK_CANDIDATES matches (see ride_ranking.py)
+SEARCH_RANK_CANDIDATES = int(os.getenv('SEARCH_RANK_CANDIDATES', 1000))
+SEARCH_RANK_WEIGHTS = parse_weights(os.getenv('SEARCH_RANK_WEIGHTS', ''))
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def encode_search_cursor(ride):
+    """Opaque cursor pointing just after this ride in (date, time, id) order"""
+    return encode_cursor([ride.date.isoformat(), ride.time.strftime('%H:%M:%S'), ride.id])
+
+def decode_search_cursor(cursor):
+    """Inverse of encode_search_cursor; raises ValueError for anything malformed"""
+    try:
+        date_str, time_str, ride_id = decode_cursor(cursor)
+        return datetime.strptime(date_str, '%Y-%m-%d').date(), datetime.strptime(time_str, '%H:%M:%S').time(), int(ride_id)
+    except TypeError as e:
+        raise ValueError('Invalid cursor') from e
+
+def encode_rank_cursor(offset):
+    """Opaque cursor for the next page of a ranked (sort=best) search"""
+    return encode_cursor(['best', offset])
+
+def decode_rank_cursor(cursor):
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != 2 or values[0] != 'best' or int(values[1]) < 0:
+        raise ValueError('Invalid cursor')
+    return int(values[1])
+
 @app.route('/api/rides/search', methods=['POST'])
 @jwt_required()
 def search_rides():
@@ -874,145 +1655,368 @@ def search_rides():
     drop_city = data.get('dropCity', '').strip()
     date = data.get('date')
     passengers = int(data.get('passengers', 1))
-    women_only = data.get('womenOnly', False)
+    women_only = bool(data.get('womenOnly', False))
+    cursor = data.get('cursor')
+    # 'departure' (earliest first) or 'best' (ranked, see ride_ranking.py)
+    sort = data.get('sort', 'departure')
+    preferred_time = data.get('time') or None
+    # Departure window ('HH:MM', inclusive; timeFrom > timeTo wraps past midnight)
+    time_from = data.get('timeFrom') or None
+    time_to = data.get('timeTo') or None
     
     # Validate cities
     if not pickup_city or not drop_city:
         return jsonify({'error': 'Pickup city and drop city are required'}), 400
     
-    # Base query - exclude user's own rides and past rides
-    query = Ride.query.filter(
-        Ride.publisher_id != user_id,
-        Ride.date >= datetime.now().date() if not date else Ride.date == datetime.strptime(date, '%Y-%m-%d').date(),
+    if sort not in ('departure', 'best'):
+        return jsonify({'error': "sort must be 'departure' or 'best'"}), 400
+    
+    try:
+        limit = min(max(int(data.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+        preferred = datetime.strptime(preferred_time, '%H:%M').time() if preferred_time else None
+        search_date = datetime.strptime(date, '%Y-%m-%d').date() if date else None
+        date_range = data.get('dateRange')
+        date_range = min(max(int(date_range), 0), SEARCH_MAX_DATE_RANGE) if date_range is not None else None
+        radius_km = min(max(int(data.get('radiusKm') or 0), 0), SEARCH_MAX_RADIUS_KM)
+        times = (datetime.strptime(time_from or '00:00', '%H:%M').time(),
+                 datetime.strptime(time_to or '23:59', '%H:%M').time().replace(second=59)) if time_from or time_to else None
+        if sort == 'best':
+            offset = decode_rank_cursor(cursor) if cursor else 0
+        else:
+            after = decode_search_cursor(cursor) if cursor else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit, date, dateRange, time, radiusKm or cursor'}), 400
+    
+    try:
+        fields = requested_fields(RIDE_DETAIL_FIELDS + (('score',) if sort == 'best' else ()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # One range query covers date ± dateRange days (from today when there is no date)
+    if date_range is not None:
+        center = search_date or datetime.now().date()
+        dates = (center - timedelta(days=date_range), center + timedelta(days=date_range))
+    else:
+        dates = (search_date, search_date) if search_date else None
+    # Nearby cities count as pickup/drop too, but never the other end of the search
+    pickup_cities = tuple(city for city in nearby_cities(pickup_city, radius_km) if city != drop_city)
+    drop_cities = tuple(city for city in nearby_cities(drop_city, radius_km) if city != pickup_city)
+    search_key = (pickup_city, drop_city, dates and (dates[0].isoformat(), dates[1].isoformat()),
+                  times and (time_from, time_to), radius_km, passengers, women_only, sort)
+    
+    # Results are cached before any per-user filtering, so one entry serves everyone
+    if sort == 'best':
+        # The whole ranking is cached once; pages are slices of it
+        cache_key = search_key + (preferred_time,)
+        ranked = search_cache.get(cache_key)
+        if ranked is None:
+            now = datetime.now()
+            if preferred:
+                target = datetime.combine(search_date or now.date(), preferred)
+            else:
+                # No preferred time - the sooner the better
+                target = max(now, datetime.combine(search_date, datetime.min.time())) if search_date else now
+            ranked = search_ranked(pickup_cities, drop_cities, dates, times, passengers, women_only, target)
+            search_cache.set(cache_key, ranked)
+        page = {
+            'rides': ranked[offset:offset + limit],
+            'hasMore': offset + limit < len(ranked),
+            'nextCursor': encode_rank_cursor(offset + limit) if offset + limit < len(ranked) else None
+        }
+    else:
+        cache_key = search_key + (cursor, limit)
+        page = search_cache.get(cache_key)
+        if page is None:
+            page = search_ride_page(pickup_cities, drop_cities, dates, times, passengers, women_only, after, limit)
+            search_cache.set(cache_key, page)
+    
+    # Exclude user's own rides, and rides that departed since the page was cached
+    now = datetime.now().strftime('%Y-%m-%d %H:%M')
+    rides = [ride for ride in page['rides'] if ride['publisher']['id'] != user_id and f"{ride['date']} {ride['time']}" >= now]
+    result = {**page}
+    if date_range is not None:
+        # Rides per date over the whole range (not just this page), in date order, for the date strip.
+        # Counted per publisher so one cache entry serves everyone and each user's own rides are left out
+        counts_key = search_key + ('dates',)
+        counts = search_cache.get(counts_key)
+        if counts is None:
+            counts = search_date_counts(pickup_cities, drop_cities, dates, times, passengers, women_only)
+            search_cache.set(counts_key, counts)
+        per_date = Counter()
+        for day, publisher_id, count in counts:
+            if publisher_id != user_id:
+                per_date[day] += count
+        result['dates'] = [{'date': day, 'count': count} for day, count in sorted(per_date.items())]
+    if request.args.get('fields'):
+        rides = [project(ride, fields) for ride in rides]
+    
+    return jsonify({**result, 'rides': rides}), 200
+
+def search_query(pickup_cities, drop_cities, dates, times, passengers, women_only):
+    """Rides matching a search for any user, plus the aliased pickup stop to order by and the drop stop's ordinal.
+
+    pickup_cities/drop_cities are the cities that count as pickup/drop (see nearby_cities). dates is an
+    inclusive (first, last) pickup date range or None for any upcoming date; times an inclusive
+    (start, end) departure window or None, wrapping past midnight when start > end.
+    """
+    # Match pickup before drop on the ride's route using the ride_stop index
+    pickup_stop = aliased(RideStop)
+    drop_stop = aliased(RideStop)
+    
+    if len(pickup_cities) == 1 and len(drop_cities) == 1:
+        query = Ride.query.join(pickup_stop, pickup_stop.ride_id == Ride.id).join(drop_stop, drop_stop.ride_id == Ride.id).filter(
+            pickup_stop.city == pickup_cities[0],
+            drop_stop.city == drop_cities[0],
+            pickup_stop.ordinal < drop_stop.ordinal
+        )
+        drop_ordinal = drop_stop.ordinal
+    else:
+        # A route can pass several cities of each set - board at the first pickup city and get off at the
+        # last drop city after it, so every ride is still one row
+        earlier_stop = aliased(RideStop)
+        drop_ordinal = select(func.max(drop_stop.ordinal)).where(
+            drop_stop.ride_id == pickup_stop.ride_id,
+            drop_stop.city.in_(drop_cities),
+            drop_stop.ordinal > pickup_stop.ordinal
+        ).correlate(pickup_stop).scalar_subquery()
+        query = Ride.query.join(pickup_stop, pickup_stop.ride_id == Ride.id).filter(
+            pickup_stop.city.in_(pickup_cities),
+            ~exists().where(
+                earlier_stop.ride_id == pickup_stop.ride_id,
+                earlier_stop.city.in_(pickup_cities),
+                earlier_stop.ordinal < pickup_stop.ordinal
+            ),
+            drop_ordinal.isnot(None)
+        )
+    
+    # Exclude past rides (including ones that already departed today)
+    now = datetime.now()
+    query = query.filter(
+        pickup_stop.date >= now.date() if not dates else pickup_stop.date.between(max(dates[0], now.date()), dates[1]),
+        Ride.departs_at >= now,
         Ride.available_seats >= passengers
     )
     
-    # Note: Both pickup and drop city matching (including on-route cities) will be done in Python
-    # after querying, since on_route_cities is stored as JSON
-    if date:
-        query = query.filter(Ride.date == datetime.strptime(date, '%Y-%m-%d').date())
+    if times:
+        start, end = times
+        if start <= end:
+            query = query.filter(pickup_stop.time.between(start, end))
+        else:
+            query = query.filter(or_(pickup_stop.time >= start, pickup_stop.time <= end))
+    
     if women_only:
         query = query.filter(Ride.women_only == True)
     
-    # Filter out past rides and match cities
-    current_datetime = datetime.now()
+    # Load publishers in the same query
+    return query.options(joinedload(Ride.publisher)), pickup_stop, drop_ordinal
+
+def search_ride_page(pickup_cities, drop_cities, dates, times, passengers, women_only, after, limit):
+    """One page of rides matching the search, earliest first, for any user (see search_rides)"""
+    query, pickup_stop, _ = search_query(pickup_cities, drop_cities, dates, times, passengers, women_only)
+    
+    # Keyset pagination - continue strictly after the last ride of the previous page
+    if after:
+        query = query.filter(tuple_(pickup_stop.date, pickup_stop.time, pickup_stop.ride_id) > tuple_(*after))
+    
+    # Earliest first, ordered and limited in SQL by walking the pickup city's stops in departure
+    # order, so a page costs the same however many rides match; one extra row tells whether there is a next page
+    query = query.order_by(pickup_stop.date, pickup_stop.time, pickup_stop.ride_id).limit(limit + 1)
+    
     rides = query.all()
-    filtered_rides = []
+    has_more = len(rides) > limit
+    rides = rides[:limit]
     
-    for ride in rides:
-        ride_datetime = datetime.combine(ride.date, ride.time)
-        if ride_datetime < current_datetime:
-            continue
-        
-        # Parse on-route cities (maintains order)
-        on_route_list = []
-        if ride.on_route_cities:
-            try:
-                on_route_list = json.loads(ride.on_route_cities)
-                if not isinstance(on_route_list, list):
-                    on_route_list = []
-            except:
-                on_route_list = []
-        
-        # Build full route: [start_city, ...on_route_cities, destination_city]
-        full_route = [ride.pickup_city] + on_route_list + [ride.drop_city]
-        
-        # Find indices of pickup and drop cities in the route
-        pickup_index = -1
-        drop_index = -1
-        
-        # Check if pickup city matches start city or any on-route city
-        if pickup_city in full_route:
-            pickup_index = full_route.index(pickup_city)
-        
-        # Check if drop city matches destination or any on-route city
-        if drop_city in full_route:
-            drop_index = full_route.index(drop_city)
-        
-        # Both cities must be in the route, and pickup must come before drop
-        if pickup_index >= 0 and drop_index >= 0 and pickup_index < drop_index:
-            filtered_rides.append(ride)
+    # Skip rides if publisher doesn't exist (data inconsistency)
+    results = [ride_to_dict(ride) for ride in rides if ride.publisher]
     
-    # Simple matching - just return all matching rides (no smart scoring)
-    results = []
+    return {
+        'rides': results,
+        'hasMore': has_more,
+        'nextCursor': encode_search_cursor(rides[-1]) if has_more else None
+    }
+
+def search_date_counts(pickup_cities, drop_cities, dates, times, passengers, women_only):
+    """[date, publisher id, rides] for every match of the search, ignoring pagination (see search_rides)"""
+    query, pickup_stop, _ = search_query(pickup_cities, drop_cities, dates, times, passengers, women_only)
+    rows = query.with_entities(pickup_stop.date, Ride.publisher_id, func.count()).group_by(
+        pickup_stop.date, Ride.publisher_id
+    ).all()
+    return [[day.isoformat(), publisher_id, count] for day, publisher_id, count in rows]
+
+def search_ranked(pickup_cities, drop_cities, dates, times, passengers, women_only, target):
+    """Up to SEARCH_RANK_CANDIDATES matches for any user, best score first, scored against the target departure"""
+    query, pickup_stop, drop_ordinal = search_query(pickup_cities, drop_cities, dates, times, passengers, women_only)
+    rows = query.add_columns(pickup_stop.ordinal, drop_ordinal).order_by(
+        pickup_stop.date, pickup_stop.time, pickup_stop.ride_id
+    ).limit(SEARCH_RANK_CANDIDATES).all()
+    rows = [row for row in rows if row[0].publisher]
+    results = [ride_to_dict(ride) for ride, _, _ in rows]
+    
+    # One column per feature, scored for all candidates at once
+    scores = score_candidates(
+        [(ride.departs_at - target).total_seconds() / 60 for ride, _, _ in rows],
+        # Route stops the ride covers before the rider's pickup and after the rider's drop
+        [pickup_ordinal + (len(result['onRouteCities']) + 1 - drop_ordinal)
+         for (_, pickup_ordinal, drop_ordinal), result in zip(rows, results)],
+        [ride.cost_per_person for ride, _, _ in rows],
+        [ride.available_seats for ride, _, _ in rows],
+        [ride.capacity for ride, _, _ in rows],
+        SEARCH_RANK_WEIGHTS
+    )
+    for result, score in zip(results, scores):
+        result['score'] = round(score, 4)
+    return [results[i] for i in rank(scores)]
+
+def journey_leg_to_dict(leg, ride):
+    return {
+        'rideId': ride.id,
+        'publisher': {
+            'id': ride.publisher.id,
+            'name': ride.publisher.name
+        },
+        'pickupCity': leg.from_city,
+        'dropCity': leg.to_city,
+        'departsAt': leg.departs_at.isoformat(timespec='minutes'),
+        'arrivesAt': leg.arrives_at.isoformat(timespec='minutes'),
+        # Only the ride's own departure is published, times further along its route are estimated
+        'departureEstimated': leg.board > 0,
+        'availableSeats': ride.available_seats,
+        'costPerPerson': ride.cost_per_person,
+        'carModel': ride.car_model,
+        'womenOnly': ride.women_only
+    }
+
+@app.route('/api/rides/plan', methods=['POST'])
+@jwt_required()
+def plan_journey():
+    """Itineraries chaining up to three rides (two transfers) from pickup to drop.
+
+    Returns the fastest itinerary for each number of rides that arrives earlier than any
+    itinerary with fewer rides. Times after a ride's pickup city are estimates.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
     
-    for ride in filtered_rides:
-        publisher = User.query.get(ride.publisher_id)
-        
-        # Skip rides if publisher doesn't exist (data inconsistency)
-        if not publisher:
-            continue
-        
+    try:
+        pickup_city = str(data.get('pickupCity') or '').strip()
+        drop_city = str(data.get('dropCity') or '').strip()
+        date = data.get('date')
+        passengers = int(data.get('passengers', 1))
+        women_only = bool(data.get('womenOnly', False))
+        max_transfers = min(max(int(data.get('maxTransfers', 2)), 0), 2)
+        depart_after = datetime.now()
+        if date:
+            depart_after = max(depart_after, datetime.strptime(date, '%Y-%m-%d'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid passengers, maxTransfers or date'}), 400
+    
+    if not pickup_city or not drop_city:
+        return jsonify({'error': 'Pickup city and drop city are required'}), 400
+    if pickup_city == drop_city:
+        return jsonify({'error': 'Pickup and drop city must be different'}), 400
+    if passengers < 1:
+        return jsonify({'error': 'passengers must be at least 1'}), 400
+    
+    sync_journey_index()
+    
+    # The index may be behind other workers' writes - re-check the chosen rides and plan again if needed
+    for _ in range(3):
+        itineraries = journey_index.plan(pickup_city, drop_city, depart_after, passengers=passengers,
+                                         women_only=women_only, exclude_publisher_id=user_id, max_rides=max_transfers + 1)
+        ride_ids = {leg.trip.ride_id for legs in itineraries for leg in legs}
+        rides = {ride.id: ride for ride in Ride.query.options(joinedload(Ride.publisher)).filter(Ride.id.in_(ride_ids))} if ride_ids else {}
+        stale = False
+        for ride_id in ride_ids:
+            ride = rides.get(ride_id)
+            if ride is None:
+                journey_index.remove(ride_id)
+                stale = True
+            elif ride.available_seats < passengers:
+                journey_index.set_seats(ride_id, ride.available_seats)
+                stale = True
+        if not stale:
+            break
+    else:
+        itineraries = []
+    
+    results = []
+    for legs in itineraries:
         results.append({
-            'id': ride.id,
-            'publisher': {
-                'id': publisher.id,
-                'name': publisher.name,
-                'email': publisher.email
-            },
-            'pickupCity': ride.pickup_city,
-            'dropCity': ride.drop_city,
-            'pickupAddress': ride.pickup_address,
-            'dropAddress': ride.drop_address,
-            'onRouteCities': json.loads(ride.on_route_cities) if ride.on_route_cities else [],
-            'date': ride.date.isoformat(),
-            'time': ride.time.strftime('%H:%M'),
-            'availableSeats': ride.available_seats,
-            'capacity': ride.capacity,
-            'costPerPerson': ride.cost_per_person,
-            'carModel': ride.car_model,
-            'licensePlate': ride.license_plate,
-            'womenOnly': ride.women_only
+            'transfers': len(legs) - 1,
+            'departsAt': legs[0].departs_at.isoformat(timespec='minutes'),
+            'arrivesAt': legs[-1].arrives_at.isoformat(timespec='minutes'),
+            'costPerPerson': sum(rides[leg.trip.ride_id].cost_per_person for leg in legs),
+            'legs': [journey_leg_to_dict(leg, rides[leg.trip.ride_id]) for leg in legs]
         })
     
-    # Sort by date and time (earliest first)
-    results.sort(key=lambda x: (x['date'], x['time']))
-    
-    return jsonify({'rides': results}), 200
+    return jsonify({'itineraries': results, 'minConnectionMinutes': journey_index.min_connection_minutes}), 200
 
 @app.route('/api/rides/my-published', methods=['GET'])
 @jwt_required()
 def get_my_published_rides():
     user_id = int(get_jwt_identity())
-    rides = Ride.query.filter_by(publisher_id=user_id).order_by(Ride.date.desc(), Ride.time.desc()).all()
+    try:
+        fields = requested_fields(PUBLISHED_RIDE_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Unchanged since the client's copy - skip the queries and serialization
+    version = db.session.query(User.listing_version, User.created_at).filter(User.id == user_id).first()
+    etag = version_etag('my-published', user_id, tuple(version or ()), request.query_string)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    # Count pending requests for all rides in one grouped subquery
+    pending_counts = db.session.query(
+        Request.ride_id,
+        func.count(Request.id).label('pending_count')
+    ).filter(Request.status == 'pending').group_by(Request.ride_id).subquery()
+    
+    rides = db.session.query(Ride, func.coalesce(pending_counts.c.pending_count, 0)).outerjoin(
+        pending_counts, pending_counts.c.ride_id == Ride.id
+    ).filter(Ride.publisher_id == user_id).order_by(Ride.departs_at.desc()).all()
     
     result = []
-    for ride in rides:
-        # Get pending requests count for this ride
-        pending_count = Request.query.filter_by(ride_id=ride.id, status='pending').count()
-        
-        result.append({
-            'id': ride.id,
-            'pickupCity': ride.pickup_city,
-            'dropCity': ride.drop_city,
-            'pickupAddress': ride.pickup_address,
-            'dropAddress': ride.drop_address,
-            'onRouteCities': json.loads(ride.on_route_cities) if ride.on_route_cities else [],
-            'date': ride.date.isoformat(),
-            'time': ride.time.strftime('%H:%M'),
-            'availableSeats': ride.available_seats,
-            'capacity': ride.capacity,
-            'costPerPerson': ride.cost_per_person,
-            'carModel': ride.car_model,
-            'licensePlate': ride.license_plate,
-            'womenOnly': ride.women_only,
-            'pendingRequestsCount': pending_count,
-            'createdAt': ride.created_at.isoformat()
-        })
+    for ride, pending_count in rides:
+        ride_data = ride_to_dict(ride, fields)
+        if 'pendingRequestsCount' in fields:
+            ride_data['pendingRequestsCount'] = pending_count
+        result.append(ride_data)
     
-    return jsonify({'rides': result}), 200
+    return revalidate(jsonify({'rides': result}), etag), 200
 
 @app.route('/api/rides/<int:ride_id>', methods=['GET'])
 @jwt_required()
 def get_ride_details(ride_id):
-    ride = Ride.query.get_or_404(ride_id)
-    publisher = User.query.get(ride.publisher_id)
+    try:
+        fields = requested_fields(RIDE_DETAIL_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The details are the same for every viewer, so the ride's own version identifies them
+    version = db.session.query(Ride.version, Ride.created_at).filter(Ride.id == ride_id).first()
+    if version is None:
+        return jsonify({'error': 'Ride not found'}), 404
+    etag = version_etag('ride', ride_id, tuple(version), request.query_string)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    # Load publisher, requests and requestors up front (two queries in total)
+    ride = Ride.query.options(
+        joinedload(Ride.publisher),
+        selectinload(Ride.requests).joinedload(Request.requestor)
+    ).get_or_404(ride_id)
+    publisher = ride.publisher
     
     if not publisher:
         return jsonify({'error': 'Publisher not found'}), 404
     
     # Get requests for this ride
-    requests = Request.query.filter_by(ride_id=ride_id).all()
+    requests = sorted(ride.requests, key=lambda r: r.id)
     pending_requests = [r for r in requests if r.status == 'pending']
     approved_requests = [r for r in requests if r.status == 'approved']
     
@@ -1027,7 +2031,7 @@ def get_ride_details(ride_id):
     }]
     
     for req in approved_requests:
-        requestor = User.query.get(req.requestor_id)
+        requestor = req.requestor
         if requestor:
             # Use requested price if available, otherwise original price
             passenger_price = req.price_request if req.price_request is not None else ride.cost_per_person
@@ -1045,28 +2049,8 @@ def get_ride_details(ride_id):
                 'dropAddress': req.drop_address
             })
     
-    return jsonify({
-        'ride': {
-            'id': ride.id,
-            'publisher': {
-                'id': publisher.id,
-                'name': publisher.name,
-                'email': publisher.email
-            },
-            'pickupCity': ride.pickup_city,
-            'dropCity': ride.drop_city,
-            'pickupAddress': ride.pickup_address,
-            'dropAddress': ride.drop_address,
-            'onRouteCities': json.loads(ride.on_route_cities) if ride.on_route_cities else [],
-            'date': ride.date.isoformat(),
-            'time': ride.time.strftime('%H:%M'),
-            'availableSeats': ride.available_seats,
-            'capacity': ride.capacity,
-            'costPerPerson': ride.cost_per_person,
-            'carModel': ride.car_model,
-            'licensePlate': ride.license_plate,
-            'womenOnly': ride.women_only
-        },
+    return revalidate(jsonify({
+        'ride': ride_to_dict(ride, fields),
         'pendingRequests': [{
             'id': r.id,
             'requestor': {
@@ -1083,7 +2067,7 @@ def get_ride_details(ride_id):
             'originalPrice': ride.cost_per_person
         } for r in pending_requests],
         'allPassengers': all_passengers
-    }), 200
+    }), etag), 200
 
 @app.route('/api/rides/<int:ride_id>', methods=['DELETE'])
 @jwt_required()
@@ -1094,9 +2078,19 @@ def cancel_ride(ride_id):
     if ride.publisher_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    # Everyone with an open request is notified once the ride is gone
+    notify_ids = {r.requestor_id for r in ride.requests if r.status in ('pending', 'approved')}
+    
+    # Requests, messages and route stops are removed by the relationship cascades
+    # (and with them every requestor's my-requests entry)
+    bump_versions([user_id] + [r.requestor_id for r in ride.requests])
     db.session.delete(ride)
     db.session.commit()
     
+    invalidate_ride_searches(ride)
+    event_bus.publish(notify_ids, 'ride_cancelled', {'rideId': ride_id})
+    rides_log.info('Ride cancelled', extra={'ride_id': ride_id, 'publisher_id': user_id, 'notified': len(notify_ids)})
+    
     return jsonify({'message': 'Ride cancelled successfully'}), 200
 
 # Request Routes
@@ -1154,8 +2148,11 @@ def create_request():
     )
     
     db.session.add(request_obj)
+    bump_versions([user_id, ride.publisher_id], ride.id)
     db.session.commit()
     
+    event_bus.publish([ride.publisher_id], 'request_created', {'rideId': ride.id, 'requestId': request_obj.id})
+    
     return jsonify({
         'message': 'Request sent successfully',
         'request': {
@@ -1170,17 +2167,32 @@ def create_request():
 @jwt_required()
 def get_my_requests():
     user_id = int(get_jwt_identity())
-    requests = Request.query.filter_by(requestor_id=user_id).order_by(Request.created_at.desc()).all()
+    try:
+        ride_fields = requested_fields(REQUESTED_RIDE_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Unchanged since the client's copy - skip the queries and serialization
+    version = db.session.query(User.listing_version, User.created_at).filter(User.id == user_id).first()
+    etag = version_etag('my-requests', user_id, tuple(version or ()), request.query_string)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    # Load each request's ride and publisher in the same query
+    requests = Request.query.filter_by(requestor_id=user_id).options(
+        joinedload(Request.ride).joinedload(Ride.publisher)
+    ).order_by(Request.created_at.desc()).all()
     
     result = []
     for req in requests:
-        ride = Ride.query.get(req.ride_id)
+        ride = req.ride
         
         # Skip if ride doesn't exist (data inconsistency)
         if not ride:
             continue
             
-        publisher = User.query.get(ride.publisher_id)
+        publisher = ride.publisher
         
         # Skip if publisher doesn't exist
         if not publisher:
@@ -1188,18 +2200,7 @@ def get_my_requests():
         
         result.append({
                 'id': req.id,
-                'ride': {
-                    'id': ride.id,
-                    'pickupCity': ride.pickup_city,
-                    'dropCity': ride.drop_city,
-                    'pickupAddress': ride.pickup_address,
-                    'dropAddress': ride.drop_address,
-                    'onRouteCities': json.loads(ride.on_route_cities) if ride.on_route_cities else [],
-                    'date': ride.date.isoformat(),
-                    'time': ride.time.strftime('%H:%M'),
-                    'costPerPerson': ride.cost_per_person,
-                    'womenOnly': ride.women_only
-                },
+                'ride': ride_to_dict(ride, ride_fields),
                 'publisher': {
                     'id': publisher.id,
                     'name': publisher.name
@@ -1215,7 +2216,32 @@ def get_my_requests():
                 'createdAt': req.created_at.isoformat()
             })
     
-    return jsonify({'requests': result}), 200
+    return revalidate(jsonify({'requests': result}), etag), 200
+
+# Seat accounting - single conditional UPDATEs so concurrent requests can't overbook.
+# The database re-checks the WHERE clause under the row lock, so of two approvals
+# racing for the last seat exactly one matches a row.
+# Passengers can't be removed or cancel an approved seat this close to departure
+CHANGE_CUTOFF = timedelta(minutes=30)
+
+def reserve_seats(ride_id, num_seats):
+    """Take seats if enough are left; returns False (nothing changed) otherwise"""
+    return Ride.query.filter(Ride.id == ride_id, Ride.available_seats >= num_seats).update(
+        {Ride.available_seats: Ride.available_seats - num_seats}, synchronize_session=False
+    ) == 1
+
+def release_seats(ride_id, num_seats, departs_after=None):
+    """Give seats back; with departs_after, only if the ride leaves after it (returns False otherwise)"""
+    query = Ride.query.filter(Ride.id == ride_id)
+    if departs_after:
+        query = query.filter(Ride.departs_at >= departs_after)
+    return query.update({Ride.available_seats: Ride.available_seats + num_seats}, synchronize_session=False) == 1
+
+def transition_request(request_id, from_statuses, to_status):
+    """Change a request's status only if it is still in one of from_statuses; returns False otherwise"""
+    return Request.query.filter(Request.id == request_id, Request.status.in_(from_statuses)).update(
+        {Request.status: to_status}, synchronize_session=False
+    ) == 1
 
 @app.route('/api/requests/<int:request_id>/approve', methods=['PUT'])
 @jwt_required()
@@ -1227,14 +2253,21 @@ def approve_request(request_id):
     if ride.publisher_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    if ride.available_seats < request_obj.num_passengers:
-        return jsonify({'error': 'Not enough seats available'}), 400
+    # Status and seats change together or not at all
+    if not transition_request(request_obj.id, ['pending'], 'approved'):
+        db.session.rollback()
+        return jsonify({'error': 'Request is no longer pending'}), 400
     
-    request_obj.status = 'approved'
-    ride.available_seats -= request_obj.num_passengers
+    if not reserve_seats(ride.id, request_obj.num_passengers):
+        db.session.rollback()
+        return jsonify({'error': 'Not enough seats available'}), 400
     
+    bump_versions([user_id, request_obj.requestor_id], ride.id)
     db.session.commit()
     
+    invalidate_ride_searches(ride)
+    event_bus.publish([request_obj.requestor_id], 'request_approved', {'rideId': ride.id, 'requestId': request_obj.id})
+    
     return jsonify({'message': 'Request approved successfully'}), 200
 
 @app.route('/api/requests/<int:request_id>/reject', methods=['PUT'])
@@ -1247,9 +2280,15 @@ def reject_request(request_id):
     if ride.publisher_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    request_obj.status = 'rejected'
+    # Approved passengers hold seats - they go through remove_passenger instead
+    if not transition_request(request_obj.id, ['pending'], 'rejected'):
+        db.session.rollback()
+        return jsonify({'error': 'Request is no longer pending'}), 400
+    bump_versions([user_id, request_obj.requestor_id], ride.id)
     db.session.commit()
     
+    event_bus.publish([request_obj.requestor_id], 'request_rejected', {'rideId': ride.id, 'requestId': request_obj.id})
+    
     return jsonify({'message': 'Request rejected'}), 200
 
 @app.route('/api/requests/<int:request_id>/remove', methods=['PUT'])
@@ -1262,18 +2301,20 @@ def remove_passenger(request_id):
     if ride.publisher_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Check if ride is within 30 minutes
-    ride_datetime = datetime.combine(ride.date, ride.time)
-    time_until_ride = (ride_datetime - datetime.now()).total_seconds() / 60  # minutes
-    
-    if time_until_ride < 30:
+    # Reject the request (only once, even if removed twice concurrently), then free up its
+    # seats unless the ride leaves within 30 minutes - both in one transaction
+    if not transition_request(request_obj.id, ['approved'], 'rejected'):
+        db.session.rollback()
+        return jsonify({'error': 'Passenger is not approved for this ride'}), 400
+    if not release_seats(ride.id, request_obj.num_passengers, departs_after=datetime.now() + CHANGE_CUTOFF):
+        db.session.rollback()
         return jsonify({'error': 'Cannot remove passenger within 30 minutes of ride'}), 400
-    
-    # Reject the request and free up seats
-    request_obj.status = 'rejected'
-    ride.available_seats += request_obj.num_passengers
+    bump_versions([user_id, request_obj.requestor_id], ride.id)
     db.session.commit()
     
+    invalidate_ride_searches(ride)
+    event_bus.publish([request_obj.requestor_id], 'passenger_removed', {'rideId': ride.id, 'requestId': request_obj.id})
+    
     return jsonify({'message': 'Passenger removed successfully'}), 200
 
 @app.route('/api/requests/<int:request_id>', methods=['DELETE'])
@@ -1285,30 +2326,155 @@ def cancel_request(request_id):
     if request_obj.requestor_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # If request is approved, check 30-minute rule
-    if request_obj.status == 'approved':
-        ride = Ride.query.get(request_obj.ride_id)
-        if ride:
-            ride_datetime = datetime.combine(ride.date, ride.time)
-            time_until_ride = (ride_datetime - datetime.now()).total_seconds() / 60  # minutes
-            
-            if time_until_ride < 30:
-                return jsonify({'error': 'Cannot cancel within 30 minutes of ride'}), 400
-            
-            # Free up seats
-            ride.available_seats += request_obj.num_passengers
+    # Reject the request instead of deleting (to maintain history) - first, so seats are only
+    # given back for a request this call actually took out of 'approved'
+    was_approved = request_obj.status == 'approved'
+    if not transition_request(request_obj.id, [request_obj.status], 'rejected'):
+        # Approved/rejected concurrently - let the client retry against the new state
+        db.session.rollback()
+        return jsonify({'error': 'Request changed, please try again'}), 409
     
-    # Reject the request instead of deleting (to maintain history)
-    request_obj.status = 'rejected'
+    # An approved request gives its seats back, unless the ride leaves within 30 minutes - same transaction
+    if was_approved:
+        ride = request_obj.ride
+        if not release_seats(ride.id, request_obj.num_passengers, departs_after=datetime.now() + CHANGE_CUTOFF):
+            db.session.rollback()
+            return jsonify({'error': 'Cannot cancel within 30 minutes of ride'}), 400
+    bump_versions([user_id, request_obj.ride.publisher_id], request_obj.ride_id)
     db.session.commit()
     
+    if was_approved:
+        invalidate_ride_searches(ride)
+    
     return jsonify({'message': 'Request cancelled successfully'}), 200
 
+REQUEST_BATCH_MAX = 100
+
+@app.route('/api/rides/<int:ride_id>/requests', methods=['PUT'])
+@jwt_required()
+def decide_requests(ride_id):
+    """Approve/reject many of a ride's requests in one transaction.
+
+    Body: {"decisions": [{"requestId": 1, "decision": "approve" | "reject"}, ...]}. Approvals are
+    taken in the order given while seats last; each item gets its own result, and items that fail
+    (not pending, not enough seats) don't stop the others.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    decisions = data.get('decisions')
+    if not isinstance(decisions, list) or not decisions:
+        return jsonify({'error': 'decisions must be a non-empty list'}), 400
+    if len(decisions) > REQUEST_BATCH_MAX:
+        return jsonify({'error': f'At most {REQUEST_BATCH_MAX} decisions per batch'}), 400
+    try:
+        decisions = [(int(item['requestId']), item['decision']) for item in decisions]
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'error': 'Each decision needs a requestId and a decision'}), 400
+    if any(decision not in ('approve', 'reject') for _, decision in decisions):
+        return jsonify({'error': "decision must be 'approve' or 'reject'"}), 400
+    
+    # Lock the ride row once for the whole batch (a no-op on SQLite, where the conditional
+    # UPDATEs below still refuse anything that changed since it was read)
+    ride = Ride.query.filter_by(id=ride_id).with_for_update().first()
+    if not ride:
+        return jsonify({'error': 'Ride not found'}), 404
+    if ride.publisher_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    requests = {r.id: r for r in Request.query.filter(
+        Request.ride_id == ride_id, Request.id.in_([request_id for request_id, _ in decisions])
+    )}
+    
+    # Seat arithmetic for the whole batch, in memory
+    seats_left = ride.available_seats
+    approve_ids, reject_ids, results, seen = [], [], [], set()
+    for request_id, decision in decisions:
+        request_obj = requests.get(request_id)
+        if request_obj is None:
+            error = 'Request not found for this ride'
+        elif request_id in seen:
+            error = 'Duplicate decision for this request'
+        elif request_obj.status != 'pending':
+            error = 'Request is no longer pending'
+        elif decision == 'approve' and request_obj.num_passengers > seats_left:
+            error = 'Not enough seats available'
+        else:
+            error = None
+        seen.add(request_id)
+        if error:
+            results.append({'requestId': request_id, 'decision': decision, 'ok': False, 'error': error})
+            continue
+        if decision == 'approve':
+            seats_left -= request_obj.num_passengers
+            approve_ids.append(request_id)
+        else:
+            reject_ids.append(request_id)
+        results.append({'requestId': request_id, 'decision': decision, 'ok': True,
+                        'status': 'approved' if decision == 'approve' else 'rejected'})
+    
+    # One UPDATE per outcome plus one for the seats; if anything moved underneath, apply nothing
+    changed = True
+    for ids, status in ((approve_ids, 'approved'), (reject_ids, 'rejected')):
+        if ids:
+            changed = changed and Request.query.filter(Request.id.in_(ids), Request.status == 'pending').update(
+                {Request.status: status}, synchronize_session=False
+            ) == len(ids)
+    reserved = ride.available_seats - seats_left
+    if not changed or (reserved and not reserve_seats(ride.id, reserved)):
+        db.session.rollback()
+        return jsonify({'error': 'Requests changed, please try again'}), 409
+    
+    if approve_ids or reject_ids:
+        bump_versions([user_id] + [requests[request_id].requestor_id for request_id in approve_ids + reject_ids], ride.id)
+    db.session.commit()
+    
+    if approve_ids:
+        invalidate_ride_searches(ride)
+    for ids, event_type in ((approve_ids, 'request_approved'), (reject_ids, 'request_rejected')):
+        for request_id in ids:
+            event_bus.publish([requests[request_id].requestor_id], event_type, {'rideId': ride_id, 'requestId': request_id})
+    
+    return jsonify({'results': results, 'availableSeats': seats_left}), 200
+
 # Chat Routes
 @app.route('/api/rides/<int:ride_id>/messages', methods=['GET'])
 @jwt_required()
 def get_messages(ride_id):
-    messages = ChatMessage.query.filter_by(ride_id=ride_id).order_by(ChatMessage.timestamp.asc()).all()
+    """Chat messages, oldest first, paged by message id.
+
+    - no cursor: the latest `limit` messages
+    - since_id: messages newer than since_id (for polling)
+    - before_id: the `limit` messages just before before_id (for scrolling back)
+    hasMore tells whether another page exists in the same direction.
+    """
+    # A cursor that doesn't parse is an error, not "no cursor" - that would hand a poller the latest page again
+    cursors = {}
+    for name in ('since_id', 'before_id'):
+        value = request.args.get(name)
+        try:
+            cursors[name] = int(value) if value is not None else None
+        except ValueError:
+            return jsonify({'error': f'Invalid {name}'}), 400
+    since_id, before_id = cursors['since_id'], cursors['before_id']
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    query = ChatMessage.query.filter_by(ride_id=ride_id).options(joinedload(ChatMessage.author))
+    if since_id is not None:
+        # Oldest first, starting right after the cursor
+        messages = query.filter(ChatMessage.id > since_id).order_by(ChatMessage.id.asc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    else:
+        # Newest first from the cursor (or the end), then flipped
+        if before_id is not None:
+            query = query.filter(ChatMessage.id < before_id)
+        messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit][::-1]
     
     result = []
     for msg in messages:
@@ -1322,7 +2488,7 @@ def get_messages(ride_id):
             'timestamp': msg.timestamp.isoformat()
         })
     
-    return jsonify({'messages': result}), 200
+    return jsonify({'messages': result, 'hasMore': has_more}), 200
 
 @app.route('/api/rides/<int:ride_id>/messages', methods=['POST'])
 @jwt_required()
@@ -1355,17 +2521,93 @@ def send_message(ride_id):
     db.session.add(message)
     db.session.commit()
     
+    message_data = {
+        'id': message.id,
+        'author': {
+            'id': message.author.id,
+            'name': message.author.name
+        },
+        'message': message.message,
+        'timestamp': message.timestamp.isoformat()
+    }
+    event_bus.publish(ride_member_ids(ride_id, ride.publisher_id), 'chat_message', {'rideId': ride_id, 'message': message_data})
+    
+    return jsonify({'message': message_data}), 201
+
+# Real-time events
+def events_busy_response():
+    response = Response(f'retry: {EVENTS_BUSY_RETRY_SECONDS * 1000}\n\n', status=503, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Retry-After'] = str(EVENTS_BUSY_RETRY_SECONDS)
+    return response
+
+@app.route('/api/events/token', methods=['POST'])
+@jwt_required()
+def event_stream_token():
+    """Short-lived token for opening /api/events/stream (keeps the access JWT out of URLs and logs).
+
+    EventSource can't read the status or headers of a failed stream, so this also answers 503 with
+    Retry-After while this worker has no free stream slot and the client backs off before reconnecting.
+    """
+    user_id = int(get_jwt_identity())
+    # Best effort - the stream itself enforces the cap
+    if not event_stream_slots.acquire(blocking=False):
+        return events_busy_response()
+    event_stream_slots.release()
     return jsonify({
-        'message': {
-            'id': message.id,
-            'author': {
-                'id': message.author.id,
-                'name': message.author.name
-            },
-            'message': message.message,
-            'timestamp': message.timestamp.isoformat()
-        }
-    }), 201
+        'token': serializer.dumps(user_id, salt='event-stream'),
+        'expiresIn': EVENTS_TOKEN_SECONDS
+    }), 200
+
+@app.route('/api/events/stream', methods=['GET'])
+def event_stream():
+    """Server-Sent Events for the user of ?token= (from POST /api/events/token): chat_message,
+    request_created, request_approved, request_rejected, passenger_removed, ride_cancelled
+    and ride_alert.
+
+    The stream ends after EVENTS_STREAM_SECONDS so it doesn't hold a worker thread forever;
+    EventSource reconnects with Last-Event-ID and missed events are replayed. At most
+    EVENTS_MAX_STREAMS streams are open per worker - past that the client gets a 503 with Retry-After.
+    """
+    token = request.args.get('token', '')
+    if not token:
+        return jsonify({'error': 'Stream token is required'}), 401
+    try:
+        user_id = int(serializer.loads(token, salt='event-stream', max_age=EVENTS_TOKEN_SECONDS))
+    except (BadData, TypeError, ValueError):
+        return jsonify({'error': 'Invalid or expired stream token'}), 401
+
+    if not event_stream_slots.acquire(blocking=False):
+        return events_busy_response()
+
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('lastEventId'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscription = event_bus.subscribe(user_id, last_event_id)
+
+    def generate():
+        yield f'retry: {EVENTS_RETRY_MS}\n\n'
+        deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=min(EVENTS_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0)))
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield event.encode()
+
+    def close():
+        event_bus.unsubscribe(subscription)
+        event_stream_slots.release()
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if the generator was never started
+    response.call_on_close(close)
+    return response
 
 # SOS Route (simulation)
 @app.route('/api/rides/<int:ride_id>/sos', methods=['POST'])
@@ -1403,17 +2645,17 @@ def reset_database():
         #     return jsonify({'error': 'Unauthorized'}), 403
         
         with app.app_context():
-            print("Dropping all tables...")
+            db_log.warning('Database reset: dropping all tables', extra={'remote_addr': request.remote_addr})
             db.drop_all()
-            print("Creating new tables...")
             db.create_all()
-            print("Database reset complete!")
+            db_log.warning('Database reset complete')
         
         return jsonify({
             'message': 'Database reset successfully. All tables dropped and recreated.',
             'status': 'success'
         }), 200
     except Exception as e:
+        db_log.exception('Database reset failed')
         return jsonify({
             'error': f'Failed to reset database: {str(e)}',
             'status': 'error'
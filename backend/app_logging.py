@@ -0,0 +1,148 @@
+"""
+Structured, non-blocking logging.
+
+Code logs to 'linklift.<subsystem>' loggers (auth, email, rides, events, http,
+db) with fields passed as extra={...}. Records are put on a bounded queue and a
+background thread formats them and writes them to stdout, one JSON object per
+line, so a request never waits on the log pipe. If the writer falls behind and
+the queue fills up, records are dropped and counted instead of blocking.
+
+Configuration (environment):
+
+- LOG_LEVEL: level for every subsystem (default INFO)
+- LOG_LEVEL_<SUBSYSTEM>: override one subsystem, e.g. LOG_LEVEL_EMAIL=DEBUG
+- LOG_FORMAT: json (default) or text for local development
+- LOG_ASYNC: false writes from the calling thread (debugging a crash)
+- LOG_QUEUE_SIZE: records buffered before dropping (default 10000)
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT_LOGGER = 'linklift'
+SUBSYSTEMS = ('auth', 'email', 'rides', 'events', 'http', 'db')
+
+# Attributes every LogRecord has - anything else came in through extra= and is a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, the extra fields and any exception"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain lines with the extra fields as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def formatMessage(self, record):
+        fields = ''.join(f' {key}={value}' for key, value in record_fields(record).items())
+        return super().formatMessage(record) + fields
+
+
+class _QueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve what may not outlive the call (args, traceback frames); formatting happens on the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Called under the handler lock
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room - the default put_nowait raises queue.Full when stopping with a full queue
+        self.queue.put(self._sentinel)
+
+
+_listener = None
+_queue_handler = None
+
+
+def _level(name):
+    level = logging.getLevelName(name.strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f'Unknown log level: {name}')
+    return level
+
+
+def setup_logging(stream=None, background=None):
+    """Configure the linklift loggers from the environment; calling it again replaces the previous setup"""
+    global _listener, _queue_handler
+    stop_logging()
+
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(TextFormatter() if os.getenv('LOG_FORMAT', 'json').lower() == 'text' else JSONFormatter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers.clear()
+    root.propagate = False
+    root.setLevel(_level(os.getenv('LOG_LEVEL', 'INFO')))
+    for subsystem in SUBSYSTEMS:
+        level = os.getenv(f'LOG_LEVEL_{subsystem.upper()}')
+        logging.getLogger(f'{ROOT_LOGGER}.{subsystem}').setLevel(_level(level) if level else logging.NOTSET)
+
+    if background is None:
+        background = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+    if background:
+        _queue_handler = _QueueHandler(queue.Queue(int(os.getenv('LOG_QUEUE_SIZE', 10000))))
+        _listener = _QueueListener(_queue_handler.queue, writer)
+        _listener.start()
+        root.addHandler(_queue_handler)
+    else:
+        root.addHandler(writer)
+
+
+def stop_logging():
+    """Write out everything still queued and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+    _listener = _queue_handler = None
+
+
+def dropped_records():
+    """Records dropped because the queue was full since setup_logging()"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+atexit.register(stop_logging)
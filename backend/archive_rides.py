@@ -0,0 +1,122 @@
+"""
+Move rides that departed more than --days ago out of the hot tables.
+
+Each ride is written to ride_archive as one zlib-compressed JSON document
+(the ride, its route stops, requests and chat messages), then the rows are
+deleted from ride, ride_stop, request and chat_message. Rides are handled in
+batches of --batch-size, one transaction per batch, so the job can be stopped
+at any point and simply run again: every batch is either fully archived or
+untouched. Saved searches whose date window has passed are deleted too. Run it
+daily (see render.yaml).
+
+Usage: python archive_rides.py [--days 90] [--batch-size 500] [--max-batches N] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy.orm import selectinload
+
+from app import app, db, bump_versions, Ride, RideStop, Request, ChatMessage, RideArchive, SavedSearch
+
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+
+
+def _columns(row):
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+
+def archive_payload(ride):
+    """The compressed archive document for a ride (with its relationships loaded)"""
+    document = {
+        'ride': _columns(ride),
+        'stops': [_columns(stop) for stop in ride.stops],
+        'requests': [_columns(request_obj) for request_obj in ride.requests],
+        'messages': [_columns(message) for message in sorted(ride.messages, key=lambda m: m.id)],
+    }
+    # Dates and times become ISO strings
+    return zlib.compress(json.dumps(document, default=lambda value: value.isoformat(), separators=(',', ':')).encode('utf-8'))
+
+
+def read_archive(archive):
+    """The JSON document stored for an archived ride"""
+    return json.loads(zlib.decompress(archive.payload))
+
+
+def archive_batch(before, batch_size):
+    """Archive up to batch_size rides dated before `before` in one transaction; returns (rides, requests, messages)"""
+    # SKIP LOCKED lets two overlapping runs split the work on PostgreSQL (ignored by SQLite)
+    rides = Ride.query.filter(Ride.date < before).order_by(Ride.date, Ride.id).limit(batch_size).options(
+        selectinload(Ride.stops), selectinload(Ride.requests), selectinload(Ride.messages)
+    ).with_for_update(skip_locked=True, of=Ride).all()
+    if not rides:
+        db.session.rollback()
+        return 0, 0, 0
+
+    ride_ids = [ride.id for ride in rides]
+    db.session.add_all(RideArchive(ride_id=ride.id, publisher_id=ride.publisher_id, date=ride.date, payload=archive_payload(ride))
+                       for ride in rides)
+    # The rides and requests disappear from my-published/my-requests
+    bump_versions({ride.publisher_id for ride in rides} | {r.requestor_id for ride in rides for r in ride.requests})
+    messages = ChatMessage.query.filter(ChatMessage.ride_id.in_(ride_ids)).delete(synchronize_session=False)
+    requests = Request.query.filter(Request.ride_id.in_(ride_ids)).delete(synchronize_session=False)
+    RideStop.query.filter(RideStop.ride_id.in_(ride_ids)).delete(synchronize_session=False)
+    Ride.query.filter(Ride.id.in_(ride_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    # Deleted in bulk, so drop the loaded objects rather than letting the session track them
+    db.session.expunge_all()
+    return len(rides), requests, messages
+
+
+def archive_rides(days=ARCHIVE_AFTER_DAYS, batch_size=500, max_batches=None, log=print):
+    """Archive every ride dated more than `days` days ago; returns (rides, requests, messages) archived"""
+    before = date.today() - timedelta(days=days)
+    totals = [0, 0, 0]
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        start = time.perf_counter()
+        counts = archive_batch(before, batch_size)
+        if not counts[0]:
+            break
+        batches += 1
+        totals = [total + count for total, count in zip(totals, counts)]
+        log(f"Batch {batches}: archived {counts[0]} rides, {counts[1]} requests, {counts[2]} messages "
+            f"in {time.perf_counter() - start:.2f}s")
+    return tuple(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='Archive rides dated more than this many days ago')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rides per transaction')
+    parser.add_argument('--max-batches', type=int, help='Stop after this many batches (run again to continue)')
+    parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+    args = parser.parse_args()
+
+    with app.app_context():
+        before = date.today() - timedelta(days=args.days)
+        if args.dry_run:
+            rides = Ride.query.filter(Ride.date < before).count()
+            print(f"{rides} rides dated before {before} would be archived")
+            expired = SavedSearch.query.filter(SavedSearch.date_to < date.today()).count()
+            print(f"{expired} expired saved searches would be deleted")
+            return
+        print(f"Archiving rides dated before {before} in batches of {args.batch_size}...")
+        start = datetime.now()
+        rides, requests, messages = archive_rides(args.days, args.batch_size, args.max_batches)
+        print(f"Archived {rides} rides, {requests} requests and {messages} messages in "
+              f"{(datetime.now() - start).total_seconds():.1f}s")
+        expired = SavedSearch.query.filter(SavedSearch.date_to < date.today()).delete(synchronize_session=False)
+        db.session.commit()
+        print(f"Deleted {expired} expired saved searches")
+
+
+if __name__ == '__main__':
+    main()
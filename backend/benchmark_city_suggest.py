@@ -0,0 +1,86 @@
+"""
+Microbenchmark for city autocomplete (cities.suggest_cities).
+
+Times one lookup for every 1-4 letter prefix of every catalog city name and of
+each part of hyphenated names, against filtering the whole catalog the way the
+client did. Both must return the same cities, and the prefix index fails if its
+median lookup takes longer than --budget-us microseconds.
+
+Usage: python benchmark_city_suggest.py [--rounds 5] [--limit 10] [--budget-us 50]
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from cities import CITIES, normalize_city_query, suggest_cities
+
+
+# Normalized name and name parts of every city, as a client filtering the full list would keep them
+NAME_PARTS = [(city, [normalize_city_query(city)] + re.split(r'[-\s]+', normalize_city_query(city))) for city in CITIES]
+
+
+def scan_catalog(query, limit):
+    """The cities suggest_cities can return, found by checking every name in the catalog"""
+    prefix = normalize_city_query(query)
+    return {city for city, parts in NAME_PARTS if any(part.startswith(prefix) for part in parts)}
+
+
+def prefixes():
+    """Every 1-4 letter prefix of each name and name part, as typed (mixed case)"""
+    queries = set()
+    for city in CITIES:
+        for part in [city] + re.split(r'[-\s]+', city):
+            queries.update(part[:length] for length in range(1, 5))
+    return sorted(queries)
+
+
+def timed(lookup, queries, limit, rounds):
+    """Median microseconds per lookup over all queries"""
+    per_lookup = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for query in queries:
+            lookup(query, limit)
+        per_lookup.append((time.perf_counter() - start) * 1e6 / len(queries))
+    return statistics.median(per_lookup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--budget-us', type=float, default=50.0)
+    args = parser.parse_args()
+
+    failed = False
+
+    def report(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {message}")
+
+    queries = prefixes()
+    # Every match is in the scan, and the index only stops early when it hits the limit
+    mismatched = []
+    for query in queries:
+        suggested, scanned = suggest_cities(query, args.limit), scan_catalog(query, args.limit)
+        if not set(suggested) <= scanned or len(suggested) != min(len(scanned), args.limit):
+            mismatched.append(query)
+    report(not mismatched, f"{len(queries)} prefixes: index matches a scan of the catalog"
+                           + (f" (differs for {', '.join(mismatched[:5])})" if mismatched else ''))
+
+    index_us = timed(suggest_cities, queries, args.limit, args.rounds)
+    scan_us = timed(scan_catalog, queries, args.limit, args.rounds)
+    report(index_us <= args.budget_us, f"suggest: {index_us:.1f} us per lookup (budget {args.budget_us} us), "
+                                       f"scan of {len(CITIES)} cities {scan_us:.1f} us ({scan_us / index_us:.0f}x slower)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark the multi-leg journey planner.
+
+Builds a JourneyIndex from --rides synthetic rides (default 100k) over the next
+30 days and times plans between random city pairs, checking every itinerary it
+returns (legs chain, connections respected). The endpoint itself is covered by
+tests/test_journey_planner.py.
+
+Usage: python benchmark_journey_planner.py [--rides 100000] [--plans 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from cities import INDIAN_CITIES
+from journey_planner import JourneyIndex
+
+
+def synthetic_rides(count, cities, seed=7):
+    """Rides over 2-5 cities (busier hubs picked more often), departing in the next 30 days"""
+    rng = random.Random(seed)
+    weights = [10 if i < 30 else 1 for i in range(len(cities))]
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    for ride_id in range(1, count + 1):
+        route = []
+        while len(route) < rng.randint(2, 5):
+            city = rng.choices(cities, weights)[0]
+            if city not in route:
+                route.append(city)
+        departs_at = start + timedelta(minutes=15 * rng.randrange(30 * 24 * 4))
+        yield ride_id, rng.randrange(1, 5000), route, departs_at, rng.randint(1, 6), rng.random() < 0.1, float(rng.randrange(100, 800, 10))
+
+
+def valid(index, origin, destination, depart_after, legs):
+    if legs[0].from_city != origin or legs[-1].to_city != destination or legs[0].departs_at < depart_after:
+        return False
+    for previous, leg in zip(legs, legs[1:]):
+        if leg.from_city != previous.to_city:
+            return False
+        if (leg.departs_at - previous.arrives_at).total_seconds() < index.min_connection_minutes * 60:
+            return False
+    return True
+
+
+def benchmark(args, report):
+    cities = list(INDIAN_CITIES[:300])
+    rides = list(synthetic_rides(args.rides, cities))
+    index = JourneyIndex()
+    start = time.perf_counter()
+    index.rebuild(rides)
+    build_seconds = time.perf_counter() - start
+    print(f"     built index of {len(index)} rides in {build_seconds:.2f}s")
+
+    rng = random.Random(11)
+    depart_after = datetime.now()
+    timings, found, by_rides, invalid = [], 0, {1: 0, 2: 0, 3: 0}, 0
+    for _ in range(args.plans):
+        origin, destination = rng.sample(cities, 2)
+        begin = time.perf_counter()
+        itineraries = index.plan(origin, destination, depart_after + timedelta(hours=rng.randrange(0, 24 * 20)))
+        timings.append((time.perf_counter() - begin) * 1000)
+        found += bool(itineraries)
+        for legs in itineraries:
+            by_rides[len(legs)] += 1
+            invalid += not valid(index, origin, destination, depart_after, legs)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95)]
+    report(invalid == 0, f"plans: {args.plans} random pairs, median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, "
+                         f"max {timings[-1]:.2f} ms; {found} with an itinerary ({by_rides[1]} direct, {by_rides[2]} with 1 transfer, "
+                         f"{by_rides[3]} with 2 transfers), {invalid} invalid")
+
+    new_rides = list(synthetic_rides(1000, cities, seed=99))
+    begin = time.perf_counter()
+    for ride in new_rides:
+        index.add(args.rides + ride[0], *ride[1:])
+    added = time.perf_counter() - begin
+    begin = time.perf_counter()
+    for ride in new_rides:
+        index.remove(args.rides + ride[0])
+    removed = time.perf_counter() - begin
+    report(len(index) == args.rides, f"incremental: add {added * 1000:.1f} us/ride, remove {removed * 1000:.1f} us/ride")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rides', type=int, default=100000)
+    parser.add_argument('--plans', type=int, default=500)
+    args = parser.parse_args()
+
+    failed = False
+
+    def report(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {message}")
+
+    benchmark(args, report)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark request latency with verbose logging on and off.
+
+Times searches and my-requests listings through the test client with:
+
+- quiet: LOG_LEVEL=INFO (the default), background writer
+- verbose: LOG_LEVEL=DEBUG, every request logged, background writer
+- verbose, synchronous: LOG_LEVEL=DEBUG written and flushed from the request
+  thread (LOG_ASYNC=false - what print() + flush used to do)
+
+Logs go to a temporary file. --stream-delay-ms makes every write to it sleep,
+to stand in for a slow or backed-up stdout pipe.
+
+Usage: python benchmark_logging.py [--rides 300] [--requests 300] [--stream-delay-ms 1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from scratch_database import use_scratch_database
+
+# Must be set before app is imported
+use_scratch_database('logging')
+
+from app import app, db
+from app_logging import setup_logging, stop_logging, dropped_records
+from seed_data import auth_headers, make_users, make_random_rides, make_request
+
+MODES = (
+    ('quiet', 'INFO', True),
+    ('verbose', 'DEBUG', True),
+    ('verbose, synchronous', 'DEBUG', False),
+)
+
+
+class SlowStream:
+    """A file whose writes take delay seconds, like a stdout pipe nobody is reading fast enough"""
+
+    def __init__(self, file, delay):
+        self.file = file
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rides', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=300, help='Requests per endpoint and mode')
+    parser.add_argument('--stream-delay-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        publishers = make_users(10)
+        passenger = publishers.pop()
+        rides = make_random_rides(publishers, args.rides)
+        for ride in rides[:20]:
+            make_request(ride, passenger)
+        db.session.commit()
+        headers = auth_headers(passenger)
+        db.session.remove()
+
+    calls = {
+        'search': lambda: client.post('/api/rides/search', headers=headers, json={'pickupCity': 'Delhi', 'dropCity': 'Chandigarh'}),
+        'my-requests': lambda: client.get('/api/requests/my-requests', headers=headers),
+    }
+    for call in calls.values():
+        call()
+
+    log_path = os.path.join(tempfile.mkdtemp(), 'app.log')
+    print(f"{args.requests} requests per endpoint, log writes delayed {args.stream_delay_ms} ms\n")
+    print(f"{'mode':<22} {'endpoint':<12} {'median ms':>10} {'p95 ms':>8} {'log lines':>10}")
+    for name, level, background in MODES:
+        os.environ['LOG_LEVEL'] = level
+        with open(log_path, 'w') as log_file:
+            setup_logging(SlowStream(log_file, args.stream_delay_ms / 1000), background=background)
+            for endpoint, call in calls.items():
+                timings = []
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    call()
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                print(f"{name:<22} {endpoint:<12} {statistics.median(timings):>10.2f} "
+                      f"{timings[int(len(timings) * 0.95)]:>8.2f}", end='')
+                # Count what reached the file so far (the writer thread may still be catching up)
+                log_file.flush()
+                with open(log_path) as written:
+                    print(f" {sum(1 for _ in written):>10}")
+            dropped = dropped_records()
+            stop_logging()
+        if dropped:
+            print(f"{'':<22} {dropped} records dropped (queue full)")
+
+
+if __name__ == '__main__':
+    main()
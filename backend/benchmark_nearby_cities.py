@@ -0,0 +1,74 @@
+"""
+Benchmark nearby-city lookups.
+
+For every city in the catalog and each --radii value, checks that the grid index
+returns exactly what a scan of the whole catalog does, and times both (the grid
+uncached and cached). radiusKm search is covered by tests/test_nearby_cities.py.
+
+Usage: python benchmark_nearby_cities.py [--radii 10,25,50] [--rounds 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from cities import CITIES, CITY_COORDINATES, distance_km, nearby_cities
+
+
+def scan_catalog(city, radius_km):
+    """nearby_cities without the index: distance to every city in the catalog"""
+    origin = CITY_COORDINATES[city]
+    found = sorted((distance_km(origin, CITY_COORDINATES[other]), other) for other in CITIES if other != city)
+    return (city,) + tuple(other for distance, other in found if distance <= radius_km)
+
+
+def timed(lookup, radius_km, rounds):
+    """Median microseconds per lookup over the whole catalog"""
+    per_lookup = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for city in CITIES:
+            lookup(city, radius_km)
+        per_lookup.append((time.perf_counter() - start) * 1e6 / len(CITIES))
+    return statistics.median(per_lookup)
+
+
+def benchmark(report, radii, rounds):
+    print(f"\n     {len(CITIES)} cities, median over {rounds} rounds")
+    print(f"     {'radius km':>9} {'avg nearby':>10} {'scan us':>9} {'grid us':>9} {'cached us':>10}")
+    for radius_km in radii:
+        mismatched = [city for city in CITIES if nearby_cities.__wrapped__(city, radius_km) != scan_catalog(city, radius_km)]
+        report(not mismatched, f"radius {radius_km} km: grid matches a full scan for every city"
+                               + (f" (differs for {', '.join(mismatched[:5])})" if mismatched else ''))
+        average = statistics.mean(len(nearby_cities(city, radius_km)) - 1 for city in CITIES)
+        scan_us = timed(scan_catalog, radius_km, rounds)
+        grid_us = timed(nearby_cities.__wrapped__, radius_km, rounds)
+        cached_us = timed(nearby_cities, radius_km, rounds)
+        print(f"     {radius_km:>9} {average:>10.1f} {scan_us:>9.1f} {grid_us:>9.1f} {cached_us:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--radii', default='10,25,50')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+
+    def report(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {message}")
+
+    report(set(CITY_COORDINATES) == set(CITIES), f"coordinates for all {len(CITIES)} catalog cities")
+    benchmark(report, [int(radius) for radius in args.radii.split(',')], args.rounds)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
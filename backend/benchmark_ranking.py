@@ -0,0 +1,74 @@
+"""
+Microbenchmark for the search ranking stage (ride_ranking.py).
+
+Scores --candidates synthetic candidates with the NumPy path (when installed)
+and the pure Python fallback, checks that both give the same scores and ranking,
+and fails if the stage (scoring + ranking) takes longer than --budget-ms.
+sort=best itself is covered by tests/test_ranking.py.
+
+Usage: python benchmark_ranking.py [--candidates 5000] [--budget-ms 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ride_ranking import NUMPY_AVAILABLE, DEFAULT_WEIGHTS, score_candidates, rank
+
+
+def synthetic_candidates(count, seed=5):
+    rng = random.Random(seed)
+    minutes_away = [rng.randrange(-600, 30 * 24 * 60) for _ in range(count)]
+    detour_stops = [rng.randrange(0, 5) for _ in range(count)]
+    costs = [float(rng.randrange(100, 800, 10)) for _ in range(count)]
+    capacities = [rng.randint(1, 7) for _ in range(count)]
+    free_seats = [rng.randint(0, capacity) for capacity in capacities]
+    return minutes_away, detour_stops, costs, free_seats, capacities
+
+
+def time_stage(columns, use_numpy, repeats=20):
+    """Median milliseconds for scoring + ranking all candidates"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scores = score_candidates(*columns, DEFAULT_WEIGHTS, use_numpy=use_numpy)
+        order = rank(scores, use_numpy=use_numpy)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), scores, order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, default=5000)
+    parser.add_argument('--budget-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    failed = False
+
+    def report(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {message}")
+
+    columns = synthetic_candidates(args.candidates)
+    python_ms, python_scores, python_order = time_stage(columns, use_numpy=False)
+    if NUMPY_AVAILABLE:
+        numpy_ms, numpy_scores, numpy_order = time_stage(columns, use_numpy=True)
+        same = max(abs(a - b) for a, b in zip(numpy_scores, python_scores)) < 1e-9 and numpy_order == python_order
+        report(same, f"numpy and python scores/ranking agree on {args.candidates} candidates")
+        report(numpy_ms <= args.budget_ms, f"numpy: {numpy_ms:.2f} ms for {args.candidates} candidates "
+                                           f"(budget {args.budget_ms} ms; python fallback {python_ms:.2f} ms, {python_ms / numpy_ms:.1f}x slower)")
+    else:
+        report(python_ms <= args.budget_ms, f"python fallback (numpy not installed): {python_ms:.2f} ms for "
+                                            f"{args.candidates} candidates (budget {args.budget_ms} ms)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Throughput benchmark for seat reservation.
+
+Seeds one ride with --seats seats and --requests pending one-passenger requests,
+then approves all of them at once from --threads threads and removes every
+approved passenger twice in parallel, printing approvals/s and removals/s.
+Exits with status 1 on any overbooking or leak (tests/test_seat_reservation.py
+checks the same on a smaller scale).
+
+Usage:
+    python benchmark_seat_reservation.py [--seats 10] [--requests 300] [--threads 32]
+    python benchmark_seat_reservation.py --database-url postgresql://...  # ALL DATA IS DROPPED!
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from scratch_database import use_scratch_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Throwaway database to seed (default: temporary SQLite file)')
+    parser.add_argument('--seats', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=32)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Must be set before app is imported
+    use_scratch_database('seats', args.database_url)
+
+    from app import app, db, Ride, Request
+    from seed_data import auth_headers, make_users, make_ride, make_request
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        publisher, *requestors = make_users(args.requests + 1)
+        ride = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', datetime.now() + timedelta(days=1), seats=args.seats)
+        db.session.flush()
+        requests = [make_request(ride, requestor) for requestor in requestors]
+        db.session.commit()
+        ride_id = ride.id
+        request_ids = [request_obj.id for request_obj in requests]
+        headers = auth_headers(publisher)
+        db.session.remove()
+
+    def put(path):
+        return app.test_client().put(path, headers=headers).status_code
+
+    def run(paths):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            statuses = Counter(pool.map(put, paths))
+        return statuses, time.perf_counter() - start
+
+    def seats_and_approved():
+        with app.app_context():
+            seats = db.session.get(Ride, ride_id).available_seats
+            approved = Request.query.filter_by(ride_id=ride_id, status='approved').count()
+            db.session.remove()
+        return seats, approved
+
+    failed = False
+
+    # 1. Everyone races for the seats
+    statuses, seconds = run([f'/api/requests/{request_id}/approve' for request_id in request_ids])
+    seats, approved = seats_and_approved()
+    ok = statuses[200] == approved == args.seats and seats == 0 and set(statuses) <= {200, 400}
+    failed = failed or not ok
+    print(f"{'OK  ' if ok else 'FAIL'} approve: {len(request_ids)} approvals for {args.seats} seats from {args.threads} threads "
+          f"-> {statuses[200]} approved, {statuses[400]} refused, other {sum(statuses.values()) - statuses[200] - statuses[400]}; "
+          f"available_seats={seats}, approved rows={approved} "
+          f"({len(request_ids) / seconds:.0f} approvals/s)")
+
+    # 2. Every approved passenger removed twice at once - seats are released once each
+    with app.app_context():
+        approved_ids = [request_id for (request_id,) in
+                        db.session.query(Request.id).filter_by(ride_id=ride_id, status='approved')]
+        db.session.remove()
+    statuses, seconds = run([f'/api/requests/{request_id}/remove' for request_id in approved_ids * 2])
+    seats, approved = seats_and_approved()
+    ok = statuses[200] == len(approved_ids) and seats == args.seats and approved == 0 and set(statuses) <= {200, 400}
+    failed = failed or not ok
+    print(f"{'OK  ' if ok else 'FAIL'} remove: {len(approved_ids) * 2} removals of {len(approved_ids)} passengers "
+          f"-> {statuses[200]} removed, {statuses[400]} refused; available_seats={seats} (capacity {args.seats}) "
+          f"({len(approved_ids) * 2 / seconds:.0f} removals/s)")
+
+    with app.app_context():
+        db.drop_all()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark ride serialization per endpoint.
+
+1. Serialization only: for each endpoint's ride fields, builds and encodes the
+   dicts for --rides loaded rides the old way (hand-built dicts, json.loads of
+   the route and strftime for every ride, stdlib json with sorted keys) and with
+   serializers.py, and checks both produce the same dicts.
+2. End to end: times each listing endpoint through the test client with all
+   fields and with ?fields=id,date,time.
+
+Usage: python benchmark_serialization.py [--rides 500] [--repeats 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from scratch_database import use_scratch_database
+
+# Must be set before app is imported
+use_scratch_database('serialization')
+
+from sqlalchemy.orm import joinedload
+
+from app import app, db, Ride
+from seed_data import auth_headers, make_users, make_ride, make_request
+from serializers import (ORJSON_AVAILABLE, RIDE_DETAIL_FIELDS, CREATED_RIDE_FIELDS, PUBLISHED_RIDE_FIELDS,
+                         REQUESTED_RIDE_FIELDS, ride_to_dict, dumps)
+
+ENDPOINT_FIELDS = {
+    'create_ride': CREATED_RIDE_FIELDS,
+    'search_rides / get_ride_details': RIDE_DETAIL_FIELDS,
+    'get_my_published_rides': PUBLISHED_RIDE_FIELDS,
+    'get_my_requests': REQUESTED_RIDE_FIELDS,
+}
+
+
+def legacy_ride_dict(ride, fields):
+    """A ride dict built the way the endpoints used to, every field computed eagerly"""
+    publisher = ride.publisher
+    data = {
+        'id': ride.id,
+        'publisher': {'id': publisher.id, 'name': publisher.name, 'email': publisher.email},
+        'pickupCity': ride.pickup_city,
+        'dropCity': ride.drop_city,
+        'pickupAddress': ride.pickup_address,
+        'dropAddress': ride.drop_address,
+        'onRouteCities': json.loads(ride.on_route_cities) if ride.on_route_cities else [],
+        'date': ride.date.isoformat(),
+        'time': ride.time.strftime('%H:%M'),
+        'availableSeats': ride.available_seats,
+        'capacity': ride.capacity,
+        'costPerPerson': ride.cost_per_person,
+        'carModel': ride.car_model,
+        'licensePlate': ride.license_plate,
+        'womenOnly': ride.women_only,
+        'createdAt': ride.created_at.isoformat(),
+        'templateId': ride.template_id
+    }
+    return {name: data[name] for name in fields if name in data}
+
+
+def first_difference(rides, fields):
+    """Where the legacy and current dicts first disagree, or None if they never do"""
+    for ride in rides:
+        legacy, current = legacy_ride_dict(ride, fields), ride_to_dict(ride, fields)
+        for name in sorted(legacy.keys() | current.keys()):
+            if legacy.get(name, '<missing>') != current.get(name, '<missing>'):
+                return (f"dicts differ: ride {ride.id} field {name}: "
+                        f"{legacy.get(name, '<missing>')!r} != {current.get(name, '<missing>')!r}")
+    return None
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rides', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    failed = False
+
+    def report(ok, message):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {message}")
+
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        publisher, passenger = make_users(2)
+        start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        rides = [make_ride(publisher, 'Delhi', ['Panipat', 'Karnal', 'Ambala'], 'Chandigarh', start + timedelta(minutes=30 * i))
+                 for i in range(args.rides)]
+        db.session.flush()
+        for ride in rides:
+            make_request(ride, passenger)
+        db.session.commit()
+        ride_id = rides[0].id
+        publisher_headers, passenger_headers = auth_headers(publisher), auth_headers(passenger)
+        db.session.remove()
+
+        # 1. Serialization only, on rides already loaded
+        loaded = Ride.query.options(joinedload(Ride.publisher)).all()
+        print(f"     serialization of {len(loaded)} rides (encoder: {'orjson' if ORJSON_AVAILABLE else 'json'})")
+        for endpoint, fields in ENDPOINT_FIELDS.items():
+            difference = first_difference(loaded, fields)
+            legacy = median_ms(lambda: json.dumps([legacy_ride_dict(ride, fields) for ride in loaded], sort_keys=True), args.repeats)
+            current = median_ms(lambda: dumps([ride_to_dict(ride, fields) for ride in loaded]), args.repeats)
+            report(difference is None, f"{endpoint}: {legacy * 1000 / len(loaded):.1f} -> {current * 1000 / len(loaded):.1f} us/ride "
+                                       f"({legacy / current:.1f}x), " + (difference or 'same dicts'))
+        db.session.remove()
+
+    # 2. End to end
+    calls = {
+        'search_rides': lambda query: client.post(f'/api/rides/search{query}', headers=passenger_headers,
+                                                  json={'pickupCity': 'Delhi', 'dropCity': 'Chandigarh', 'limit': 100}),
+        'get_my_published_rides': lambda query: client.get(f'/api/rides/my-published{query}', headers=publisher_headers),
+        'get_my_requests': lambda query: client.get(f'/api/requests/my-requests{query}', headers=passenger_headers),
+        'get_ride_details': lambda query: client.get(f'/api/rides/{ride_id}{query}', headers=publisher_headers),
+    }
+    for endpoint, call in calls.items():
+        sizes = {}
+        for query in ('', '?fields=id,date,time'):
+            response = call(query)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            sizes[query] = (median_ms(lambda: call(query), args.repeats), len(response.data))
+        (full_ms, full_bytes), (lean_ms, lean_bytes) = sizes.values()
+        print(f"     {endpoint}: all fields {full_ms:.2f} ms / {full_bytes} bytes, "
+              f"?fields=id,date,time {lean_ms:.2f} ms / {lean_bytes} bytes")
+
+    response = calls['get_my_published_rides']('?fields=id,nope')
+    report(response.status_code == 400, f"unknown field: {response.status_code} {response.get_json()}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
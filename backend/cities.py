@@ -1,3 +1,12 @@
+import bisect
+import hashlib
+import json
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
 # List of major Indian cities
 INDIAN_CITIES = [
     "Mumbai", "Delhi", "Bangalore", "Hyderabad", "Chennai", "Kolkata",
@@ -99,14 +108,167 @@ INDIAN_CITIES = [
     "Yercaud", "Zirakpur", "Zunheboto"
 ]
 
+# Approximate (latitude, longitude) of every city in INDIAN_CITIES, for nearby-city search
+CITY_COORDINATES = {
+    "Mumbai": (19.08, 72.88), "Delhi": (28.61, 77.21), "Bangalore": (12.97, 77.59), "Hyderabad": (17.39, 78.49), "Chennai": (13.08, 80.27), "Kolkata": (22.57, 88.36), "Pune": (18.52, 73.86), "Ahmedabad": (23.02, 72.57), "Jaipur": (26.91, 75.79), "Surat": (21.17, 72.83), "Lucknow": (26.85, 80.95), "Kanpur": (26.45, 80.33),
+    "Nagpur": (21.15, 79.09), "Indore": (22.72, 75.86), "Thane": (19.22, 72.98), "Bhopal": (23.26, 77.41), "Visakhapatnam": (17.69, 83.22), "Pimpri-Chinchwad": (18.63, 73.8), "Patna": (25.59, 85.14), "Vadodara": (22.31, 73.18), "Ghaziabad": (28.67, 77.45), "Ludhiana": (30.9, 75.86), "Agra": (27.18, 78.01), "Nashik": (20.0, 73.79),
+    "Faridabad": (28.41, 77.32), "Meerut": (28.98, 77.71), "Rajkot": (22.3, 70.8), "Varanasi": (25.32, 83.01), "Srinagar": (34.08, 74.8), "Amritsar": (31.63, 74.87), "Navi Mumbai": (19.03, 73.03), "Allahabad": (25.44, 81.85), "Howrah": (22.59, 88.31), "Ranchi": (23.34, 85.31), "Gwalior": (26.22, 78.18), "Jabalpur": (23.18, 79.99),
+    "Coimbatore": (11.02, 76.96), "Vijayawada": (16.51, 80.65), "Jodhpur": (26.24, 73.02), "Madurai": (9.93, 78.12), "Raipur": (21.25, 81.63), "Kota": (25.21, 75.86), "Guwahati": (26.14, 91.74), "Chandigarh": (30.73, 76.78), "Solapur": (17.66, 75.91), "Hubli-Dharwad": (15.4, 75.07), "Bareilly": (28.37, 79.43), "Mysore": (12.3, 76.64),
+    "Moradabad": (28.84, 78.77), "Gurgaon": (28.46, 77.03), "Aligarh": (27.88, 78.08), "Jalandhar": (31.33, 75.58), "Tiruchirappalli": (10.79, 78.7), "Bhubaneswar": (20.3, 85.82), "Salem": (11.66, 78.15), "Warangal": (17.97, 79.59), "Guntur": (16.31, 80.44), "Bhiwandi": (19.3, 73.06), "Saharanpur": (29.96, 77.55), "Gorakhpur": (26.76, 83.37),
+    "Bikaner": (28.02, 73.31), "Amravati": (20.93, 77.75), "Noida": (28.54, 77.39), "Jamshedpur": (22.8, 86.2), "Bhilai": (21.21, 81.38), "Cuttack": (20.46, 85.88), "Firozabad": (27.15, 78.4), "Kochi": (9.93, 76.27), "Nellore": (14.44, 79.99), "Bhavnagar": (21.76, 72.15), "Dehradun": (30.32, 78.03), "Durgapur": (23.52, 87.31),
+    "Asansol": (23.68, 86.98), "Rourkela": (22.26, 84.85), "Nanded": (19.14, 77.32), "Kolhapur": (16.7, 74.24), "Ajmer": (26.45, 74.64), "Akola": (20.71, 77.0), "Gulbarga": (17.33, 76.83), "Jamnagar": (22.47, 70.06), "Ujjain": (23.18, 75.78), "Loni": (28.75, 77.29), "Siliguri": (26.73, 88.4), "Jhansi": (25.45, 78.57),
+    "Ulhasnagar": (19.22, 73.16), "Jammu": (32.73, 74.86), "Sangli-Miraj": (16.83, 74.61), "Mangalore": (12.91, 74.86), "Erode": (11.34, 77.72), "Belgaum": (15.85, 74.5), "Ambattur": (13.11, 80.16), "Tirunelveli": (8.71, 77.76), "Malegaon": (20.55, 74.53), "Gaya": (24.79, 85.0), "Jalgaon": (21.0, 75.56), "Udaipur": (24.59, 73.71),
+    "Maheshtala": (22.51, 88.25), "Tirupur": (11.11, 77.34), "Davanagere": (14.46, 75.92), "Kozhikode": (11.26, 75.78), "Kurnool": (15.83, 78.04), "Rajahmundry": (17.0, 81.8), "Bokaro": (23.67, 86.15), "South Dumdum": (22.61, 88.41), "Bellary": (15.14, 76.92), "Patiala": (30.34, 76.39), "Gopalpur": (19.26, 84.91), "Agartala": (23.83, 91.29),
+    "Bhagalpur": (25.24, 86.98), "Muzaffarnagar": (29.47, 77.7), "Bhatpara": (22.87, 88.41), "Panihati": (22.69, 88.37), "Latur": (18.41, 76.56), "Dhule": (20.9, 74.77), "Rohtak": (28.9, 76.61), "Korba": (22.35, 82.68), "Bhilwara": (25.35, 74.63), "Berhampur": (19.31, 84.79), "Muzaffarpur": (26.12, 85.39), "Ahmednagar": (19.09, 74.74),
+    "Mathura": (27.49, 77.67), "Kollam": (8.89, 76.61), "Avadi": (13.12, 80.1), "Kadapa": (14.47, 78.82), "Kamarhati": (22.67, 88.37), "Sambalpur": (21.47, 83.97), "Bilaspur": (22.08, 82.15), "Shahjahanpur": (27.88, 79.91), "Satara": (17.68, 74.02), "Bijapur": (16.83, 75.71), "Rampur": (28.8, 79.03), "Shivamogga": (13.93, 75.57),
+    "Chandrapur": (19.96, 79.3), "Junagadh": (21.52, 70.46), "Thrissur": (10.53, 76.21), "Alwar": (27.55, 76.63), "Bardhaman": (23.23, 87.86), "Kulti": (23.73, 86.85), "Nizamabad": (18.67, 78.09), "Parbhani": (19.26, 76.77), "Tumkur": (13.34, 77.1), "Khammam": (17.25, 80.15), "Ozhukarai": (11.95, 79.77), "Bihar Sharif": (25.2, 85.52),
+    "Panipat": (29.39, 76.97), "Darbhanga": (26.15, 85.9), "Bally": (22.65, 88.34), "Aizawl": (23.73, 92.72), "Dewas": (22.97, 76.05), "Ichalkaranji": (16.69, 74.46), "Karnal": (29.69, 76.99), "Bathinda": (30.21, 74.95), "Jalna": (19.84, 75.89), "Eluru": (16.71, 81.1), "Barasat": (22.72, 88.48), "Kirari Suleman Nagar": (28.7, 77.05),
+    "Purnia": (25.78, 87.47), "Katihar": (25.54, 87.57), "Navi Mumbai-Panvel": (18.99, 73.12), "Sangrur": (30.25, 75.84), "Bulandshahr": (28.4, 77.85), "Munger": (25.38, 86.47), "Panchkula": (30.69, 76.86), "Burhanpur": (21.31, 76.23), "Khandwa": (21.82, 76.35), "Morena": (26.5, 78.0), "Raebareli": (26.23, 81.23), "Bhiwani": (28.79, 76.13),
+    "Bharatpur": (27.22, 77.49), "Hapur": (28.73, 77.78), "Barmer": (25.75, 71.39), "Dhanbad": (23.8, 86.43), "Bhind": (26.56, 78.79), "Chittorgarh": (24.88, 74.62), "Haldia": (22.06, 88.07), "Habra": (22.84, 88.66), "Ongole": (15.5, 80.05), "Nadiad": (22.69, 72.86), "Chhapra": (25.78, 84.73), "Hajipur": (25.69, 85.21),
+    "Sikar": (27.61, 75.14), "Port Blair": (11.62, 92.73), "Karaikudi": (10.07, 78.78), "Mirzapur": (25.15, 82.57), "Fatehpur": (25.93, 80.81), "Raiganj": (25.62, 88.12), "Bhusawal": (21.05, 75.78), "Bidar": (17.91, 77.52), "Gangtok": (27.33, 88.61), "Dharmavaram": (14.41, 77.72), "Medininagar": (24.04, 84.07), "Gandhinagar": (23.22, 72.65),
+    "Baranagar": (22.64, 88.37), "Tinsukia": (27.49, 95.36), "Balurghat": (25.22, 88.77), "Nagaon": (26.35, 92.68), "Lakhimpur": (27.95, 80.78), "Sitapur": (27.57, 80.68), "Hoshiarpur": (31.53, 75.91), "Ambala": (30.38, 76.78), "Hardwar": (29.95, 78.16), "Rishikesh": (30.09, 78.27), "Kashipur": (29.21, 78.96), "Roorkee": (29.85, 77.89),
+    "Rudrapur": (28.98, 79.4), "Haldwani": (29.22, 79.51), "Nainital": (29.38, 79.46), "Almora": (29.6, 79.66), "Pithoragarh": (29.58, 80.22), "Chamoli": (30.4, 79.32), "Pauri": (30.15, 78.78), "Tehri": (30.38, 78.48), "Uttarkashi": (30.73, 78.44), "Champawat": (29.34, 80.09), "Bageshwar": (29.84, 79.77), "Alappuzha": (9.5, 76.34),
+    "Anand": (22.56, 72.95), "Anantapur": (14.68, 77.6), "Aurangabad": (19.88, 75.34), "Baddi": (30.96, 76.79), "Bahadurgarh": (28.69, 76.92), "Ballabhgarh": (28.34, 77.32), "Bettiah": (26.8, 84.5), "Bhiwadi": (28.21, 76.86), "Bongaigaon": (26.48, 90.56), "Budaun": (28.03, 79.13), "Chandausi": (28.45, 78.78), "Chhindwara": (22.06, 78.94),
+    "Chitradurga": (14.23, 76.4), "Chittoor": (13.22, 79.1), "Cooch Behar": (26.32, 89.45), "Cuddalore": (11.75, 79.75), "Dabhoi": (22.18, 73.43), "Dahod": (22.84, 74.26), "Daman": (20.4, 72.83), "Darjeeling": (27.04, 88.26), "Dharamshala": (32.22, 76.32), "Dharwad": (15.46, 75.01), "Dholpur": (26.7, 77.89), "Dibrugarh": (27.47, 94.91),
+    "Dimapur": (25.91, 93.73), "Dindigul": (10.36, 77.98), "Diu": (20.71, 70.98), "Dombivli": (19.22, 73.09), "Dumka": (24.27, 87.25), "Etah": (27.56, 78.66), "Etawah": (26.78, 79.02), "Faizabad": (26.78, 82.14), "Faridkot": (30.68, 74.76), "Farrukhabad": (27.39, 79.58), "Fatehabad": (29.52, 75.45), "Firozpur": (30.93, 74.61),
+    "Gadag": (15.43, 75.63), "Gandhidham": (23.08, 70.13), "Gangapur": (26.47, 76.72), "Ganjam": (19.39, 85.07), "Ghazipur": (25.58, 83.58), "Giridih": (24.19, 86.3), "Godhra": (22.78, 73.61), "Gokak": (16.17, 74.83), "Gonda": (27.13, 81.96), "Gondia": (21.46, 80.2), "Gopalganj": (26.47, 84.44), "Gudivada": (16.44, 80.99),
+    "Guna": (24.65, 77.31), "Guntakal": (15.17, 77.37), "Gurdaspur": (32.04, 75.4), "Hamirpur": (31.68, 76.52), "Hanumangarh": (29.58, 74.33), "Hardoi": (27.4, 80.13), "Hassan": (13.0, 76.1), "Hathras": (27.6, 78.05), "Hazaribagh": (23.99, 85.36), "Hisar": (29.15, 75.72), "Hoshangabad": (22.75, 77.72), "Hospet": (15.27, 76.39),
+    "Hubli": (15.36, 75.12), "Imphal": (24.82, 93.94), "Itanagar": (27.08, 93.61), "Jagdalpur": (19.08, 82.02), "Jagraon": (30.79, 75.47), "Jagtial": (18.79, 78.91), "Jalpaiguri": (26.52, 88.72), "Jamalpur": (25.31, 86.49), "Jamui": (24.92, 86.22), "Jangaon": (17.72, 79.15), "Jatani": (20.17, 85.71), "Jhalawar": (24.6, 76.16),
+    "Jhargram": (22.45, 86.99), "Jhunjhunu": (28.13, 75.4), "Jind": (29.32, 76.31), "Jorhat": (26.75, 94.2), "Kadiri": (14.11, 78.16), "Kaithal": (29.8, 76.4), "Kakinada": (16.99, 82.25), "Kalaburagi": (17.33, 76.83), "Kalimpong": (27.06, 88.47), "Kalpetta": (11.61, 76.08), "Kalyani": (22.98, 88.43), "Kamareddy": (18.32, 78.34),
+    "Kancheepuram": (12.83, 79.7), "Kandla": (23.03, 70.22), "Kangra": (32.1, 76.27), "Kannauj": (27.06, 79.92), "Kapurthala": (31.38, 75.38), "Karaikal": (10.92, 79.84), "Karimnagar": (18.44, 79.13), "Karur": (10.96, 78.08), "Karwar": (14.81, 74.13), "Kasganj": (27.81, 78.65), "Kasaragod": (12.5, 74.99), "Kathua": (32.37, 75.52),
+    "Katni": (23.83, 80.39), "Kavali": (14.91, 79.99), "Kayamkulam": (9.17, 76.5), "Kendujhar": (21.63, 85.58), "Keshod": (21.3, 70.25), "Khagaria": (25.5, 86.48), "Khanna": (30.7, 76.22), "Kharagpur": (22.35, 87.23), "Khargone": (21.82, 75.61), "Khatima": (28.92, 79.97), "Kheda": (22.75, 72.68), "Kheri": (27.9, 80.8),
+    "Khurda": (20.18, 85.62), "Kishanganj": (26.1, 87.95), "Kishangarh": (26.59, 74.86), "Kodagu": (12.34, 75.81), "Kodungallur": (10.23, 76.2), "Kohima": (25.67, 94.11), "Kolar": (13.14, 78.13), "Koppal": (15.35, 76.15), "Koraput": (18.81, 82.71), "Kotdwara": (29.75, 78.52), "Kothagudem": (17.55, 80.62), "Kottakkal": (11.0, 76.0),
+    "Kottayam": (9.59, 76.52), "Kovilpatti": (9.17, 77.87), "Krishnagiri": (12.52, 78.21), "Krishnanagar": (23.4, 88.5), "Kullu": (31.96, 77.11), "Kumbakonam": (10.96, 79.38), "Kumta": (14.43, 74.42), "Kundapura": (13.63, 74.69), "Kurukshetra": (29.97, 76.88), "Kushinagar": (26.74, 83.89), "Lalitpur": (24.69, 78.41), "Laxmangarh": (27.82, 75.03),
+    "Leh": (34.15, 77.58), "Lohardaga": (23.43, 84.68), "Machilipatnam": (16.19, 81.14), "Madanapalle": (13.55, 78.5), "Madhubani": (26.35, 86.07), "Madikeri": (12.42, 75.74), "Mahbubnagar": (16.74, 78.0), "Mahesana": (23.6, 72.38), "Mahoba": (25.29, 79.87), "Mainpuri": (27.23, 79.02), "Malda": (25.01, 88.14), "Malkapur": (20.88, 76.2),
+    "Mancherial": (18.87, 79.46), "Mandla": (22.6, 80.37), "Mandsaur": (24.07, 75.07), "Mandya": (12.52, 76.9), "Mangalagiri": (16.43, 80.57), "Mangrol": (21.12, 70.12), "Manjeri": (11.12, 76.12), "Mannargudi": (10.66, 79.45), "Manor": (19.73, 72.92), "Mansa": (29.98, 75.38), "Margao": (15.28, 73.96), "Mattancherry": (9.96, 76.26),
+    "Mehsana": (23.6, 72.38), "Mettur": (11.79, 77.8), "Mhow": (22.55, 75.76), "Miryalaguda": (16.87, 79.56), "Modinagar": (28.83, 77.58), "Moga": (30.82, 75.17), "Mohali": (30.7, 76.72), "Morvi": (22.82, 70.84), "Motihari": (26.65, 84.92), "Muktsar": (30.47, 74.52), "Murshidabad": (24.18, 88.27), "Nabadwip": (23.41, 88.37),
+    "Nalanda": (25.14, 85.44), "Nalgonda": (17.06, 79.27), "Nandurbar": (21.37, 74.24), "Nandyal": (15.48, 78.48), "Nangal": (31.39, 76.37), "Narasaraopet": (16.24, 80.05), "Narayanpet": (16.74, 77.5), "Narnaul": (28.04, 76.11), "Narsinghpur": (22.95, 79.19), "Nathdwara": (24.93, 73.82), "Navsari": (20.95, 72.93), "Nawada": (24.89, 85.54),
+    "Nawanshahr": (31.12, 76.12), "Nawashahr": (31.12, 76.12), "Nayagarh": (20.13, 85.1), "Neemuch": (24.47, 74.87), "Neyveli": (11.54, 79.48), "Nongpoh": (25.9, 91.88), "Nongstoin": (25.52, 91.27), "North Lakhimpur": (27.24, 94.1), "Nowgong": (25.06, 79.44), "Orai": (25.99, 79.45), "Osmanabad": (18.18, 76.04), "Ottapalam": (10.77, 76.38),
+    "Pachmarhi": (22.47, 78.43), "Padrauna": (26.9, 83.98), "Palanpur": (24.17, 72.43), "Palayankottai": (8.72, 77.73), "Palghar": (19.7, 72.77), "Pali": (25.77, 73.32), "Palitana": (21.52, 71.83), "Palladam": (10.99, 77.29), "Pallavaram": (12.97, 80.15), "Palwal": (28.14, 77.33), "Panaji": (15.5, 73.83), "Pandharpur": (17.68, 75.33),
+    "Peddapuram": (17.08, 82.14), "Perambalur": (11.23, 78.88), "Perinthalmanna": (10.98, 76.23), "Phagwara": (31.22, 75.77), "Phulbani": (20.47, 84.23), "Pilibhit": (28.63, 79.8), "Pithampur": (22.61, 75.68), "Pollachi": (10.66, 77.01), "Pondicherry": (11.94, 79.81), "Porbandar": (21.64, 69.61), "Pratapgarh": (25.9, 81.94), "Proddatur": (14.75, 78.55),
+    "Pudukkottai": (10.38, 78.82), "Pulwama": (33.87, 74.9), "Puri": (19.81, 85.83), "Purulia": (23.33, 86.36), "Pusa": (25.98, 85.67), "Pushkar": (26.49, 74.55), "Raichur": (16.21, 77.36), "Raigarh": (21.9, 83.4), "Rajapalayam": (9.45, 77.55), "Rajgarh": (24.01, 76.73), "Rajnandgaon": (21.1, 81.03), "Rajsamand": (25.07, 73.88),
+    "Ramanathapuram": (9.37, 78.83), "Ranaghat": (23.18, 88.57), "Ranikhet": (29.64, 79.43), "Rasipuram": (11.46, 78.18), "Ratlam": (23.33, 75.04), "Ratnagiri": (16.99, 73.31), "Rewa": (24.53, 81.3), "Rewari": (28.19, 76.62), "Robertsganj": (24.69, 83.07), "Ropar": (30.97, 76.53), "Sagar": (23.84, 78.74), "Saharsa": (25.88, 86.6),
+    "Sahibganj": (25.25, 87.64), "Saidapur": (16.48, 77.37), "Samastipur": (25.86, 85.78), "Sambhal": (28.58, 78.57), "Sangli": (16.85, 74.58), "Santipur": (23.25, 88.43), "Saran": (25.85, 84.85), "Sasaram": (24.95, 84.03), "Satna": (24.58, 80.83), "Sawai Madhopur": (26.02, 76.35), "Sehore": (23.2, 77.08), "Seoni": (22.09, 79.54),
+    "Shahdol": (23.3, 81.36), "Shajapur": (23.43, 76.28), "Shamli": (29.45, 77.31), "Sheikhpura": (25.14, 85.84), "Sheopur": (25.67, 76.7), "Shillong": (25.58, 91.89), "Shimla": (31.1, 77.17), "Shimoga": (13.93, 75.57), "Shivpuri": (25.42, 77.66), "Sholapur": (17.66, 75.91), "Siddharthnagar": (27.3, 83.07), "Silchar": (24.83, 92.78),
+    "Sindhudurg": (16.12, 73.69), "Singrauli": (24.2, 82.67), "Sirohi": (24.89, 72.86), "Sirsa": (29.53, 75.03), "Sitamarhi": (26.59, 85.49), "Solan": (30.9, 77.1), "Sonipat": (28.99, 77.02), "Sopore": (34.3, 74.47), "Srikakulam": (18.3, 83.9), "Srirangam": (10.86, 78.69), "Srivilliputhur": (9.51, 77.63), "Sultanpur": (26.26, 82.07),
+    "Sundargarh": (22.12, 84.03), "Surendranagar": (22.73, 71.64), "Suryapet": (17.14, 79.62), "Tadepalligudem": (16.81, 81.53), "Tadpatri": (14.91, 78.01), "Talegaon Dabhade": (18.73, 73.68), "Tamluk": (22.3, 87.92), "Tandur": (17.25, 77.58), "Tanuku": (16.75, 81.68), "Tarakeswar": (22.89, 88.02), "Tarn Taran": (31.45, 74.93), "Tenali": (16.24, 80.64),
+    "Tezpur": (26.63, 92.8), "Thalassery": (11.75, 75.49), "Thanjavur": (10.79, 79.14), "Theni": (10.01, 77.48), "Thiruvalla": (9.38, 76.57), "Thiruvananthapuram": (8.52, 76.94), "Thiruvarur": (10.77, 79.64), "Thodupuzha": (9.89, 76.72), "Thoothukudi": (8.76, 78.13), "Tikamgarh": (24.74, 78.83), "Tirupati": (13.63, 79.42), "Tiruvannamalai": (12.23, 79.07),
+    "Titagarh": (22.74, 88.37), "Tonk": (26.17, 75.79), "Tuni": (17.36, 82.55), "Udgir": (18.39, 77.12), "Udhampur": (32.93, 75.14), "Udupi": (13.34, 74.75), "Umred": (20.85, 79.33), "Una": (31.47, 76.27), "Unnao": (26.55, 80.49), "Uppal": (17.4, 78.56), "Uran": (18.88, 72.94), "Vaduz": (47.14, 9.52),
+    "Vaishali": (25.99, 85.13), "Valsad": (20.61, 72.93), "Vaniyambadi": (12.68, 78.62), "Vapi": (20.37, 72.9), "Varkala": (8.73, 76.72), "Vasai-Virar": (19.39, 72.84), "Vellore": (12.92, 79.13), "Veraval": (20.91, 70.37), "Vidisha": (23.52, 77.81), "Vikarabad": (17.34, 77.9), "Villupuram": (11.94, 79.49), "Vinukonda": (16.05, 79.74),
+    "Virudhunagar": (9.58, 77.96), "Vizianagaram": (18.11, 83.4), "Wardha": (20.74, 78.6), "Washim": (20.11, 77.13), "Wayanad": (11.7, 76.13), "Yamunanagar": (30.13, 77.28), "Yavatmal": (20.39, 78.12), "Yemmiganur": (15.77, 77.48), "Yercaud": (11.78, 78.21), "Zirakpur": (30.64, 76.82), "Zunheboto": (26.01, 94.52),
+}
+
+# Catalog built once at import time - INDIAN_CITIES never changes at runtime
+CITIES = tuple(sorted(set(INDIAN_CITIES)))  # sorted, unique - for listing
+CITY_SET = frozenset(CITIES)  # O(1) membership checks
+
+# Pre-encoded /api/cities response body and its strong ETag
+CITIES_JSON = json.dumps({'cities': CITIES}, separators=(',', ':')).encode('utf-8')
+CITIES_ETAG = hashlib.sha256(CITIES_JSON).hexdigest()[:32]
+
 def get_cities():
     """Return sorted list of unique cities"""
-    # Remove duplicates while preserving order, then sort
-    seen = set()
-    unique_cities = []
-    for city in INDIAN_CITIES:
-        if city not in seen:
-            seen.add(city)
-            unique_cities.append(city)
-    return sorted(unique_cities)
+    return list(CITIES)
+
+def is_valid_city(city):
+    """Return True if city is in the catalog"""
+    return city in CITY_SET
+
+def normalize_city_query(text):
+    """Lowercase and strip diacritics so 'Bhubaneswar', 'bhubanéswar' and 'BHUBANESWAR' compare equal"""
+    decomposed = unicodedata.normalize('NFKD', text.strip())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def _build_suggest_index():
+    """Sorted (key, rank, city) entries - one for the full name and one per component.
+
+    Components are split on hyphens and spaces so 'Dharwad' finds 'Hubli-Dharwad'.
+    Rank prefers full-name matches, then catalog order (INDIAN_CITIES starts
+    with the largest cities), then name.
+    """
+    first_position = {}
+    for position, city in enumerate(INDIAN_CITIES):
+        first_position.setdefault(city, position)
+
+    entries = set()
+    for city in CITIES:
+        full_key = normalize_city_query(city)
+        entries.add((full_key, (0, first_position[city], city), city))
+        for part in re.split(r'[-\s]+', full_key):
+            if part and part != full_key:
+                entries.add((part, (1, first_position[city], city), city))
+    entries = sorted(entries)
+    return tuple(entry[0] for entry in entries), tuple(entries)
+
+_SUGGEST_KEYS, _SUGGEST_ENTRIES = _build_suggest_index()
+
+def suggest_cities(query, limit=10):
+    """Return up to `limit` cities whose name, or a component of it, starts with query"""
+    prefix = normalize_city_query(query)
+    if not prefix or limit <= 0:
+        return []
+
+    # All keys starting with prefix form one contiguous run in the sorted keys
+    start = bisect.bisect_left(_SUGGEST_KEYS, prefix)
+    end = bisect.bisect_left(_SUGGEST_KEYS, prefix + '\uffff', lo=start)
+
+    best = {}
+    for key, rank, city in _SUGGEST_ENTRIES[start:end]:
+        if key == prefix and rank[0] == 0:
+            rank = (-1,) + rank[1:]  # exact name match goes first
+        if city not in best or rank < best[city]:
+            best[city] = rank
+    return sorted(best, key=best.get)[:limit]
+
+# Nearby-city index: cities bucketed into a grid of GRID_DEGREES x GRID_DEGREES cells
+# (about 55 km north-south), built once at import time
+EARTH_RADIUS_KM = 6371.0
+GRID_DEGREES = 0.5
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def distance_km(a, b):
+    """Great-circle (haversine) distance between two (lat, lon) points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+def _grid_cell(lat, lon):
+    return math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES)
+
+def _build_grid():
+    grid = defaultdict(list)
+    for city in CITIES:
+        lat, lon = CITY_COORDINATES[city]
+        grid[_grid_cell(lat, lon)].append((city, (lat, lon)))
+    return {cell: tuple(entries) for cell, entries in grid.items()}
+
+_GRID = _build_grid()
+
+@lru_cache(maxsize=8192)
+def nearby_cities(city, radius_km):
+    """Catalog cities within radius_km of city, nearest first, starting with city itself.
+
+    Only the grid cells overlapping the radius' bounding box are scanned.
+    A city without coordinates (or radius_km <= 0) is just (city,).
+    """
+    origin = CITY_COORDINATES.get(city)
+    if origin is None or radius_km <= 0:
+        return (city,)
+
+    lat, lon = origin
+    lat_span = radius_km / KM_PER_DEGREE
+    # A degree of longitude shrinks towards the poles - size the box at its widest latitude
+    widest = min(abs(lat) + lat_span, 89.0)
+    lon_span = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+    min_row, min_col = _grid_cell(lat - lat_span, lon - lon_span)
+    max_row, max_col = _grid_cell(lat + lat_span, lon + lon_span)
 
+    found = []
+    for row in range(min_row, max_row + 1):
+        for col in range(min_col, max_col + 1):
+            for other, point in _GRID.get((row, col), ()):
+                if other != city:
+                    distance = distance_km(origin, point)
+                    if distance <= radius_km:
+                        found.append((distance, other))
+    return (city,) + tuple(other for _, other in sorted(found))
@@ -0,0 +1,154 @@
+"""
+Durable outbound email queue.
+
+Emails are written to the email_outbox table and delivered in batches by a
+small, fixed pool of worker threads. Because the queue lives in the database,
+nothing is lost when a gunicorn worker is recycled: pending rows (and rows left
+in 'sending' by a worker that died mid-batch) are picked up again by the next
+worker that starts. Failed sends are retried with exponential backoff.
+"""
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+log = logging.getLogger('linklift.email')
+
+
+class EmailQueue:
+    def __init__(self, app, db, model, deliver_batch, workers=2, batch_size=20, max_attempts=5,
+                 retry_base_seconds=30, retry_max_seconds=3600, poll_interval=5, stale_after_seconds=600):
+        """
+        deliver_batch(emails) sends a list of model rows and returns a dict of
+        {email_id: error message} for the ones that failed.
+        """
+        self.app = app
+        self.db = db
+        self.model = model
+        self.deliver_batch = deliver_batch
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.poll_interval = poll_interval
+        self.stale_after_seconds = stale_after_seconds
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._threads = []
+
+    def enqueue(self, to_email, subject, html):
+        """Add an email to the outbox and commit the current session (including any pending changes)"""
+        return self.enqueue_many([(to_email, subject, html)])[0]
+
+    def enqueue_many(self, emails):
+        """Add (to_email, subject, html) emails to the outbox in one commit"""
+        rows = [self.model(to_email=to_email, subject=subject, html=html) for to_email, subject, html in emails]
+        self.db.session.add_all(rows)
+        self.db.session.commit()
+        self.start()
+        self._wakeup.set()
+        return rows
+
+    def start(self):
+        """Start the worker threads once per process (no-op if already running)"""
+        if self._threads or self.workers <= 0:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'email-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def process_once(self):
+        """Claim and deliver one batch in the calling thread; returns the number of emails attempted"""
+        with self.app.app_context():
+            try:
+                batch = self._claim_batch()
+                if batch:
+                    self._deliver(batch)
+                return len(batch)
+            finally:
+                self.db.session.remove()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                attempted = self.process_once()
+            except Exception:
+                log.exception('Email worker error')
+                attempted = 0
+            if not attempted:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _ready_filter(self, now):
+        model = self.model
+        return or_(
+            and_(model.status == 'pending', model.next_attempt_at <= now),
+            # Claimed by a worker that never finished (e.g. process recycled mid-send)
+            and_(model.status == 'sending', model.locked_at < now - timedelta(seconds=self.stale_after_seconds))
+        )
+
+    def _claim_batch(self):
+        """Mark up to batch_size ready emails as 'sending' for this worker and return them.
+
+        The claim is a conditional UPDATE tagged with a unique token, so two
+        workers (or processes) never deliver the same row.
+        """
+        model = self.model
+        now = datetime.utcnow()
+        ready = self._ready_filter(now)
+        ids = [row.id for row in self.db.session.query(model.id).filter(ready).order_by(model.id).limit(self.batch_size)]
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        model.query.filter(model.id.in_(ids), ready).update(
+            {'status': 'sending', 'claimed_by': token, 'locked_at': now},
+            synchronize_session=False
+        )
+        self.db.session.commit()
+        return model.query.filter_by(claimed_by=token, status='sending').order_by(model.id).all()
+
+    def _deliver(self, batch):
+        try:
+            errors = self.deliver_batch(batch)
+        except Exception as e:
+            log.exception('Email delivery failed', extra={'emails': len(batch)})
+            errors = {email.id: f'{type(e).__name__}: {e}' for email in batch}
+
+        now = datetime.utcnow()
+        for email in batch:
+            email.attempts += 1
+            error = errors.get(email.id)
+            if error is None:
+                email.status = 'sent'
+                email.sent_at = now
+                email.last_error = None
+            elif email.attempts >= self.max_attempts:
+                email.status = 'failed'
+                email.last_error = error
+                log.error('Email failed permanently', extra={'to': email.to_email, 'attempts': email.attempts, 'error': error})
+            else:
+                delay = min(self.retry_base_seconds * 2 ** (email.attempts - 1), self.retry_max_seconds)
+                email.status = 'pending'
+                email.next_attempt_at = now + timedelta(seconds=delay)
+                email.last_error = error
+                log.warning('Email will be retried', extra={'to': email.to_email, 'attempts': email.attempts,
+                                                            'max_attempts': self.max_attempts, 'delay': delay, 'error': error})
+        self.db.session.commit()
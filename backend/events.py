@@ -0,0 +1,233 @@
+"""
+Per-user event fan-out for the Server-Sent Events stream.
+
+Endpoints call EventBus.publish(user_ids, event_type, data) after committing a
+change; every open /api/events/stream connection of those users receives the
+event. The bus itself is in-process. A backend carries events between
+processes so every gunicorn worker sees every event:
+
+- LocalBackend (default): single process, events are delivered directly
+- SocketBackend ("tcp://host:port"): the local_pubsub.py broker
+- RedisBackend ("redis://..."): Redis pub/sub, if the redis package is installed
+
+Each process keeps a short per-user history, so a client reconnecting with
+Last-Event-ID gets the events it missed.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from queue import Queue, Empty, Full
+from urllib.parse import urlparse
+
+# Try to import redis (optional - only needed for EVENTS_BACKEND=redis://...)
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+log = logging.getLogger('linklift.events')
+
+
+class Event:
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self):
+        """Format as an SSE message"""
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n'
+
+
+class Subscription:
+    def __init__(self, user_id, max_queued=100):
+        self.user_id = user_id
+        self.queue = Queue(maxsize=max_queued)
+
+    def get(self, timeout):
+        """Next event, or None if nothing arrived within timeout seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except Full:
+            # Slow client - drop; it resyncs with a full fetch on reconnect
+            pass
+
+
+class EventBus:
+    def __init__(self, backend=None, history_size=50):
+        self.backend = backend or LocalBackend()
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # user_id -> {Subscription}
+        self._history = defaultdict(lambda: deque(maxlen=self.history_size))  # user_id -> recent Events
+        self._last_id = 0
+        self.backend.start(self._deliver)
+
+    def publish(self, user_ids, event_type, data):
+        """Send an event to every open stream of the given users"""
+        user_ids = sorted({int(user_id) for user_id in user_ids if user_id is not None})
+        if not user_ids:
+            return
+        self.backend.publish({'id': self._next_id(), 'users': user_ids, 'type': event_type, 'data': data})
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Register a stream; events newer than last_event_id are replayed into it"""
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+            if last_event_id is not None:
+                for event in self._history.get(user_id, ()):
+                    if event.id > last_event_id:
+                        subscription.put(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _next_id(self):
+        # Time based so ids from different processes still order correctly
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            return self._last_id
+
+    def _deliver(self, message):
+        """Called by the backend for every published message (from any process)"""
+        event = Event(message['id'], message['type'], message['data'])
+        with self._lock:
+            self._last_id = max(self._last_id, event.id)
+            for user_id in message['users']:
+                self._history[user_id].append(event)
+                for subscription in self._subscribers.get(user_id, ()):
+                    subscription.put(event)
+
+
+class LocalBackend:
+    """Single process - deliver directly"""
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, message):
+        self.deliver(message)
+
+
+class SocketBackend:
+    """Newline-delimited JSON over TCP to the local_pubsub.py broker, which echoes every message to all workers"""
+
+    def __init__(self, host, port, reconnect_seconds=2):
+        self.host = host
+        self.port = port
+        self.reconnect_seconds = reconnect_seconds
+        self._send_lock = threading.Lock()
+        self._sock = None
+
+    def start(self, deliver):
+        self.deliver = deliver
+        threading.Thread(target=self._read_loop, name='events-reader', daemon=True).start()
+
+    def publish(self, message):
+        line = (json.dumps(message) + '\n').encode('utf-8')
+        with self._send_lock:
+            try:
+                if self._sock is None:
+                    raise ConnectionError('not connected to event broker')
+                self._sock.sendall(line)
+                return
+            except OSError as e:
+                log.warning('Event broker unavailable, delivering locally only', extra={'error': str(e)})
+        # Degrade to this process only rather than losing the event
+        self.deliver(message)
+
+    def _read_loop(self):
+        while True:
+            try:
+                sock = socket.create_connection((self.host, self.port))
+                with self._send_lock:
+                    self._sock = sock
+                reader = sock.makefile('rb')
+                for line in reader:
+                    try:
+                        self.deliver(json.loads(line))
+                    except Exception:
+                        log.exception('Failed to deliver event from broker')
+            except OSError as e:
+                log.warning('Cannot reach event broker', extra={'host': self.host, 'port': self.port, 'error': str(e)})
+            with self._send_lock:
+                if self._sock is not None:
+                    self._sock.close()
+                self._sock = None
+            time.sleep(self.reconnect_seconds)
+
+
+class RedisBackend:
+    CHANNEL = 'linklift-events'
+
+    def __init__(self, url, reconnect_seconds=2):
+        self.client = redis.Redis.from_url(url)
+        self.reconnect_seconds = reconnect_seconds
+
+    def start(self, deliver):
+        self.deliver = deliver
+        threading.Thread(target=self._read_loop, name='events-reader', daemon=True).start()
+
+    def publish(self, message):
+        try:
+            self.client.publish(self.CHANNEL, json.dumps(message))
+        except redis.RedisError as e:
+            log.warning('Redis unavailable, delivering events locally only', extra={'error': str(e)})
+            self.deliver(message)
+
+    def _read_loop(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for item in pubsub.listen():
+                    self.deliver(json.loads(item['data']))
+            except Exception as e:
+                log.warning('Redis event subscription failed', extra={'error': str(e)})
+            time.sleep(self.reconnect_seconds)
+
+
+def stream_slots(threads, requested=None):
+    """How many streams one worker may hold open with this many threads.
+
+    Each open stream occupies a thread, so at least one is always left for the
+    API. Defaults to half the threads; 0 means the worker serves no streams.
+    """
+    if requested is None:
+        requested = threads // 2
+    return max(min(requested, threads - 1), 0)
+
+
+def backend_from_url(url):
+    """Pick the backend for EVENTS_BACKEND ('', 'local', 'tcp://host:port' or 'redis://...')"""
+    if not url or url == 'local':
+        return LocalBackend()
+    parsed = urlparse(url)
+    if parsed.scheme == 'tcp':
+        return SocketBackend(parsed.hostname or '127.0.0.1', parsed.port or 6390)
+    if parsed.scheme in ('redis', 'rediss'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError('EVENTS_BACKEND is a redis:// URL but the redis package is not installed')
+        return RedisBackend(url)
+    raise ValueError(f'Unsupported EVENTS_BACKEND: {url}')
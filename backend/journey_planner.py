@@ -0,0 +1,213 @@
+"""
+Multi-leg journey planner over published rides.
+
+Rides form a time-expanded graph: a ride visits the cities of its route
+[pickup_city, ...on_route_cities, drop_city] in order, leaving the pickup at
+its published date/time. Only that departure is known, so the time at every
+later stop is estimated as minutes_per_stop per hop along the route.
+
+JourneyIndex keeps every upcoming ride in memory, with each city's departures
+sorted by time, and is updated ride by ride as rides are published, cancelled
+or change seats. plan() runs RAPTOR-style rounds: round n finds the earliest
+arrival at every city using exactly n rides, boarding only departures within
+the allowed connection window after the previous arrival. A city's arrival is
+only kept when it beats every earlier round, so the itineraries returned are
+the Pareto set of (number of rides, arrival time).
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(2000, 1, 1)
+
+
+def to_minutes(moment):
+    return int((moment - _EPOCH).total_seconds() // 60)
+
+
+def from_minutes(minutes):
+    return _EPOCH + timedelta(minutes=minutes)
+
+
+class Trip:
+    """One ride as the planner sees it; times are minutes since _EPOCH, estimated after the pickup"""
+    __slots__ = ('ride_id', 'publisher_id', 'cities', 'times', 'seats', 'women_only', 'cost')
+
+    def __init__(self, ride_id, publisher_id, cities, times, seats, women_only, cost):
+        self.ride_id = ride_id
+        self.publisher_id = publisher_id
+        self.cities = cities
+        self.times = times
+        self.seats = seats
+        self.women_only = women_only
+        self.cost = cost
+
+
+class Leg:
+    __slots__ = ('trip', 'board', 'alight')
+
+    def __init__(self, trip, board, alight):
+        self.trip = trip
+        self.board = board  # index into trip.cities
+        self.alight = alight
+
+    @property
+    def from_city(self):
+        return self.trip.cities[self.board]
+
+    @property
+    def to_city(self):
+        return self.trip.cities[self.alight]
+
+    @property
+    def departs_at(self):
+        return from_minutes(self.trip.times[self.board])
+
+    @property
+    def arrives_at(self):
+        return from_minutes(self.trip.times[self.alight])
+
+
+class JourneyIndex:
+    def __init__(self, minutes_per_stop=60, min_connection_minutes=30, max_wait_minutes=12 * 60, max_journey_hours=48):
+        self.minutes_per_stop = minutes_per_stop
+        self.min_connection_minutes = min_connection_minutes
+        self.max_wait_minutes = max_wait_minutes
+        self.max_journey_minutes = max_journey_hours * 60
+        self._lock = threading.RLock()
+        self._trips = {}  # ride_id -> Trip
+        self._departures = {}  # city -> ([departure minute], [ride_id], [stop index]) sorted by minute
+        self.max_ride_id = 0
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._trips)
+
+    def rebuild(self, rides, now=None, max_ride_id=0):
+        """Replace the whole index; rides are (ride_id, publisher_id, cities, departs_at, seats, women_only, cost).
+
+        max_ride_id is the newest ride id already seen (indexed or not), where catch-ups resume.
+        The new index is built aside and swapped in, so plans keep running on the old one meanwhile.
+        """
+        fresh = JourneyIndex(self.minutes_per_stop, self.min_connection_minutes, self.max_wait_minutes,
+                             self.max_journey_minutes // 60)
+        for ride in rides:
+            fresh._add(*ride, keep_sorted=False)
+        for times, ride_ids, stops in fresh._departures.values():
+            order = sorted(range(len(times)), key=times.__getitem__)
+            times[:] = [times[i] for i in order]
+            ride_ids[:] = [ride_ids[i] for i in order]
+            stops[:] = [stops[i] for i in order]
+        with self._lock:
+            self._trips = fresh._trips
+            self._departures = fresh._departures
+            self.max_ride_id = max(fresh.max_ride_id, max_ride_id)
+            self.built_at = now or datetime.now()
+
+    def add(self, ride_id, publisher_id, cities, departs_at, seats, women_only, cost):
+        """Add a ride (or replace it if it is already indexed)"""
+        with self._lock:
+            self._remove(ride_id)
+            self._add(ride_id, publisher_id, cities, departs_at, seats, women_only, cost)
+
+    def remove(self, ride_id):
+        with self._lock:
+            self._remove(ride_id)
+
+    def set_seats(self, ride_id, seats):
+        with self._lock:
+            trip = self._trips.get(ride_id)
+            if trip is not None:
+                trip.seats = seats
+
+    def plan(self, origin, destination, depart_after, passengers=1, women_only=False, exclude_publisher_id=None, max_rides=3):
+        """Itineraries (lists of Legs) from origin to destination using up to max_rides rides, fewest rides first"""
+        start = to_minutes(depart_after)
+        deadline = start + self.max_journey_minutes
+        unreachable = deadline + 1
+
+        def usable(trip):
+            return (trip.seats >= passengers and trip.publisher_id != exclude_publisher_id
+                    and (trip.women_only or not women_only))
+
+        with self._lock:
+            best = {origin: start}  # best arrival per city over all rounds so far
+            rounds = [{origin: (start, None)}]  # per round: city -> (arrival, (previous city, Leg))
+            marked = [origin]
+            for round_number in range(1, max_rides + 1):
+                previous, current = rounds[-1], {}
+                for city in marked:
+                    departures = self._departures.get(city)
+                    if departures is None:
+                        continue
+                    times, ride_ids, stops = departures
+                    arrival = previous[city][0]
+                    if round_number == 1:
+                        first, last = arrival, deadline
+                    else:
+                        first, last = arrival + self.min_connection_minutes, min(arrival + self.max_wait_minutes, deadline)
+                    for i in range(bisect_left(times, first), bisect_right(times, last)):
+                        trip = self._trips[ride_ids[i]]
+                        if not usable(trip):
+                            continue
+                        board = stops[i]
+                        for alight in range(board + 1, len(trip.cities)):
+                            arrives = trip.times[alight]
+                            # Target pruning: never worth continuing past the best known arrival at the destination
+                            if arrives > deadline or arrives >= best.get(destination, unreachable):
+                                break
+                            stop_city = trip.cities[alight]
+                            if arrives < best.get(stop_city, unreachable):
+                                best[stop_city] = arrives
+                                current[stop_city] = (arrives, (city, Leg(trip, board, alight)))
+                if not current:
+                    break
+                rounds.append(current)
+                marked = list(current)
+
+            itineraries = []
+            for round_number in range(1, len(rounds)):
+                if destination in rounds[round_number]:
+                    itineraries.append(self._itinerary(rounds, round_number, destination))
+            return itineraries
+
+    def _itinerary(self, rounds, round_number, destination):
+        legs = []
+        city = destination
+        for number in range(round_number, 0, -1):
+            city, leg = rounds[number][city][1]
+            legs.append(leg)
+        legs.reverse()
+        return legs
+
+    def _add(self, ride_id, publisher_id, cities, departs_at, seats, women_only, cost, keep_sorted=True):
+        departure = to_minutes(departs_at)
+        times = [departure + i * self.minutes_per_stop for i in range(len(cities))]
+        self._trips[ride_id] = Trip(ride_id, publisher_id, tuple(cities), tuple(times), seats, bool(women_only), cost)
+        self.max_ride_id = max(self.max_ride_id, ride_id)
+        # Only cities the ride continues from are departures
+        for stop, city in enumerate(cities[:-1]):
+            city_times, city_rides, city_stops = self._departures.setdefault(city, ([], [], []))
+            if keep_sorted:
+                position = bisect_right(city_times, times[stop])
+                city_times.insert(position, times[stop])
+                city_rides.insert(position, ride_id)
+                city_stops.insert(position, stop)
+            else:
+                city_times.append(times[stop])
+                city_rides.append(ride_id)
+                city_stops.append(stop)
+
+    def _remove(self, ride_id):
+        trip = self._trips.pop(ride_id, None)
+        if trip is None:
+            return
+        if ride_id == self.max_ride_id:
+            # SQLite reuses the highest id after a delete - make sure the next catch-up sees it
+            self.max_ride_id = max(self._trips, default=0)
+        for stop, city in enumerate(trip.cities[:-1]):
+            city_times, city_rides, city_stops = self._departures[city]
+            position = bisect_left(city_times, trip.times[stop])
+            while city_rides[position] != ride_id:
+                position += 1
+            del city_times[position], city_rides[position], city_stops[position]
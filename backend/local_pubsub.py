@@ -0,0 +1,72 @@
+"""
+Minimal local pub/sub broker so several gunicorn workers can share SSE events.
+
+Every newline-delimited message a client sends is forwarded to all connected
+clients (including the sender). Start it next to the app and set:
+
+    EVENTS_BACKEND=tcp://127.0.0.1:6390
+
+Usage: python local_pubsub.py [--port 6390]
+"""
+import argparse
+import socketserver
+import threading
+
+
+class _PubSubHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.clients.add(self.wfile)
+        try:
+            for line in self.rfile:
+                server.broadcast(line)
+        finally:
+            with server.lock:
+                server.clients.discard(self.wfile)
+
+
+class LocalPubSubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _PubSubHandler)
+        self.lock = threading.Lock()
+        self.clients = set()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def broadcast(self, line):
+        # Under the lock so lines from different publishers never interleave
+        with self.lock:
+            for wfile in list(self.clients):
+                try:
+                    wfile.write(line)
+                    wfile.flush()
+                except OSError:
+                    self.clients.discard(wfile)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local pub/sub broker for sharing SSE events between workers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    server = LocalPubSubServer(args.host, args.port)
+    print(f"Local pub/sub broker listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
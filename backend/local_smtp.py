@@ -0,0 +1,111 @@
+"""
+Minimal local SMTP server for development and the email tests.
+
+Accepts any AUTH PLAIN login and stores received messages in memory instead of
+delivering them. Point the app at it with:
+
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=False
+    MAIL_USERNAME=dev MAIL_PASSWORD=dev
+
+Usage: python local_smtp.py [--port 1025]
+"""
+import argparse
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost LinkLift local SMTP')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').rstrip('\r\n')
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                mail_from, recipients = command[10:].strip('<> '), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip('<> '))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    # Undo dot-stuffing
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                server.record(mail_from, recipients, b''.join(data))
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """In-memory SMTP server; use as a context manager to run it in a background thread"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, verbose=False):
+        super().__init__((host, port), _SMTPHandler)
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.messages = []  # (mail_from, recipients, raw message bytes)
+        self.connections = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record(self, mail_from, recipients, data):
+        with self.lock:
+            self.messages.append((mail_from, recipients, data))
+        if self.verbose:
+            print(f"Received message from {mail_from} to {', '.join(recipients)} ({len(data)} bytes)")
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local SMTP stand-in that prints received messages')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+
+    server = LocalSMTPServer(args.host, args.port, verbose=True)
+    print(f"Local SMTP server listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
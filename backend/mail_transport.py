@@ -0,0 +1,238 @@
+"""
+Reusable mail transports for the email queue.
+
+SMTPPool keeps up to `size` authenticated SMTP connections open between batches,
+so a burst of verification emails pays the TCP/TLS handshake and login once per
+connection instead of once per message. SendGridTransport keeps a persistent
+HTTPS (keep-alive) connection to the SendGrid API per worker thread. Idle
+connections are closed and reopened before the server drops them, and every
+send is timed in SendMetrics.
+"""
+import http.client
+import json
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-message rejections - the connection itself is still usable afterwards
+SMTP_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused)
+
+
+class SendMetrics:
+    """Thread-safe latency/outcome counters for one transport"""
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sends = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.connections_opened = 0
+        self.bucket_counts = [0] * len(self.BUCKETS)
+
+    def observe(self, seconds, ok=True):
+        with self._lock:
+            self.sends += 1
+            if not ok:
+                self.failures += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'sends': self.sends,
+                'failures': self.failures,
+                'avg_ms': round(self.total_seconds / self.sends * 1000, 2) if self.sends else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 2),
+                'total_seconds': self.total_seconds,
+                'connections_opened': self.connections_opened,
+                'buckets': list(zip(self.BUCKETS, self.bucket_counts)),
+            }
+
+
+class SMTPPool:
+    def __init__(self, host, port, username, password, use_tls=True, timeout=10, size=2, idle_timeout=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.metrics = SendMetrics()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # (smtp, last_used monotonic time)
+
+    def connect(self):
+        """Open and authenticate a new SMTP connection"""
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            _close_quietly(smtp)
+            raise
+        self.metrics.connection_opened()
+        return smtp
+
+    @contextmanager
+    def session(self):
+        """Borrow a pooled connection for a batch of sends (blocks while all `size` are in use)"""
+        self._slots.acquire()
+        session = None
+        try:
+            session = _SMTPSession(self, self._checkout())
+            yield session
+        finally:
+            if session is not None:
+                self._checkin(session.smtp, session.broken)
+            self._slots.release()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            _close_quietly(smtp)
+
+    def _checkout(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, last_used = self._idle.pop()
+            if now - last_used < self.idle_timeout:
+                return smtp
+            # Servers drop idle sessions; reconnect instead of failing the next send
+            _close_quietly(smtp)
+        return self.connect()
+
+    def _checkin(self, smtp, broken):
+        if smtp is None:
+            return
+        if broken:
+            _close_quietly(smtp)
+            return
+        with self._lock:
+            self._idle.append((smtp, time.monotonic()))
+
+
+class _SMTPSession:
+    def __init__(self, pool, smtp):
+        self.pool = pool
+        self.smtp = smtp
+        self.broken = False
+
+    def send(self, sender, recipients, message_bytes):
+        start = time.perf_counter()
+        ok = False
+        try:
+            try:
+                self.smtp.sendmail(sender, recipients, message_bytes)
+            except smtplib.SMTPServerDisconnected:
+                # Dropped while idle in the pool - reconnect once
+                _close_quietly(self.smtp)
+                self.smtp = None
+                self.smtp = self.pool.connect()
+                self.smtp.sendmail(sender, recipients, message_bytes)
+            ok = True
+        except SMTP_MESSAGE_ERRORS:
+            raise
+        except Exception:
+            self.broken = True
+            raise
+        finally:
+            self.pool.metrics.observe(time.perf_counter() - start, ok)
+
+
+class SendGridTransport:
+    """POSTs to the SendGrid v3 API over a keep-alive HTTPS connection per thread"""
+    HOST = 'api.sendgrid.com'
+    PATH = '/v3/mail/send'
+
+    def __init__(self, api_key, timeout=10, idle_timeout=60, host=HOST, use_https=True):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.host = host
+        self.use_https = use_https
+        self.metrics = SendMetrics()
+        self._local = threading.local()
+
+    def send(self, payload):
+        """Send a v3 mail/send payload; returns (status code, response body)"""
+        body = json.dumps(payload).encode('utf-8')
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+        }
+        start = time.perf_counter()
+        ok = False
+        try:
+            conn, reused = self._connection()
+            try:
+                status, data = self._post(conn, body, headers)
+            except (http.client.HTTPException, OSError):
+                self._drop_connection()
+                if not reused:
+                    raise
+                # The server closed the kept-alive connection - retry once on a new one
+                conn, _ = self._connection()
+                status, data = self._post(conn, body, headers)
+            ok = status in (200, 202)
+            return status, data
+        finally:
+            self.metrics.observe(time.perf_counter() - start, ok)
+
+    def _post(self, conn, body, headers):
+        conn.request('POST', self.PATH, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        self._local.last_used = time.monotonic()
+        if response.will_close:
+            self._drop_connection()
+        return response.status, data
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and time.monotonic() - self._local.last_used >= self.idle_timeout:
+            self._drop_connection()
+            conn = None
+        if conn is not None:
+            return conn, True
+        connection_class = http.client.HTTPSConnection if self.use_https else http.client.HTTPConnection
+        conn = connection_class(self.host, timeout=self.timeout)
+        self._local.conn = conn
+        self._local.last_used = time.monotonic()
+        self.metrics.connection_opened()
+        return conn, False
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+
+def _close_quietly(smtp):
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
@@ -0,0 +1,44 @@
+"""
+Create the rides of recurring ride templates for the next --horizon-days days.
+
+A template (POST /api/ride-templates) stores a route, time and weekdays once.
+Its concrete rides are created only a rolling horizon ahead: when the template
+is saved, then by this job as days pass, with one bulk insert per batch of
+templates. Each template records how far it has been materialized and claims
+its next window with a conditional update, so overlapping runs never create
+the same day twice and the job can simply be re-run. Run it daily (see
+render.yaml).
+
+Usage: python materialize_rides.py [--horizon-days 14] [--batch-size 200] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app import app, due_ride_templates, materialize_rides, RIDE_TEMPLATE_HORIZON_DAYS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--horizon-days', type=int, default=RIDE_TEMPLATE_HORIZON_DAYS, help='Create rides up to this many days ahead')
+    parser.add_argument('--batch-size', type=int, default=200, help='Templates per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the templates that are due')
+    args = parser.parse_args()
+
+    with app.app_context():
+        horizon = date.today() + timedelta(days=args.horizon_days)
+        if args.dry_run:
+            due = due_ride_templates(horizon).count()
+            print(f"{due} templates have rides to create through {horizon}")
+            return
+        start = datetime.now()
+        ride_ids = materialize_rides(args.horizon_days, batch_size=args.batch_size)
+        print(f"Created {len(ride_ids)} rides through {horizon} in {(datetime.now() - start).total_seconds():.1f}s")
+
+
+if __name__ == '__main__':
+    main()
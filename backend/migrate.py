@@ -0,0 +1,19 @@
+"""
+Apply pending schema/data migrations (see migrations.py).
+Safe to run repeatedly - already applied migrations are skipped.
+The server also applies them on startup.
+"""
+import os
+import sys
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app import app, db
+from migrations import run_migrations, get_schema_version
+
+if __name__ == '__main__':
+    with app.app_context():
+        run_migrations(db)
+        with db.engine.connect() as conn:
+            print(f"Database is at schema version {get_schema_version(conn)}")
@@ -0,0 +1,139 @@
+"""
+Versioned schema/data migrations.
+
+db.create_all() creates missing tables but never backfills data or alters
+existing tables. Each migration below runs once per database, in order, and the
+applied version is recorded in the schema_version table. Migrations must be
+safe to run against a freshly created schema as well (e.g. after
+reset_database.py), so they only touch rows/objects that are missing.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from route_index import parse_on_route_cities, route_stops
+
+log = logging.getLogger('linklift.db')
+
+
+def _backfill_ride_stops(conn, metadata):
+    """Build ride_stop rows from on_route_cities for rides created before the index existed"""
+    rides = conn.execute(text(
+        'SELECT id, pickup_city, drop_city, on_route_cities FROM ride '
+        'WHERE NOT EXISTS (SELECT 1 FROM ride_stop WHERE ride_stop.ride_id = ride.id)'
+    )).fetchall()
+
+    rows = []
+    for ride_id, pickup_city, drop_city, on_route_cities in rides:
+        on_route_list = parse_on_route_cities(on_route_cities)
+        for city, ordinal in route_stops(pickup_city, on_route_list, drop_city):
+            rows.append({'ride_id': ride_id, 'city': city, 'ordinal': ordinal})
+
+    if rows:
+        conn.execute(
+            text('INSERT INTO ride_stop (ride_id, city, ordinal) VALUES (:ride_id, :city, :ordinal)'),
+            rows
+        )
+    log.info('Migration: backfilled ride stops', extra={'stops': len(rows), 'rides': len(rides)})
+
+
+def _create_indexes(conn, metadata, table_name):
+    """Create the indexes declared in a model's __table_args__ that are missing"""
+    existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    for index in metadata.tables[table_name].indexes:
+        # Indexes on columns a later migration adds are created by that migration
+        if all(column.name in existing for column in index.columns):
+            index.create(conn, checkfirst=True)
+
+
+def _create_hot_path_indexes(conn, metadata):
+    """Create the indexes declared in the models' __table_args__ on existing tables"""
+    for table_name in ('ride', 'request', 'chat_message', 'ride_stop'):
+        _create_indexes(conn, metadata, table_name)
+
+
+def _replace_chat_timestamp_index(conn, metadata):
+    """Chat is paged by message id now, so (ride_id, id) replaces (ride_id, timestamp)"""
+    conn.execute(text('DROP INDEX IF EXISTS ix_chat_message_ride_timestamp'))
+    for index in metadata.tables['chat_message'].indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _add_ride_stop_departure(conn, metadata):
+    """Copy each ride's date/time onto its stops so search can page through a city's stops in departure order"""
+    columns = {column['name'] for column in inspect(conn).get_columns('ride_stop')}
+    if 'date' not in columns:
+        conn.execute(text('ALTER TABLE ride_stop ADD COLUMN date DATE'))
+    if 'time' not in columns:
+        conn.execute(text('ALTER TABLE ride_stop ADD COLUMN time TIME'))
+    result = conn.execute(text(
+        'UPDATE ride_stop SET '
+        'date = (SELECT ride.date FROM ride WHERE ride.id = ride_stop.ride_id), '
+        'time = (SELECT ride.time FROM ride WHERE ride.id = ride_stop.ride_id) '
+        'WHERE date IS NULL'
+    ))
+    for index in metadata.tables['ride_stop'].indexes:
+        index.create(conn, checkfirst=True)
+    log.info('Migration: set departure date/time on ride stops', extra={'stops': result.rowcount})
+
+
+def _add_version_stamps(conn, metadata):
+    """Counters behind the ETags of my-published, my-requests and ride details"""
+    for table, column in (('user', 'listing_version'), ('ride', 'version')):
+        if column not in {c['name'] for c in inspect(conn).get_columns(table)}:
+            # "user" is a reserved word in PostgreSQL
+            conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0'))
+
+
+def _add_ride_departs_at(conn, metadata):
+    """Store each ride's date + time as one timestamp so departure checks and ordering happen in SQL"""
+    if 'departs_at' not in {column['name'] for column in inspect(conn).get_columns('ride')}:
+        conn.execute(text('ALTER TABLE ride ADD COLUMN departs_at TIMESTAMP'))
+    # SQLite keeps dates and times as ISO strings; PostgreSQL adds a time to a date
+    combined = "date || ' ' || time" if conn.dialect.name == 'sqlite' else 'date + time'
+    result = conn.execute(text(f'UPDATE ride SET departs_at = {combined} WHERE departs_at IS NULL'))
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('ALTER TABLE ride ALTER COLUMN departs_at SET NOT NULL'))
+    # (publisher_id, departs_at) replaces (publisher_id, date, time) for my-published
+    conn.execute(text('DROP INDEX IF EXISTS ix_ride_publisher_date_time'))
+    _create_indexes(conn, metadata, 'ride')
+    log.info('Migration: set departs_at on rides', extra={'rides': result.rowcount})
+
+
+def _add_ride_template_id(conn, metadata):
+    """Link rides to the recurring ride_template they were created from"""
+    if 'template_id' not in {column['name'] for column in inspect(conn).get_columns('ride')}:
+        conn.execute(text('ALTER TABLE ride ADD COLUMN template_id INTEGER REFERENCES ride_template (id)'))
+    _create_indexes(conn, metadata, 'ride')
+
+
+# (version, description, function) - append only, never renumber
+MIGRATIONS = [
+    (1, 'Backfill ride_stop from on_route_cities', _backfill_ride_stops),
+    (2, 'Create indexes for search, my-rides, my-requests and chat queries', _create_hot_path_indexes),
+    (3, 'Index chat messages by (ride_id, id) for cursor pagination', _replace_chat_timestamp_index),
+    (4, 'Add departure date/time to ride_stop for keyset-paginated search', _add_ride_stop_departure),
+    (5, 'Add version counters to user and ride for conditional GETs', _add_version_stamps),
+    (6, 'Add ride.departs_at for departure checks in SQL', _add_ride_departs_at),
+    (7, 'Add ride.template_id for recurring rides', _add_ride_template_id),
+]
+
+
+def get_schema_version(conn):
+    conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)'))
+    version = conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar()
+    return version or 0
+
+
+def run_migrations(db):
+    """Apply all pending migrations, each in its own transaction"""
+    with db.engine.begin() as conn:
+        current = get_schema_version(conn)
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        log.info(f'Migration {version}: {description}', extra={'version': version})
+        with db.engine.begin() as conn:
+            migrate(conn, db.metadata)
+            conn.execute(text('INSERT INTO schema_version (version) VALUES (:version)'), {'version': version})
@@ -0,0 +1,157 @@
+"""
+Per-endpoint request metrics in Prometheus text format.
+
+RequestMetrics hooks into a Flask app (before/after request) and a SQLAlchemy
+engine (cursor execute events) and records, per endpoint:
+
+- latency histogram
+- SQL statements per request (histogram) and total SQL time
+- response size histogram
+- request counts by status code
+
+Requests slower than slow_ms are logged (WARNING, linklift.http) with their SQL
+count/time and the slowest statement; every other request at DEBUG. Streamed responses (Server-Sent Events) are only counted,
+their duration says nothing about performance.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SQL_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+log = logging.getLogger('linklift.http')
+
+
+class Histogram:
+    """Cumulative (Prometheus style) bucket counts plus sum; not thread-safe on its own"""
+    __slots__ = ('bounds', 'counts', 'total', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def lines(self, name, labels):
+        for bound, count in zip(self.bounds, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.total}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.total}'
+
+
+class _EndpointMetrics:
+    __slots__ = ('latency', 'sql_statements', 'sql_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_statements = Histogram(SQL_BUCKETS)
+        self.sql_seconds = 0.0
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.statuses = defaultdict(int)
+
+
+class RequestMetrics:
+    def __init__(self, slow_ms=500, prefix='linklift'):
+        self.slow_ms = slow_ms
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(_EndpointMetrics)
+        self.slow_requests = 0
+
+    def init_app(self, app, engine):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = [0, 0.0, 0.0, None]  # statements, seconds, slowest seconds, slowest statement
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['metrics_start'].pop()
+        # Background threads (email workers, journey index) have no request to charge it to
+        if not has_request_context() or 'metrics_sql' not in g:
+            return
+        sql = g.metrics_sql
+        sql[0] += 1
+        sql[1] += seconds
+        if seconds > sql[2]:
+            sql[2], sql[3] = seconds, statement
+
+    def _finish(self, response):
+        if 'metrics_start' not in g:
+            return response
+        seconds = time.perf_counter() - g.metrics_start
+        statements, sql_seconds, slowest_seconds, slowest = g.metrics_sql
+        endpoint = request.endpoint or 'unmatched'
+        size = None if response.is_streamed else response.calculate_content_length()
+        with self._lock:
+            metrics = self._endpoints[endpoint]
+            metrics.statuses[response.status_code] += 1
+            if not response.is_streamed:
+                metrics.latency.observe(seconds)
+                metrics.sql_statements.observe(statements)
+                metrics.sql_seconds += sql_seconds
+                metrics.response_bytes.observe(size or 0)
+            slow = not response.is_streamed and seconds * 1000 >= self.slow_ms
+            if slow:
+                self.slow_requests += 1
+        if not slow and not log.isEnabledFor(logging.DEBUG):
+            return response
+        fields = {'method': request.method, 'path': request.path, 'endpoint': endpoint, 'status': response.status_code,
+                  'ms': round(seconds * 1000, 1), 'bytes': size or 0, 'sql_statements': statements,
+                  'sql_ms': round(sql_seconds * 1000, 1)}
+        if slow:
+            if slowest:
+                fields.update(slowest_sql=' '.join(slowest.split())[:1000], slowest_sql_ms=round(slowest_seconds * 1000, 1))
+            log.warning('Slow request', extra=fields)
+        else:
+            log.debug('Request', extra=fields)
+        return response
+
+    def render(self, extra=()):
+        """Prometheus text exposition; extra holds more (name, type, help, value) samples"""
+        p = self.prefix
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                f'# HELP {p}_http_requests_total Requests by endpoint and status code',
+                f'# TYPE {p}_http_requests_total counter',
+            ]
+            for endpoint, metrics in endpoints:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'{p}_http_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            for name, help_text, attribute in (
+                ('http_request_duration_seconds', 'Request latency by endpoint', 'latency'),
+                ('sql_statements_per_request', 'SQL statements issued per request', 'sql_statements'),
+                ('http_response_bytes', 'Response body size by endpoint', 'response_bytes'),
+            ):
+                lines += [f'# HELP {p}_{name} {help_text}', f'# TYPE {p}_{name} histogram']
+                for endpoint, metrics in endpoints:
+                    lines.extend(getattr(metrics, attribute).lines(f'{p}_{name}', f'endpoint="{endpoint}"'))
+            lines += [f'# HELP {p}_sql_seconds_total Time spent in SQL by endpoint', f'# TYPE {p}_sql_seconds_total counter']
+            for endpoint, metrics in endpoints:
+                lines.append(f'{p}_sql_seconds_total{{endpoint="{endpoint}"}} {metrics.sql_seconds:.6f}')
+            lines += [f'# HELP {p}_slow_requests_total Requests over the slow threshold', f'# TYPE {p}_slow_requests_total counter',
+                      f'{p}_slow_requests_total {self.slow_requests}']
+        for name, kind, help_text, value in extra:
+            lines += [f'# HELP {p}_{name} {help_text}', f'# TYPE {p}_{name} {kind}', f'{p}_{name} {value}']
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,82 @@
+"""
+Relevance scoring for ride search (sort=best).
+
+Every candidate gets four features in [0, 1], higher is better, and the score
+is their weighted sum:
+
+- time:   1 / (1 + hours between departure and the requested time / TIME_SCALE_HOURS)
+- detour: 1 / (1 + route stops before the rider's pickup + stops after the rider's drop),
+          so a ride that starts and ends where the rider does scores 1
+- price:  1 - cost / (2 * median cost of the candidates), clipped to [0, 1]
+          (0.5 at the median, 1 when free)
+- seats:  share of the ride's seats still free
+
+Features are computed column-wise over the whole candidate set at once: with
+NumPy when it is installed, otherwise with a plain Python fallback that gives
+the same scores.
+"""
+import statistics
+
+# Try to import numpy (optional - the pure Python fallback is slower for large candidate sets)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+FEATURES = ('time', 'detour', 'price', 'seats')
+DEFAULT_WEIGHTS = {'time': 0.4, 'detour': 0.25, 'price': 0.2, 'seats': 0.15}
+TIME_SCALE_HOURS = 6
+
+
+def parse_weights(spec):
+    """Weights from 'time=0.5,price=0.3' (SEARCH_RANK_WEIGHTS); features left out keep their defaults"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        name, _, value = part.partition('=')
+        name = name.strip()
+        if name not in FEATURES:
+            raise ValueError(f'Unknown search ranking feature: {name}')
+        weights[name] = float(value)
+    return weights
+
+
+def score_candidates(minutes_away, detour_stops, costs, free_seats, capacities, weights=DEFAULT_WEIGHTS, use_numpy=NUMPY_AVAILABLE):
+    """Scores for candidates given as parallel sequences (minutes_away may be negative)"""
+    if not len(costs):
+        return []
+    if use_numpy:
+        return _score_numpy(minutes_away, detour_stops, costs, free_seats, capacities, weights).tolist()
+    return _score_python(minutes_away, detour_stops, costs, free_seats, capacities, weights)
+
+
+def rank(scores, use_numpy=NUMPY_AVAILABLE):
+    """Candidate positions by descending score; ties keep their input order"""
+    if use_numpy:
+        return np.argsort(-np.asarray(scores, dtype=float), kind='stable').tolist()
+    return sorted(range(len(scores)), key=lambda i: -scores[i])
+
+
+def _score_numpy(minutes_away, detour_stops, costs, free_seats, capacities, weights):
+    hours = np.abs(np.asarray(minutes_away, dtype=float)) / 60
+    time = 1 / (1 + hours / TIME_SCALE_HOURS)
+    detour = 1 / (1 + np.asarray(detour_stops, dtype=float))
+    costs = np.asarray(costs, dtype=float)
+    median = float(np.median(costs))
+    price = np.clip(1 - costs / (2 * median), 0, 1) if median > 0 else (costs <= 0).astype(float)
+    seats = np.clip(np.asarray(free_seats, dtype=float) / np.maximum(np.asarray(capacities, dtype=float), 1), 0, 1)
+    return weights['time'] * time + weights['detour'] * detour + weights['price'] * price + weights['seats'] * seats
+
+
+def _score_python(minutes_away, detour_stops, costs, free_seats, capacities, weights):
+    median = statistics.median(costs)
+    scores = []
+    for away, stops, cost, free, capacity in zip(minutes_away, detour_stops, costs, free_seats, capacities):
+        time = 1 / (1 + abs(away) / 60 / TIME_SCALE_HOURS)
+        detour = 1 / (1 + stops)
+        price = min(max(1 - cost / (2 * median), 0), 1) if median > 0 else float(cost <= 0)
+        seats = min(max(free / max(capacity, 1), 0), 1)
+        scores.append(weights['time'] * time + weights['detour'] * detour + weights['price'] * price + weights['seats'] * seats)
+    return scores
@@ -0,0 +1,45 @@
+"""
+Helpers for the ride_stop route index.
+
+Every ride's full route is [pickup_city, ...on_route_cities, drop_city]. Instead
+of parsing the on_route_cities JSON for every ride on every search, each city on
+the route is stored once in the ride_stop table together with its position
+(ordinal) so search can match "pickup before drop" in SQL.
+"""
+import json
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def parse_on_route_cities(raw):
+    """Return the on-route cities stored as JSON on a ride as a tuple, or () if invalid.
+
+    Cached per JSON string, so serializing, indexing and invalidating the same
+    ride (in one request or across requests) parse its route once.
+    """
+    if not raw:
+        return ()
+    try:
+        cities = json.loads(raw)
+    except (ValueError, TypeError):
+        return ()
+    if not isinstance(cities, list):
+        return ()
+    return tuple(cities)
+
+
+def route_stops(pickup_city, on_route_cities, drop_city):
+    """Return (city, ordinal) pairs for a ride's full route.
+
+    Only the first occurrence of a city is kept, which matches the old
+    list.index() based matching and keeps (ride_id, city) unique.
+    """
+    full_route = [pickup_city] + list(on_route_cities) + [drop_city]
+    stops = []
+    seen = set()
+    for ordinal, city in enumerate(full_route):
+        if city in seen:
+            continue
+        seen.add(city)
+        stops.append((city, ordinal))
+    return stops
@@ -0,0 +1,20 @@
+"""
+Throwaway configuration for the tests and benchmark scripts.
+
+app reads its configuration when it is imported, so call use_scratch_database()
+before importing app (or seed_data). It points DATABASE_URL at a new SQLite file
+unless a database URL is given, and turns off the email workers (their polling
+would show up in statement counts) and the search cache (pages would not come
+from the database); keyword arguments override any of these.
+"""
+import os
+import tempfile
+
+
+def use_scratch_database(name, database_url=None, **env):
+    """Configure the app for a throwaway database; returns its URL"""
+    os.environ['DATABASE_URL'] = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), f'{name}.db')}"
+    os.environ['EMAIL_WORKERS'] = '0'
+    os.environ['SEARCH_CACHE_TTL'] = '0'
+    os.environ.update(env)
+    return os.environ['DATABASE_URL']
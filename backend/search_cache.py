@@ -0,0 +1,199 @@
+"""
+Short-lived cache for /api/rides/search result pages.
+
+Entries are keyed by the normalized search (pickup, drop, date range, time
+window, passengers, womenOnly, sort, cursor, limit) and hold the page exactly as the database returned
+it, before anything user specific is filtered out, so one entry serves every
+user. Writes that change what a search returns (a ride published or cancelled,
+seats taken or freed) invalidate every pickup -> drop corridor on that ride's
+route. Backends:
+
+- LocalBackend (default): per process LRU, capped at max_bytes of encoded results
+- RedisBackend ("redis://..."): shared by all workers, if the redis package is installed
+
+With the local backend each gunicorn worker has its own cache, so another
+worker may serve a stale page for at most ttl_seconds after a write.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlparse
+
+import serializers
+
+log = logging.getLogger('linklift.rides')
+
+# Try to import redis (optional - only needed for SEARCH_CACHE_BACKEND=redis://...)
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+def route_corridors(cities):
+    """Every (pickup, drop) pair a ride with this ordered route can match"""
+    return {(pickup, drop) for i, pickup in enumerate(cities) for drop in cities[i + 1:]}
+
+
+class SearchCache:
+    def __init__(self, backend=None, ttl_seconds=30):
+        self.backend = backend or LocalBackend()
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0
+
+    def get(self, key):
+        """Cached value for a search key (a tuple starting with pickup, drop), or None"""
+        if not self.enabled:
+            return None
+        encoded = self.backend.get(key[:2], _key_string(key))
+        with self._lock:
+            if encoded is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return serializers.loads(encoded) if encoded is not None else None
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key[:2], _key_string(key), serializers.dumps(value), self.ttl_seconds)
+
+    def invalidate_route(self, cities, nearby=None):
+        """Drop every cached search a ride along these (ordered) cities could appear in.
+
+        nearby(city) returns the cities whose radius searches can match a stop at city;
+        their corridors are dropped as well.
+        """
+        corridors = route_corridors(list(cities))
+        if nearby:
+            corridors = {(pickup, drop) for board, alight in corridors for pickup in nearby(board) for drop in nearby(alight)}
+        if corridors:
+            self.backend.invalidate(corridors)
+            with self._lock:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+        stats.update(self.backend.stats())
+        return stats
+
+
+def _key_string(key):
+    return json.dumps(key, separators=(',', ':'))
+
+
+class LocalBackend:
+    """In-process LRU, evicting least recently used entries beyond max_bytes"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (corridor, expires_at, encoded)
+        self._by_corridor = defaultdict(set)  # corridor -> {key}
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, corridor, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, corridor, key, encoded, ttl_seconds):
+        if len(encoded) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (corridor, time.monotonic() + ttl_seconds, encoded)
+            self._by_corridor[corridor].add(key)
+            self._bytes += len(encoded)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, corridors):
+        with self._lock:
+            for corridor in corridors:
+                for key in list(self._by_corridor.get(corridor, ())):
+                    self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self.evictions}
+
+    def _remove(self, key):
+        corridor, _, encoded = self._entries.pop(key)
+        self._bytes -= len(encoded)
+        keys = self._by_corridor[corridor]
+        keys.discard(key)
+        if not keys:
+            del self._by_corridor[corridor]
+
+
+class RedisBackend:
+    """Shared cache; invalidation bumps a per-corridor generation that is part of every entry's key.
+
+    Set maxmemory/maxmemory-policy allkeys-lru on the Redis server to cap memory.
+    """
+    PREFIX = 'linklift:search'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, corridor, key):
+        try:
+            return self.client.get(self._data_key(corridor, key))
+        except redis.RedisError as e:
+            log.warning('Search cache: redis unavailable', extra={'error': str(e)})
+            return None
+
+    def set(self, corridor, key, encoded, ttl_seconds):
+        try:
+            self.client.set(self._data_key(corridor, key), encoded, ex=ttl_seconds)
+        except redis.RedisError as e:
+            log.warning('Search cache: redis unavailable', extra={'error': str(e)})
+
+    def invalidate(self, corridors):
+        # Not swallowed - a lost invalidation would serve stale seats until the TTL expires
+        pipeline = self.client.pipeline(transaction=False)
+        for corridor in corridors:
+            pipeline.incr(self._generation_key(corridor))
+        pipeline.execute()
+
+    def stats(self):
+        return {}
+
+    def _generation_key(self, corridor):
+        return f'{self.PREFIX}:gen:{corridor[0]}|{corridor[1]}'
+
+    def _data_key(self, corridor, key):
+        generation = int(self.client.get(self._generation_key(corridor)) or 0)
+        return f'{self.PREFIX}:{generation}:{hashlib.sha1(key.encode("utf-8")).hexdigest()}'
+
+
+def backend_from_url(url, max_bytes=16 * 1024 * 1024):
+    """Pick the backend for SEARCH_CACHE_BACKEND ('', 'local' or 'redis://...')"""
+    if not url or url == 'local':
+        return LocalBackend(max_bytes)
+    if urlparse(url).scheme in ('redis', 'rediss'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError('SEARCH_CACHE_BACKEND is a redis:// URL but the redis package is not installed')
+        return RedisBackend(url)
+    raise ValueError(f'Unsupported SEARCH_CACHE_BACKEND: {url}')
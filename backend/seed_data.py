@@ -0,0 +1,116 @@
+"""
+Synthetic data for the tests and benchmark scripts.
+Import this only after DATABASE_URL points at a throwaway database (see scratch_database.py).
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+
+from app import db, User, Ride, RideStop, Request, ChatMessage, SavedSearch
+from route_index import route_stops
+
+# A few real corridors (pickup, on-route cities, drop)
+ROUTES = [
+    ('Delhi', ['Panipat', 'Karnal', 'Ambala'], 'Chandigarh'),
+    ('Delhi', ['Gurgaon', 'Alwar'], 'Jaipur'),
+    ('Mumbai', ['Thane', 'Nashik'], 'Pune'),
+    ('Bangalore', ['Tumkur', 'Davanagere'], 'Hubli-Dharwad'),
+    ('Chennai', ['Vellore'], 'Bangalore'),
+    ('Lucknow', ['Unnao'], 'Kanpur'),
+    ('Ahmedabad', ['Vadodara', 'Bharuch'], 'Surat'),
+    ('Hyderabad', ['Suryapet'], 'Vijayawada'),
+]
+
+_password_hash = None
+
+
+def make_users(count, prefix='user'):
+    """Add `count` verified users (password 'password') and return them"""
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = generate_password_hash('password')
+    users = [User(
+        name=f'{prefix} {i}',
+        year='2nd Year',
+        email=f'{prefix}{i}@example.edu',
+        college='Example College',
+        password_hash=_password_hash,
+        email_verified=True
+    ) for i in range(count)]
+    db.session.add_all(users)
+    db.session.flush()
+    return users
+
+
+def make_ride(publisher, pickup_city, on_route, drop_city, departs_at, seats=4, cost=250.0, women_only=False):
+    """Build a ride (with its route stops) the same way create_ride does"""
+    ride = Ride(
+        publisher_id=publisher.id,
+        pickup_city=pickup_city,
+        drop_city=drop_city,
+        pickup_address=f'{pickup_city} bus stand',
+        drop_address=f'{drop_city} railway station',
+        on_route_cities=json.dumps(on_route) if on_route else None,
+        date=departs_at.date(),
+        time=departs_at.time().replace(second=0, microsecond=0),
+        departs_at=departs_at.replace(second=0, microsecond=0),
+        available_seats=seats,
+        capacity=seats,
+        cost_per_person=cost,
+        car_model='Swift Dzire',
+        license_plate='DL 01 AB 1234',
+        women_only=women_only
+    )
+    for city, ordinal in route_stops(pickup_city, on_route, drop_city):
+        ride.stops.append(RideStop(city=city, ordinal=ordinal, date=ride.date, time=ride.time))
+    db.session.add(ride)
+    return ride
+
+
+def make_random_rides(publishers, count, days=30, seed=42):
+    """Add `count` future rides spread over the next `days` days on ROUTES"""
+    rng = random.Random(seed)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    rides = []
+    for _ in range(count):
+        pickup_city, on_route, drop_city = rng.choice(ROUTES)
+        departs_at = start + timedelta(minutes=15 * rng.randrange(days * 24 * 4))
+        rides.append(make_ride(
+            rng.choice(publishers), pickup_city, on_route, drop_city, departs_at,
+            seats=rng.randint(1, 6), cost=float(rng.randrange(100, 800, 10)),
+            women_only=rng.random() < 0.1
+        ))
+    db.session.flush()
+    return rides
+
+
+def make_request(ride, requestor, status='pending', num_passengers=1):
+    request_obj = Request(
+        ride_id=ride.id,
+        requestor_id=requestor.id,
+        num_passengers=num_passengers,
+        status=status
+    )
+    db.session.add(request_obj)
+    return request_obj
+
+
+def make_message(ride, author, text='On my way'):
+    message = ChatMessage(ride_id=ride.id, author_id=author.id, message=text)
+    db.session.add(message)
+    return message
+
+
+def make_saved_search(user, pickup_city, drop_city, date_from, date_to, passengers=1, women_only=False):
+    saved = SavedSearch(user_id=user.id, pickup_city=pickup_city, drop_city=drop_city, date_from=date_from,
+                        date_to=date_to, passengers=passengers, women_only=women_only)
+    db.session.add(saved)
+    return saved
+
+
+def auth_headers(user):
+    """Authorization header with an access token for user (needs an app context)"""
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
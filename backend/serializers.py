@@ -0,0 +1,119 @@
+"""
+Response serialization for rides.
+
+Every ride field the API returns has one getter in RIDE_FIELDS, each endpoint
+names the fields it returns, and clients can ask for fewer with
+?fields=id,date,time. Fields nobody asked for are never computed, so a list
+that only shows dates doesn't parse any route JSON.
+
+JSON is encoded with orjson when it is installed (several times faster than
+the standard library on long ride lists), otherwise with json.
+"""
+import json
+from functools import lru_cache
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from route_index import parse_on_route_cities
+
+# Try to import orjson (optional - falls back to the standard library json module)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _publisher(ride):
+    publisher = ride.publisher
+    return {'id': publisher.id, 'name': publisher.name, 'email': publisher.email}
+
+
+RIDE_FIELDS = {
+    'id': lambda ride: ride.id,
+    'publisher': _publisher,
+    'pickupCity': lambda ride: ride.pickup_city,
+    'dropCity': lambda ride: ride.drop_city,
+    'pickupAddress': lambda ride: ride.pickup_address,
+    'dropAddress': lambda ride: ride.drop_address,
+    'onRouteCities': lambda ride: list(parse_on_route_cities(ride.on_route_cities)),
+    'date': lambda ride: ride.date.isoformat(),
+    'time': lambda ride: ride.time.isoformat(timespec='minutes'),
+    'availableSeats': lambda ride: ride.available_seats,
+    'capacity': lambda ride: ride.capacity,
+    'costPerPerson': lambda ride: ride.cost_per_person,
+    'carModel': lambda ride: ride.car_model,
+    'licensePlate': lambda ride: ride.license_plate,
+    'womenOnly': lambda ride: ride.women_only,
+    'createdAt': lambda ride: ride.created_at.isoformat(),
+    'templateId': lambda ride: ride.template_id,
+}
+
+# What each endpoint returns for a ride (and what ?fields= may pick from)
+RIDE_DETAIL_FIELDS = ('id', 'publisher', 'pickupCity', 'dropCity', 'pickupAddress', 'dropAddress', 'onRouteCities',
+                      'date', 'time', 'availableSeats', 'capacity', 'costPerPerson', 'carModel', 'licensePlate', 'womenOnly')
+CREATED_RIDE_FIELDS = ('id', 'pickupCity', 'dropCity', 'pickupAddress', 'dropAddress', 'onRouteCities',
+                       'date', 'time', 'availableSeats', 'costPerPerson')
+# pendingRequestsCount is counted by the endpoint itself
+PUBLISHED_RIDE_FIELDS = RIDE_DETAIL_FIELDS[:1] + RIDE_DETAIL_FIELDS[2:] + ('pendingRequestsCount', 'createdAt', 'templateId')
+REQUESTED_RIDE_FIELDS = ('id', 'pickupCity', 'dropCity', 'pickupAddress', 'dropAddress', 'onRouteCities',
+                         'date', 'time', 'costPerPerson', 'womenOnly')
+
+
+@lru_cache(maxsize=None)
+def _getters(fields):
+    return tuple((name, RIDE_FIELDS[name]) for name in fields if name in RIDE_FIELDS)
+
+
+def ride_to_dict(ride, fields=RIDE_DETAIL_FIELDS):
+    """The named fields of a ride (names without a getter in RIDE_FIELDS are left to the caller)"""
+    return {name: get(ride) for name, get in _getters(fields)}
+
+
+def requested_fields(available):
+    """Fields picked with ?fields=a,b (kept in the order of available), or all of available.
+
+    Raises ValueError naming any field the endpoint doesn't return.
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return available
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = names.difference(available)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in available if name in names)
+
+
+def project(data, fields):
+    """Only the given keys of an already serialized dict"""
+    return {name: data[name] for name in fields}
+
+
+def dumps(obj):
+    """Compact JSON as bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding responses with orjson when it is installed"""
+    # Key order is kept as built; sorting every dict only costs time
+    sort_keys = False
+
+    def response(self, *args, **kwargs):
+        if not ORJSON_AVAILABLE or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Datetimes etc. still go through Flask's default() so the output matches the json fallback
+        body = orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
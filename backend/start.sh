@@ -1,3 +1,3 @@
 #!/bin/bash
 python -c "from app import app, db; app.app_context().push(); db.create_all()"
-gunicorn app:app --bind 0.0.0.0:$PORT --workers 1 --timeout 120 --threads 2
\ No newline at end of file
+gunicorn app:app --bind 0.0.0.0:$PORT --workers 1 --timeout 120 --threads ${GUNICORN_THREADS:-8}
\ No newline at end of file
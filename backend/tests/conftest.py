@@ -0,0 +1,96 @@
+"""
+Shared fixtures: the app on a throwaway database, a test client and SQL counting.
+
+Everything runs against one temporary SQLite file, recreated for every test, or
+against TEST_DATABASE_URL when it is set (ALL DATA IN IT IS DROPPED). Checks that
+only make sense on SQLite skip themselves elsewhere.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# The backend modules are imported as top-level modules, like the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scratch_database import use_scratch_database
+
+# Must be set before app is imported
+use_scratch_database('tests', os.getenv('TEST_DATABASE_URL'), SENDGRID_API_KEY='', LOG_LEVEL=os.getenv('LOG_LEVEL', 'WARNING'))
+
+from sqlalchemy import event
+
+import app as linklift
+from search_cache import LocalBackend
+
+
+class StatementCounter:
+    """Collects the SQL statements and commits issued while listening"""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def commit(self, conn):
+        self.commits += 1
+
+
+@pytest.fixture
+def app():
+    return linklift.app
+
+
+@pytest.fixture
+def db(app):
+    """An empty schema, inside an app context, with the in-process indexes emptied too"""
+    with app.app_context():
+        linklift.db.session.remove()
+        linklift.db.drop_all()
+        linklift.db.create_all()
+        linklift.journey_index.rebuild([])
+        linklift.journey_index.built_at = None
+        yield linklift.db
+        linklift.db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def sqlite_only(db):
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('SQLite specific')
+
+
+@pytest.fixture
+def search_cache(monkeypatch):
+    """The search cache switched on with an empty local backend"""
+    monkeypatch.setattr(linklift.search_cache, 'backend', LocalBackend())
+    monkeypatch.setattr(linklift.search_cache, 'ttl_seconds', 300)
+    return linklift.search_cache
+
+
+@pytest.fixture
+def count_sql(db):
+    """count_sql() is a context manager yielding a StatementCounter for the statements issued inside it"""
+    @contextmanager
+    def counting():
+        counter = StatementCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        event.listen(db.engine, 'commit', counter.commit)
+        try:
+            yield counter
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', counter)
+            event.remove(db.engine, 'commit', counter.commit)
+    return counting
@@ -0,0 +1,72 @@
+"""
+The ride archival job (archive_rides.py).
+
+Rides older than the horizon move to ride_archive with their stops, requests
+and chat while newer rides stay; the job resumes where it stopped, archives
+nothing twice, and the archived document round-trips.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app import Ride, RideStop, Request, ChatMessage, RideArchive
+from archive_rides import archive_rides, read_archive
+from seed_data import auth_headers, make_users, make_ride, make_request, make_message
+
+OLD_RIDES = 200
+BATCH_SIZE = 30
+
+
+def counts(db):
+    return tuple(db.session.query(func.count()).select_from(model).scalar()
+                 for model in (Ride, RideStop, Request, ChatMessage, RideArchive))
+
+
+@pytest.fixture
+def seeded(db):
+    publisher, passenger = make_users(2)
+    now = datetime.now()
+    # Old rides (made directly - the API refuses past dates), each with a rejected request and a message
+    old = [make_ride(publisher, 'Delhi', ['Panipat', 'Karnal'], 'Chandigarh', now - timedelta(days=100 + i % 300, hours=i % 24))
+           for i in range(OLD_RIDES)]
+    recent = [make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', now + timedelta(days=1 + i % 20)) for i in range(50)]
+    recent.append(make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', now - timedelta(days=10)))
+    db.session.flush()
+    for ride in old + recent:
+        make_request(ride, passenger, status='rejected')
+        make_message(ride, publisher)
+    db.session.commit()
+    seeded = {'first_old_id': old[0].id, 'recent': len(recent), 'headers': auth_headers(passenger)}
+    db.session.remove()
+    return seeded
+
+
+def test_archive_is_resumable_and_keeps_recent_rides(db, seeded):
+    first = archive_rides(days=90, batch_size=BATCH_SIZE, max_batches=1, log=lambda message: None)
+    assert first[0] == BATCH_SIZE and counts(db)[4] == BATCH_SIZE
+
+    rest = archive_rides(days=90, batch_size=BATCH_SIZE, log=lambda message: None)
+    archived_ids = [ride_id for (ride_id,) in db.session.query(RideArchive.ride_id)]
+    assert first[0] + rest[0] == OLD_RIDES
+    assert len(set(archived_ids)) == len(archived_ids) == OLD_RIDES
+
+    # Each recent ride has 3 stops, one request and one message
+    kept = seeded['recent']
+    assert counts(db) == (kept, kept * 3, kept, kept, OLD_RIDES)
+
+
+def test_archived_document_round_trips(db, seeded):
+    archive_rides(days=90, batch_size=BATCH_SIZE, log=lambda message: None)
+    document = read_archive(RideArchive.query.filter_by(ride_id=seeded['first_old_id']).one())
+    assert document['ride']['id'] == seeded['first_old_id']
+    assert len(document['stops']) == 4
+    assert [request['status'] for request in document['requests']] == ['rejected']
+    assert [message['message'] for message in document['messages']] == ['On my way']
+
+
+def test_archiving_changes_my_requests_etag(db, client, seeded):
+    etag = client.get('/api/requests/my-requests', headers=seeded['headers']).headers.get('ETag')
+    archive_rides(days=90, batch_size=BATCH_SIZE, log=lambda message: None)
+    db.session.remove()
+    assert client.get('/api/requests/my-requests', headers=seeded['headers']).headers.get('ETag') != etag
@@ -0,0 +1,96 @@
+"""
+Chat message paging with since_id/before_id cursors.
+
+A poller with since_id gets only newer messages, oldest first; scrolling back
+with before_id pages through older messages without gaps or repeats; hasMore
+is false when exactly `limit` messages are left; and cursors that aren't
+integers are rejected instead of falling back to the latest page.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from seed_data import auth_headers, make_users, make_ride, make_message
+
+
+@pytest.fixture
+def seeded(db):
+    driver, passenger = make_users(2)
+    ride = make_ride(driver, 'Delhi', [], 'Jaipur', datetime.now() + timedelta(days=1))
+    db.session.flush()
+    messages = [make_message(ride, driver if i % 2 else passenger, f'message {i}') for i in range(25)]
+    db.session.commit()
+    seeded = {'ride_id': ride.id, 'ids': [message.id for message in messages], 'headers': auth_headers(passenger)}
+    db.session.remove()
+    return seeded
+
+
+def get_page(client, seeded, **params):
+    response = client.get(f"/api/rides/{seeded['ride_id']}/messages", headers=seeded['headers'], query_string=params)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    return [message['id'] for message in body['messages']], body['hasMore']
+
+
+def test_latest_page_by_default(client, seeded):
+    ids, has_more = get_page(client, seeded, limit=10)
+    assert ids == seeded['ids'][-10:]
+    assert has_more
+
+
+def test_polling_with_since_id_gets_only_newer_messages(client, seeded):
+    ids, has_more = get_page(client, seeded, since_id=seeded['ids'][19])
+    assert ids == seeded['ids'][20:]
+    assert not has_more
+
+    # Nothing new yet
+    assert get_page(client, seeded, since_id=seeded['ids'][-1]) == ([], False)
+
+    # A backlog longer than limit comes oldest first, and the next poll resumes after it
+    ids, has_more = get_page(client, seeded, since_id=seeded['ids'][4], limit=10)
+    assert ids == seeded['ids'][5:15]
+    assert has_more
+    ids, has_more = get_page(client, seeded, since_id=ids[-1], limit=10)
+    assert ids == seeded['ids'][15:25]
+    assert not has_more
+
+
+def test_scrolling_back_with_before_id_past_the_first_page(client, seeded):
+    pages = []
+    ids, has_more = get_page(client, seeded, limit=10)
+    pages.append(ids)
+    while has_more:
+        ids, has_more = get_page(client, seeded, before_id=pages[-1][0], limit=10)
+        pages.append(ids)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [i for page in reversed(pages) for i in page] == seeded['ids']
+
+
+def test_has_more_is_false_at_exactly_limit_messages(client, seeded):
+    # Exactly `limit` messages before the cursor: one full page and nothing after it
+    ids, has_more = get_page(client, seeded, before_id=seeded['ids'][10], limit=10)
+    assert ids == seeded['ids'][:10]
+    assert not has_more
+    ids, has_more = get_page(client, seeded, before_id=seeded['ids'][11], limit=10)
+    assert ids == seeded['ids'][1:11]
+    assert has_more
+
+    # Same in the polling direction
+    ids, has_more = get_page(client, seeded, since_id=seeded['ids'][14], limit=10)
+    assert ids == seeded['ids'][15:]
+    assert not has_more
+    ids, has_more = get_page(client, seeded, since_id=seeded['ids'][13], limit=10)
+    assert ids == seeded['ids'][14:24]
+    assert has_more
+
+    ids, has_more = get_page(client, seeded, limit=len(seeded['ids']))
+    assert ids == seeded['ids']
+    assert not has_more
+
+
+@pytest.mark.parametrize('params', [{'since_id': 'abc'}, {'before_id': '1.5'}, {'since_id': ''}, {'limit': 'ten'}])
+def test_malformed_cursors_are_rejected(client, seeded, params):
+    response = client.get(f"/api/rides/{seeded['ride_id']}/messages", headers=seeded['headers'], query_string=params)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'Invalid {next(iter(params))}'
@@ -0,0 +1,68 @@
+"""
+The city catalog (cities.py) and /api/cities.
+
+The catalog is built once: sorted and unique for listing, a frozenset for
+validation, and a pre-encoded /api/cities body that clients revalidate with
+its strong ETag. /api/cities/suggest autocompletes from a prefix index over it
+(benchmark_city_suggest.py times a lookup in microseconds).
+"""
+import json
+import re
+
+import pytest
+
+from cities import (INDIAN_CITIES, CITIES, CITY_SET, CITIES_JSON, get_cities, is_valid_city, normalize_city_query,
+                    suggest_cities)
+
+
+def test_catalog_is_sorted_and_unique():
+    assert list(CITIES) == sorted(set(INDIAN_CITIES))
+    assert CITY_SET == set(INDIAN_CITIES)
+    assert get_cities() == list(CITIES)
+
+
+def test_validation_is_exact():
+    assert is_valid_city('Hubli-Dharwad')
+    assert not is_valid_city('hubli-dharwad') and not is_valid_city('Atlantis') and not is_valid_city('')
+
+
+def test_cities_are_served_with_a_strong_etag(client):
+    response = client.get('/api/cities')
+    assert response.status_code == 200
+    assert response.get_json() == {'cities': list(CITIES)} == json.loads(CITIES_JSON)
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+    assert 'max-age=86400' in response.headers['Cache-Control'] and 'public' in response.headers['Cache-Control']
+
+    again = client.get('/api/cities', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and not again.data
+    assert client.get('/api/cities', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+@pytest.mark.parametrize('query, city', [
+    ('hubli', 'Hubli-Dharwad'), ('DHAR', 'Hubli-Dharwad'), ('miraj', 'Sangli-Miraj'),
+    ('bhubanéswar', 'Bhubaneswar'), ('  Chandi', 'Chandigarh'), ('sawai m', 'Sawai Madhopur'), ('madhopur', 'Sawai Madhopur'),
+])
+def test_suggest_ignores_case_and_diacritics_and_matches_name_parts(query, city):
+    assert city in suggest_cities(query, limit=50)
+
+
+def test_suggest_puts_exact_names_first():
+    assert suggest_cities('hubli')[0] == 'Hubli'
+    assert suggest_cities('sangli')[0] == 'Sangli'
+
+
+def test_suggest_only_returns_prefix_matches_up_to_the_limit():
+    assert suggest_cities('a', limit=5) == suggest_cities('a', limit=50)[:5]
+    for city in suggest_cities('del', limit=50):
+        name = normalize_city_query(city)
+        assert name.startswith('del') or any(part.startswith('del') for part in re.split(r'[-\s]+', name))
+    assert suggest_cities('') == [] and suggest_cities('zzzz') == []
+
+
+def test_suggest_endpoint(client):
+    response = client.get('/api/cities/suggest?q=hubli&limit=2')
+    assert response.status_code == 200
+    assert response.get_json() == {'cities': suggest_cities('hubli', limit=2)}
+    assert 'max-age=86400' in response.headers['Cache-Control']
+    assert client.get('/api/cities/suggest?q=hubli&limit=many').status_code == 400
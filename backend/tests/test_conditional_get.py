@@ -0,0 +1,102 @@
+"""
+Conditional GETs on my-published, my-requests and ride details.
+
+A repeated GET with If-None-Match gets an empty 304 after a single SQL statement
+(the version lookup); every write changes the ETag of each response it affects
+and leaves the others alone; the migration adds the version columns.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import MetaData, create_engine, text
+
+from migrations import MIGRATIONS
+from seed_data import auth_headers, make_users, make_ride
+
+EVERYONE_ON_THE_RIDE = ['publisher my-published', 'passenger my-requests', 'ride details']
+
+
+@pytest.fixture
+def seeded(db):
+    publisher, passenger, bystander = make_users(3)
+    departs_at = datetime.now() + timedelta(days=2)
+    ride = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', departs_at, seats=4)
+    db.session.commit()
+    seeded = {'ride_id': ride.id, 'date': departs_at.strftime('%Y-%m-%d'), 'publisher': auth_headers(publisher),
+              'passenger': auth_headers(passenger), 'bystander': auth_headers(bystander)}
+    db.session.remove()
+    return seeded
+
+
+@pytest.fixture
+def views(client, seeded):
+    return {
+        'publisher my-published': lambda: client.get('/api/rides/my-published', headers=seeded['publisher']),
+        'passenger my-requests': lambda: client.get('/api/requests/my-requests', headers=seeded['passenger']),
+        'bystander my-requests': lambda: client.get('/api/requests/my-requests', headers=seeded['bystander']),
+        'ride details': lambda: client.get(f"/api/rides/{seeded['ride_id']}", headers=seeded['publisher']),
+    }
+
+
+@pytest.mark.parametrize('name', ['publisher my-published', 'passenger my-requests', 'bystander my-requests', 'ride details'])
+def test_repeated_get_is_a_304_after_one_statement(client, views, count_sql, name):
+    response = views[name]()
+    assert response.status_code == 200
+    with count_sql() as counter:
+        again = client.get(response.request.path, headers={**response.request.headers, 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304 and not again.data
+    assert counter.count == 1
+
+
+def test_writes_change_exactly_the_etags_they_affect(client, seeded, views):
+    etags = {name: view().headers.get('ETag') for name, view in views.items()}
+
+    def after(write, changed):
+        nonlocal etags
+        response = write()
+        assert response.status_code in (200, 201), response.get_data(as_text=True)
+        current = {name: view().headers.get('ETag') for name, view in views.items()}
+        assert {name for name in views if current[name] != etags[name]} == set(changed)
+        etags = current
+        return response
+
+    ride_id = seeded['ride_id']
+    publisher, passenger, bystander = seeded['publisher'], seeded['passenger'], seeded['bystander']
+    response = after(lambda: client.post('/api/requests', headers=passenger, json={'rideId': ride_id}), EVERYONE_ON_THE_RIDE)
+    request_id = response.get_json()['request']['id']
+    after(lambda: client.put(f'/api/requests/{request_id}/approve', headers=publisher), EVERYONE_ON_THE_RIDE)
+    after(lambda: client.put(f'/api/requests/{request_id}/remove', headers=publisher), EVERYONE_ON_THE_RIDE)
+
+    bystander_views = ['publisher my-published', 'bystander my-requests', 'ride details']
+    response = after(lambda: client.post('/api/requests', headers=bystander, json={'rideId': ride_id}), bystander_views)
+    request_id = response.get_json()['request']['id']
+    after(lambda: client.put(f'/api/requests/{request_id}/reject', headers=publisher), bystander_views)
+
+    response = after(lambda: client.post('/api/requests', headers=passenger, json={'rideId': ride_id}), EVERYONE_ON_THE_RIDE)
+    request_id = response.get_json()['request']['id']
+    after(lambda: client.delete(f'/api/requests/{request_id}', headers=passenger), EVERYONE_ON_THE_RIDE)
+
+    after(lambda: client.post('/api/rides', headers=publisher, json={
+        'pickupCity': 'Delhi', 'dropCity': 'Chandigarh', 'pickupAddress': 'ISBT', 'dropAddress': 'Sector 17',
+        'date': seeded['date'], 'time': '18:00', 'availableSeats': 2, 'costPerPerson': 300,
+        'carModel': 'i20', 'licensePlate': 'DL 2C 0001'
+    }), ['publisher my-published'])
+    after(lambda: client.delete(f'/api/rides/{ride_id}', headers=publisher), list(views))
+
+
+def test_migration_adds_version_columns(tmp_path):
+    legacy_path = tmp_path / 'legacy.db'
+    conn = sqlite3.connect(legacy_path)
+    conn.executescript(
+        'CREATE TABLE user (id INTEGER PRIMARY KEY, name TEXT);'
+        'CREATE TABLE ride (id INTEGER PRIMARY KEY, pickup_city TEXT);'
+        "INSERT INTO user VALUES (1, 'a'); INSERT INTO ride VALUES (1, 'Delhi');"
+    )
+    conn.close()
+    migrate = dict((version, fn) for version, _, fn in MIGRATIONS)[5]
+    with create_engine(f'sqlite:///{legacy_path}').begin() as conn:
+        migrate(conn, MetaData())
+        migrate(conn, MetaData())  # safe to re-run
+        versions = conn.execute(text('SELECT listing_version, (SELECT version FROM ride) FROM user')).one()
+    assert tuple(versions) == (0, 0)
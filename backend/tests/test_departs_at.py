@@ -0,0 +1,87 @@
+"""
+ride.departs_at and the departure checks built on it.
+
+Migration 6 backfills the column; search leaves out rides that already left;
+cancelling or removing an approved seat within 30 minutes of departure is
+refused and gives no seats back, earlier it frees the seats; removing a
+passenger who was never approved says so, whenever it happens.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import Ride
+from migrations import MIGRATIONS
+from seed_data import auth_headers, make_users, make_ride, make_request
+
+
+@pytest.fixture
+def seeded(db):
+    now = datetime.now().replace(second=0, microsecond=0)
+    publisher, passenger, other, waiting = make_users(4)
+    departed = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', now - timedelta(minutes=10))
+    soon = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', now + timedelta(minutes=20), seats=3)
+    later = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', now + timedelta(hours=2), seats=3)
+    db.session.flush()
+    requests = {(ride.id, role): make_request(ride, user, status='approved')
+                for ride in (soon, later) for role, user in (('passenger', passenger), ('other', other))}
+    pending = make_request(soon, waiting)
+    for ride in (soon, later):
+        ride.available_seats -= 2
+    db.session.commit()
+    seeded = {
+        'departed': departed.id, 'soon': soon.id, 'later': later.id, 'pending': pending.id,
+        'departs_at': {ride.id: ride.departs_at for ride in (departed, soon, later)},
+        'requests': {key: request_obj.id for key, request_obj in requests.items()},
+        'publisher': auth_headers(publisher), 'passenger': auth_headers(passenger), 'other': auth_headers(other),
+    }
+    db.session.remove()
+    return seeded
+
+
+def seats(db, ride_id):
+    db.session.remove()
+    return db.session.get(Ride, ride_id).available_seats
+
+
+def test_migration_backfills_departs_at(db, sqlite_only, seeded):
+    # Rebuild the column the way an old database gets it
+    migrate = next(fn for version, _, fn in MIGRATIONS if version == 6)
+    with db.engine.begin() as conn:
+        for index in ('ix_ride_departs_at', 'ix_ride_publisher_departs_at'):
+            conn.execute(text(f'DROP INDEX {index}'))
+        conn.execute(text('ALTER TABLE ride DROP COLUMN departs_at'))
+        migrate(conn, db.metadata)
+    db.session.remove()
+    assert {ride.id: ride.departs_at for ride in Ride.query} == seeded['departs_at']
+
+
+def test_search_leaves_out_departed_rides(client, seeded):
+    response = client.post('/api/rides/search', headers=seeded['other'], json={'pickupCity': 'Panipat', 'dropCity': 'Chandigarh'})
+    assert [ride['id'] for ride in response.get_json()['rides']] == [seeded['soon'], seeded['later']]
+
+
+def test_removing_a_pending_request_is_refused(db, client, seeded):
+    response = client.put(f"/api/requests/{seeded['pending']}/remove", headers=seeded['publisher'])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Passenger is not approved for this ride'
+    assert seats(db, seeded['soon']) == 1
+
+
+def test_no_changes_within_the_cutoff(db, client, seeded):
+    requests = seeded['requests']
+    cancel = client.delete(f"/api/requests/{requests[(seeded['soon'], 'passenger')]}", headers=seeded['passenger'])
+    remove = client.put(f"/api/requests/{requests[(seeded['soon'], 'other')]}/remove", headers=seeded['publisher'])
+    assert cancel.status_code == remove.status_code == 400
+    assert seats(db, seeded['soon']) == 1
+
+
+def test_changes_before_the_cutoff_free_seats(db, client, seeded):
+    requests = seeded['requests']
+    cancel = client.delete(f"/api/requests/{requests[(seeded['later'], 'passenger')]}", headers=seeded['passenger'])
+    remove = client.put(f"/api/requests/{requests[(seeded['later'], 'other')]}/remove", headers=seeded['publisher'])
+    again = client.put(f"/api/requests/{requests[(seeded['later'], 'other')]}/remove", headers=seeded['publisher'])
+    assert cancel.status_code == remove.status_code == 200
+    assert again.status_code == 400
+    assert seats(db, seeded['later']) == 3
@@ -0,0 +1,90 @@
+"""
+The email outbox against the local SMTP stand-in (local_smtp.py).
+
+A signup burst delivers every verification email exactly once over pooled
+connections; with SMTP unreachable emails stay queued with a retry scheduled;
+the SendGrid transport reuses one keep-alive connection.
+"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import EmailOutbox, email_queue, smtp_pool
+from local_smtp import LocalSMTPServer
+from mail_transport import SendGridTransport
+
+SIGNUPS = 10
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class _AcceptingAPIHandler(BaseHTTPRequestHandler):
+    """Answers every POST with 202 like SendGrid, keeping the connection open"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def smtp_server(db, monkeypatch):
+    """The app's SMTP pool pointed at a local SMTP server"""
+    with LocalSMTPServer() as server:
+        for name, value in (('host', '127.0.0.1'), ('port', server.port), ('username', 'dev'), ('password', 'dev'), ('use_tls', False)):
+            monkeypatch.setattr(smtp_pool, name, value)
+        yield server
+        email_queue.stop()
+        smtp_pool.close_idle()
+
+
+def test_signup_burst_is_delivered_once_over_pooled_connections(client, smtp_server, monkeypatch):
+    monkeypatch.setattr(email_queue, 'workers', 2)
+    for i in range(SIGNUPS):
+        response = client.post('/api/auth/signup', json={
+            'name': f'Student {i}', 'year': '1st Year', 'email': f'student{i}@example.edu',
+            'college': 'Example College', 'password': 'password'
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+    deadline = time.time() + 30
+    while time.time() < deadline and EmailOutbox.query.filter(EmailOutbox.status != 'sent').count():
+        time.sleep(0.1)
+    assert EmailOutbox.query.filter_by(status='sent').count() == SIGNUPS
+    assert sorted(recipients[0] for _, recipients, _ in smtp_server.messages) == sorted(f'student{i}@example.edu' for i in range(SIGNUPS))
+    assert smtp_server.connections <= email_queue.workers
+
+
+def test_smtp_down_keeps_emails_queued_with_backoff(db, smtp_server, monkeypatch):
+    monkeypatch.setattr(smtp_pool, 'port', unused_port())
+    email_queue.enqueue('late@example.edu', 'Verify Your LinkLift Account', '<p>hi</p>')
+    email_queue.process_once()
+    db.session.remove()
+    email = EmailOutbox.query.filter_by(to_email='late@example.edu').one()
+    assert email.status == 'pending' and email.attempts == 1
+    assert email.next_attempt_at > email.created_at
+    assert email.last_error
+
+
+def test_sendgrid_transport_reuses_one_connection():
+    api_server = ThreadingHTTPServer(('127.0.0.1', 0), _AcceptingAPIHandler)
+    threading.Thread(target=api_server.serve_forever, daemon=True).start()
+    try:
+        transport = SendGridTransport('test-key', host=f'127.0.0.1:{api_server.server_address[1]}', use_https=False)
+        statuses = [transport.send({'subject': f'email {i}'})[0] for i in range(20)]
+    finally:
+        api_server.shutdown()
+    assert statuses == [202] * 20
+    assert transport.metrics.snapshot()['connections_opened'] == 1
@@ -0,0 +1,158 @@
+"""
+The Server-Sent Events stream at /api/events/stream.
+
+Streams are opened with a short-lived token from POST /api/events/token (never
+the access JWT); an open stream receives events published to its user, a
+reconnect with Last-Event-ID replays only what was missed, the stream ends
+after EVENTS_STREAM_SECONDS and frees its subscription, and past
+EVENTS_MAX_STREAMS open streams (derived from GUNICORN_THREADS) the token
+request and the stream answer 503 with Retry-After.
+"""
+import json
+import threading
+
+import pytest
+
+import app as linklift
+from app import event_bus
+from events import stream_slots
+from seed_data import auth_headers, make_users
+
+
+@pytest.fixture
+def user(db):
+    user = make_users(1)[0]
+    db.session.commit()
+    seeded = {'id': user.id, 'headers': auth_headers(user)}
+    db.session.remove()
+    return seeded
+
+
+def stream_token(client, user):
+    response = client.post('/api/events/token', headers=user['headers'])
+    assert response.status_code == 200
+    return response.get_json()['token']
+
+
+def open_stream(client, token, **headers):
+    return client.get('/api/events/stream', query_string={'token': token}, headers=headers, buffered=False)
+
+
+def read_event(chunks):
+    """Next non-heartbeat chunk as (id, event, data)"""
+    for chunk in chunks:
+        chunk = chunk.decode()
+        if chunk.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+def test_token_requires_login(client):
+    assert client.post('/api/events/token').status_code == 401
+
+
+def test_stream_rejects_missing_bad_and_access_tokens(client, user):
+    access_token = user['headers']['Authorization'].split(' ', 1)[1]
+    assert client.get('/api/events/stream').status_code == 401
+    assert client.get('/api/events/stream', query_string={'token': 'not-a-token'}).status_code == 401
+    assert client.get('/api/events/stream', query_string={'token': access_token}).status_code == 401
+    assert client.get('/api/events/stream', query_string={'jwt': access_token}).status_code == 401
+
+
+def test_stream_rejects_expired_token(client, user, monkeypatch):
+    token = stream_token(client, user)
+    monkeypatch.setattr(linklift, 'EVENTS_TOKEN_SECONDS', -1)
+    assert open_stream(client, token).status_code == 401
+
+
+def test_subscribed_stream_receives_published_events(client, user):
+    response = open_stream(client, stream_token(client, user))
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next(chunks) == f'retry: {linklift.EVENTS_RETRY_MS}\n\n'.encode()
+
+        event_bus.publish([user['id']], 'chat_message', {'rideId': 1, 'message': {'id': 7}})
+        _, event, data = read_event(chunks)
+        assert event == 'chat_message'
+        assert data == {'rideId': 1, 'message': {'id': 7}}
+    finally:
+        response.close()
+
+
+def test_reconnect_replays_events_after_last_event_id(client, user):
+    # Both events are published while the page is between streams; it saw only the first
+    subscription = event_bus.subscribe(user['id'])
+    event_bus.publish([user['id']], 'request_created', {'requestId': 1})
+    first = subscription.get(timeout=0.1)
+    event_bus.unsubscribe(subscription)
+    event_bus.publish([user['id']], 'request_approved', {'requestId': 2})
+
+    response = open_stream(client, stream_token(client, user), **{'Last-Event-ID': str(first.id)})
+    try:
+        chunks = iter(response.response)
+        next(chunks)
+        event_id, event, data = read_event(chunks)
+        assert event_id > first.id
+        assert (event, data) == ('request_approved', {'requestId': 2})
+    finally:
+        response.close()
+
+
+def test_stream_expires_and_unsubscribes(client, user, monkeypatch):
+    monkeypatch.setattr(linklift, 'EVENTS_STREAM_SECONDS', 0.2)
+    before = event_bus.subscriber_count()
+    response = open_stream(client, stream_token(client, user))
+    assert event_bus.subscriber_count() == before + 1
+
+    # The generator returns on its own once the deadline passes
+    done = threading.Event()
+
+    def drain():
+        list(response.response)
+        done.set()
+    threading.Thread(target=drain, daemon=True).start()
+    assert done.wait(5)
+
+    response.close()
+    assert event_bus.subscriber_count() == before
+
+
+def test_streams_past_the_cap_get_503_with_retry(client, user, monkeypatch):
+    monkeypatch.setattr(linklift, 'event_stream_slots', threading.BoundedSemaphore(1))
+    token = stream_token(client, user)
+    before = event_bus.subscriber_count()
+
+    first = open_stream(client, token)
+    assert first.status_code == 200
+    rejected = open_stream(client, token)
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == str(linklift.EVENTS_BUSY_RETRY_SECONDS)
+    assert rejected.get_data(as_text=True) == f'retry: {linklift.EVENTS_BUSY_RETRY_SECONDS * 1000}\n\n'
+    # A rejected stream never subscribes
+    assert event_bus.subscriber_count() == before + 1
+    # EventSource can't read the 503, so the token request reports it too
+    busy = client.post('/api/events/token', headers=user['headers'])
+    assert busy.status_code == 503
+    assert busy.headers['Retry-After'] == str(linklift.EVENTS_BUSY_RETRY_SECONDS)
+
+    first.close()
+    assert event_bus.subscriber_count() == before
+    second = open_stream(client, token)
+    try:
+        assert second.status_code == 200
+    finally:
+        second.close()
+
+
+def test_stream_cap_leaves_a_thread_for_the_api():
+    assert stream_slots(8) == 4
+    assert stream_slots(8, 6) == 6
+    assert stream_slots(8, 8) == 7
+    assert stream_slots(8, 20) == 7
+    assert stream_slots(2) == 1
+    # A single-threaded worker serves no streams - every stream would block the API
+    assert stream_slots(1) == 0
+    assert stream_slots(1, 4) == 0
@@ -0,0 +1,82 @@
+"""
+The hot queries use index scans.
+
+Captures the SQL that the search, my-requests and messages endpoints issue on a
+seeded database and runs EXPLAIN on each statement; a full table scan of ride,
+ride_stop, request or chat_message fails. Against Postgres (TEST_DATABASE_URL)
+raise RIDES so the planner has a reason to prefer the indexes.
+"""
+import os
+import re
+
+from sqlalchemy import event
+
+from seed_data import auth_headers, make_users, make_random_rides, make_request, make_message
+
+HOT_TABLES = ('ride', 'ride_stop', 'request', 'chat_message')
+RIDES = int(os.getenv('INDEX_CHECK_RIDES', 2000))
+
+
+def explain(conn, statement, parameters):
+    """Return the query plan as a list of lines"""
+    if conn.dialect.name == 'postgresql':
+        rows = conn.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()
+        return [row[0] for row in rows]
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    """Return the hot tables (or their aliases) that the plan reads without an index"""
+    scans = []
+    for line in plan:
+        # Postgres: "Seq Scan on ride ride_1  (cost=...)"; SQLite: "SCAN ride_1"
+        match = re.search(r'Seq Scan on (\w+)', line) or re.match(r'\s*SCAN (\w+)$', line)
+        if match and match.group(1).rstrip('_0123456789') in HOT_TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+def test_hot_queries_use_indexes(db, client):
+    users = make_users(200)
+    rides = make_random_rides(users[:100], RIDES)
+    for i, ride in enumerate(rides):
+        make_request(ride, users[100 + i % 100], status=('pending', 'approved', 'rejected')[i % 3])
+        make_message(ride, users[100 + i % 100])
+    db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+    headers = auth_headers(users[150])
+    ride_id = rides[0].id
+    db.session.remove()
+
+    calls = {
+        'search': lambda: client.post('/api/rides/search', json={'pickupCity': 'Panipat', 'dropCity': 'Chandigarh'}, headers=headers),
+        'my-requests': lambda: client.get('/api/requests/my-requests', headers=headers),
+        'messages': lambda: client.get(f'/api/rides/{ride_id}/messages', headers=headers),
+    }
+    scans = {}
+    for name, call in calls.items():
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            assert call().status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        # Repeated statements (e.g. per-row lookups) only need one plan
+        seen = set()
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                tables = full_scans(explain(conn, statement, parameters))
+                if tables:
+                    scans[f"{name}: {' '.join(statement.split())[:120]}"] = tables
+    assert not scans
@@ -0,0 +1,115 @@
+"""
+The multi-leg journey planner and /api/rides/plan.
+
+The endpoint chains two rides through a transfer city respecting the minimum
+connection time, picks up rides published through the API and by other workers,
+and drops cancelled ones; every itinerary the index returns is valid.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app import journey_index, Ride, User
+from benchmark_journey_planner import synthetic_rides, valid
+from cities import INDIAN_CITIES
+from journey_planner import JourneyIndex
+from seed_data import auth_headers, make_users, make_ride
+
+
+@pytest.fixture
+def seeded(db):
+    driver, other_driver, traveller = make_users(3)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    # Chandigarh is reached at start + 3h (estimated); only the 4h departure leaves enough time to connect
+    first = make_ride(driver, 'Delhi', ['Panipat', 'Karnal'], 'Chandigarh', start)
+    make_ride(other_driver, 'Chandigarh', [], 'Shimla', start + timedelta(hours=3, minutes=10))
+    second = make_ride(other_driver, 'Chandigarh', ['Solan'], 'Shimla', start + timedelta(hours=4))
+    db.session.commit()
+    seeded = {'start': start, 'transfer': [[first.id, second.id]], 'other_driver_id': other_driver.id,
+              'driver': auth_headers(driver), 'traveller': auth_headers(traveller)}
+    db.session.remove()
+    return seeded
+
+
+@pytest.fixture
+def plan(client, seeded):
+    def plan():
+        response = client.post('/api/rides/plan', json={'pickupCity': 'Delhi', 'dropCity': 'Shimla'}, headers=seeded['traveller'])
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return [[leg['rideId'] for leg in itinerary['legs']] for itinerary in response.get_json()['itineraries']]
+    return plan
+
+
+def test_transfer_respects_the_connection_time(seeded, plan):
+    assert plan() == seeded['transfer']
+
+
+def test_published_and_cancelled_rides(client, seeded, plan):
+    departs_at = seeded['start'] + timedelta(hours=1)
+    response = client.post('/api/rides', headers=seeded['driver'], json={
+        'pickupCity': 'Delhi', 'dropCity': 'Shimla', 'pickupAddress': 'ISBT', 'dropAddress': 'Mall Road',
+        'date': departs_at.strftime('%Y-%m-%d'), 'time': departs_at.strftime('%H:%M'),
+        'availableSeats': 3, 'costPerPerson': 900, 'carModel': 'Innova', 'licensePlate': 'DL 3C 0002'
+    })
+    direct_id = response.get_json()['ride']['id']
+    assert plan() == [[direct_id]]
+    client.delete(f'/api/rides/{direct_id}', headers=seeded['driver'])
+    assert plan() == seeded['transfer']
+
+
+def test_rides_written_by_other_workers(db, seeded, plan):
+    plan()
+    # Straight to the database, bypassing this worker's index updates
+    ride = make_ride(db.session.get(User, seeded['other_driver_id']), 'Delhi', ['Chandigarh'], 'Shimla',
+                     seeded['start'] + timedelta(minutes=30))
+    db.session.commit()
+    ride_id = ride.id
+    db.session.remove()
+    assert plan() == [[ride_id]]
+    db.session.delete(db.session.get(Ride, ride_id))
+    db.session.commit()
+    db.session.remove()
+    assert plan() == seeded['transfer']
+
+
+def test_index_itineraries_are_valid():
+    cities = list(INDIAN_CITIES[:50])
+    index = JourneyIndex()
+    index.rebuild(list(synthetic_rides(5000, cities)))
+    rng = random.Random(11)
+    depart_after = datetime.now()
+    planned = 0
+    for _ in range(100):
+        origin, destination = rng.sample(cities, 2)
+        for legs in index.plan(origin, destination, depart_after + timedelta(hours=rng.randrange(0, 24 * 20))):
+            planned += 1
+            assert valid(index, origin, destination, depart_after, legs)
+    assert planned
+
+
+@pytest.mark.parametrize('body', [
+    None, [], {'pickupCity': 'Delhi', 'dropCity': 'Shimla', 'passengers': 'two'},
+    {'pickupCity': 'Delhi', 'dropCity': 'Shimla', 'maxTransfers': None}, {'pickupCity': 'Delhi', 'dropCity': 'Shimla', 'date': 'soon'},
+    {'pickupCity': 'Delhi', 'dropCity': 'Shimla', 'passengers': 0}, {'pickupCity': 'Delhi', 'dropCity': 'Delhi'},
+])
+def test_bad_input_is_refused(client, seeded, body):
+    response = client.post('/api/rides/plan', json=body, headers=seeded['traveller'])
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+
+def test_catch_ups_start_after_the_newest_ride(db, client):
+    publisher, traveller = make_users(2)
+    # Only rides that already left: the rebuilt index is empty
+    for hours in range(1, 4):
+        make_ride(publisher, 'Delhi', [], 'Shimla', datetime.now() - timedelta(hours=hours))
+    db.session.commit()
+    newest_id = db.session.query(func.max(Ride.id)).scalar()
+    headers = auth_headers(traveller)
+    db.session.remove()
+
+    assert client.post('/api/rides/plan', json={'pickupCity': 'Delhi', 'dropCity': 'Shimla'}, headers=headers).status_code == 200
+    assert len(journey_index) == 0
+    assert journey_index.max_ride_id == newest_id
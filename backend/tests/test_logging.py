@@ -0,0 +1,123 @@
+"""
+Structured logging (app_logging.py).
+
+Each record is one JSON object with ts, level, logger, message, its extra
+fields and any exception; the background writer resolves arguments at the
+call and writes everything on stop; a full queue drops and counts records
+instead of blocking; LOG_LEVEL_<SUBSYSTEM> overrides LOG_LEVEL per subsystem.
+"""
+import io
+import json
+import logging
+import threading
+from datetime import datetime
+
+import pytest
+
+import app_logging
+from app_logging import setup_logging, stop_logging, dropped_records
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    """configure(stream, background, **env) sets up logging; the app's setup is restored afterwards"""
+    def configure(stream, background, **env):
+        for key in ('LOG_LEVEL', 'LOG_FORMAT', *(f'LOG_LEVEL_{s.upper()}' for s in app_logging.SUBSYSTEMS)):
+            monkeypatch.delenv(key, raising=False)
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        setup_logging(stream=stream, background=background)
+
+    yield configure
+    monkeypatch.undo()
+    setup_logging()
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_record_fields(configure):
+    stream = io.StringIO()
+    configure(stream, background=False)
+    log = logging.getLogger('linklift.rides')
+
+    log.info('Ride %s published', 42, extra={'ride_id': 42, 'seats': 3, 'departs_at': datetime(2026, 1, 2, 9, 30)})
+    try:
+        raise RuntimeError('boom')
+    except RuntimeError:
+        log.exception('Failed to send ride alerts', extra={'ride_ids': [42]})
+
+    published, failed = lines(stream)
+    assert set(published) == {'ts', 'level', 'logger', 'message', 'ride_id', 'seats', 'departs_at'}
+    assert published['level'] == 'INFO'
+    assert published['logger'] == 'linklift.rides'
+    assert published['message'] == 'Ride 42 published'
+    assert (published['ride_id'], published['seats'], published['departs_at']) == (42, 3, '2026-01-02 09:30:00')
+    assert datetime.fromisoformat(published['ts']).tzinfo is not None
+
+    assert failed['level'] == 'ERROR'
+    assert failed['ride_ids'] == [42]
+    assert 'RuntimeError: boom' in failed['exception']
+
+
+def test_background_writer_resolves_arguments_at_the_call(configure):
+    stream = io.StringIO()
+    configure(stream, background=True)
+    seats = [1]
+    logging.getLogger('linklift.rides').info('Seats %s', seats, extra={'seats': list(seats)})
+    seats.append(2)
+    stop_logging()
+
+    [record] = lines(stream)
+    assert record['message'] == 'Seats [1]'
+    assert record['seats'] == [1]
+
+
+class BlockingStream(io.StringIO):
+    """Holds the writer thread on its first write until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        assert self.release.wait(5)
+        return super().write(text)
+
+
+def test_full_queue_drops_and_counts_records(configure):
+    stream = BlockingStream()
+    configure(stream, background=True, LOG_QUEUE_SIZE='2')
+    log = logging.getLogger('linklift.http')
+
+    # The first record is taken off the queue and blocks the writer; two more fill the queue
+    log.info('request 0')
+    assert stream.writing.wait(5)
+    for i in range(1, 6):
+        log.info(f'request {i}')
+    assert dropped_records() == 3
+
+    stream.release.set()
+    stop_logging()
+    assert [record['message'] for record in lines(stream)] == ['request 0', 'request 1', 'request 2']
+
+
+def test_subsystem_level_overrides(configure):
+    stream = io.StringIO()
+    configure(stream, background=False, LOG_LEVEL='warning', LOG_LEVEL_EMAIL='DEBUG', LOG_LEVEL_HTTP='ERROR')
+
+    logging.getLogger('linklift.email').debug('email debug')
+    logging.getLogger('linklift.rides').info('rides info')
+    logging.getLogger('linklift.rides').warning('rides warning')
+    logging.getLogger('linklift.http').warning('http warning')
+    logging.getLogger('linklift.http').error('http error')
+
+    assert [record['message'] for record in lines(stream)] == ['email debug', 'rides warning', 'http error']
+
+
+def test_unknown_level_is_rejected(configure):
+    with pytest.raises(ValueError, match='Unknown log level'):
+        configure(io.StringIO(), background=False, LOG_LEVEL_DB='LOUD')
@@ -0,0 +1,83 @@
+"""
+The /api/metrics endpoint and request instrumentation.
+
+The Prometheus text reports known requests per endpoint (request counts, latency
+histogram, SQL statements per request, response sizes), METRICS_TOKEN protects
+the endpoint, and a request over the slow threshold is logged (linklift.http)
+with its slowest statement. The metrics live for the whole process, so the
+tests compare scrapes before and after.
+"""
+import logging
+import re
+from datetime import datetime, timedelta
+from logging.handlers import BufferingHandler
+
+import pytest
+
+import app as linklift
+from seed_data import auth_headers, make_users, make_ride
+
+SCRAPE = {'Authorization': 'Bearer scrape-me'}
+SEARCH = {'pickupCity': 'Panipat', 'dropCity': 'Chandigarh'}
+
+
+def sample(text, name, **labels):
+    """Value of one sample in Prometheus text, or 0 if it is not there yet"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(f'{name}{{{label_text}}}' if labels else name) + r' (\S+)'
+    match = re.search('^' + pattern + '$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+@pytest.fixture
+def headers(db, monkeypatch):
+    monkeypatch.setattr(linklift, 'METRICS_TOKEN', 'scrape-me')
+    publisher, passenger = make_users(2)
+    for i in range(5):
+        make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', datetime.now() + timedelta(days=1, hours=i))
+    db.session.commit()
+    headers = auth_headers(passenger)
+    db.session.remove()
+    return headers
+
+
+def test_metrics_need_the_token(client, headers):
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers=SCRAPE).status_code == 200
+
+
+def test_requests_are_counted_per_endpoint(client, headers):
+    before = client.get('/api/metrics', headers=SCRAPE).get_data(as_text=True)
+    for _ in range(3):
+        client.post('/api/rides/search', headers=headers, json=SEARCH)
+    client.get('/api/requests/my-requests', headers=headers)
+    client.post('/api/rides/search', headers=headers, json={})  # 400
+    after = client.get('/api/metrics', headers=SCRAPE).get_data(as_text=True)
+
+    def delta(name, **labels):
+        return sample(after, f'linklift_{name}', **labels) - sample(before, f'linklift_{name}', **labels)
+
+    assert delta('http_requests_total', endpoint='search_rides', status='200') == 3
+    assert delta('http_requests_total', endpoint='search_rides', status='400') == 1
+    assert delta('http_request_duration_seconds_count', endpoint='search_rides') == 4
+    # Each successful search is one statement; the 400 issues none
+    assert delta('sql_statements_per_request_bucket', endpoint='search_rides', le='1') == 4
+    assert delta('sql_statements_per_request_sum', endpoint='search_rides') == 3
+    assert delta('http_response_bytes_sum', endpoint='search_rides') > 0
+    # Version lookup + listing
+    assert delta('sql_statements_per_request_sum', endpoint='get_my_requests') == 2
+    assert 'linklift_search_cache_misses_total' in after and 'linklift_journey_index_rides' in after
+
+
+def test_slow_requests_are_logged_with_their_slowest_statement(client, headers, monkeypatch):
+    monkeypatch.setattr(linklift.request_metrics, 'slow_ms', 0)
+    captured = BufferingHandler(100)
+    logging.getLogger('linklift.http').addHandler(captured)
+    try:
+        client.post('/api/rides/search', headers=headers, json=SEARCH)
+    finally:
+        logging.getLogger('linklift.http').removeHandler(captured)
+    slow = [record for record in captured.buffer if record.getMessage() == 'Slow request']
+    assert len(slow) == 1 and slow[0].levelno == logging.WARNING
+    assert (slow[0].endpoint, slow[0].status) == ('search_rides', 200)
+    assert slow[0].slowest_sql.startswith('SELECT ride.id')
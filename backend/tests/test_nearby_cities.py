@@ -0,0 +1,79 @@
+"""
+Nearby-city search (radiusKm) and the grid index behind it.
+
+A Chandigarh -> Delhi search with radiusKm also finds rides boarding in Mohali,
+Panchkula or Zirakpur and getting off in Noida or Gurgaon, each ride once, while
+the exact search finds only its own; publishing a ride from a nearby city
+invalidates cached radius searches; the grid returns exactly what a scan of the
+whole catalog does.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmark_nearby_cities import scan_catalog
+from cities import CITIES, CITY_COORDINATES, nearby_cities
+from seed_data import auth_headers, make_users, make_ride, make_random_rides
+
+
+def test_every_catalog_city_has_coordinates():
+    assert set(CITY_COORDINATES) == set(CITIES)
+
+
+@pytest.mark.parametrize('radius_km', [10, 25, 50])
+def test_grid_matches_a_full_scan(radius_km):
+    assert [city for city in CITIES if nearby_cities.__wrapped__(city, radius_km) != scan_catalog(city, radius_km)] == []
+
+
+@pytest.fixture
+def seeded(db, search_cache):
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    driver, traveller = make_users(2)
+    make_random_rides([driver], 300)
+    exact = make_ride(driver, 'Chandigarh', ['Ambala'], 'Delhi', start)
+    nearby = [
+        make_ride(driver, 'Mohali', ['Ambala', 'Panipat'], 'Noida', start + timedelta(hours=1)),
+        # Passes two cities near Chandigarh and two near Delhi - still one result
+        make_ride(driver, 'Panchkula', ['Zirakpur', 'Ambala', 'Delhi'], 'Gurgaon', start + timedelta(hours=2)),
+    ]
+    # Leaves Mohali but never reaches the Delhi area
+    make_ride(driver, 'Mohali', ['Ambala'], 'Karnal', start + timedelta(hours=3))
+    db.session.commit()
+    seeded = {'start': start, 'exact': [exact.id], 'nearby': [ride.id for ride in nearby],
+              'driver': auth_headers(driver), 'traveller': auth_headers(traveller)}
+    db.session.remove()
+    return seeded
+
+
+@pytest.fixture
+def search(client, seeded):
+    def search(status=200, **body):
+        response = client.post('/api/rides/search', headers=seeded['traveller'],
+                               json={'pickupCity': 'Chandigarh', 'dropCity': 'Delhi', 'limit': 100, **body})
+        assert response.status_code == status, response.get_json()
+        return [ride['id'] for ride in response.get_json()['rides']] if status == 200 else None
+    return search
+
+
+def test_radius_search_finds_nearby_rides_once(seeded, search):
+    assert search() == seeded['exact']
+    found = search(radiusKm=30)
+    assert found == seeded['exact'] + seeded['nearby']
+    assert sorted(search(radiusKm=30, sort='best')) == sorted(found)
+
+
+def test_publishing_nearby_invalidates_radius_searches(client, seeded, search):
+    search(radiusKm=30)
+    search(radiusKm=30, sort='best')
+    response = client.post('/api/rides', headers=seeded['driver'], json={
+        'pickupCity': 'Zirakpur', 'dropCity': 'Ghaziabad', 'onRouteCities': ['Ambala'],
+        'pickupAddress': 'Bus stand', 'dropAddress': 'Railway station', 'date': seeded['start'].strftime('%Y-%m-%d'),
+        'time': '20:00', 'availableSeats': 2, 'costPerPerson': 400, 'carModel': 'Swift', 'licensePlate': 'PB 65 0001'
+    })
+    published_id = response.get_json()['ride']['id']
+    assert search(radiusKm=30)[-1:] == [published_id]
+    assert published_id in search(radiusKm=30, sort='best')
+
+
+def test_invalid_radius_is_refused(search):
+    search(status=400, radiusKm='far')
@@ -0,0 +1,88 @@
+"""
+Guard against N+1 queries in the listing endpoints.
+
+Each endpoint is called against a small and a large dataset and the SQL
+statements it issues are counted; the count must not grow with the number of
+rows and must stay within the endpoint's budget.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from seed_data import auth_headers, make_users, make_ride, make_request, make_message
+
+# Maximum statements per endpoint, regardless of data size
+BUDGETS = {
+    'search_rides': 1,
+    'search_rides_ranked': 1,
+    # +1 for the per-date counts over the whole range
+    'search_rides_date_range': 2,
+    'search_rides_nearby': 1,
+    # +1 for the version lookup behind the ETag (a 304 costs only that one)
+    'get_my_published_rides': 2,
+    'get_my_requests': 2,
+    'get_ride_details': 3,
+    'get_messages': 1,
+}
+
+
+def seed(db, size):
+    """Seed `size` rides, each with pending/approved requests and messages (many on the first ride)"""
+    db.drop_all()
+    db.create_all()
+    publisher, requestor = make_users(2, prefix='main')
+    passengers = make_users(size, prefix='passenger')
+    departs_at = datetime.now() + timedelta(days=2)
+
+    rides = [
+        make_ride(publisher, 'Delhi', ['Panipat', 'Karnal'], 'Chandigarh', departs_at + timedelta(hours=i), seats=size + 5)
+        for i in range(size)
+    ]
+    db.session.flush()
+    for ride, passenger in zip(rides, passengers):
+        make_request(ride, requestor)
+        make_request(ride, passenger, status='pending')
+        make_message(ride, publisher)
+        make_message(rides[0], passenger)
+    # Many approved passengers on the first ride
+    for passenger in passengers:
+        make_request(rides[0], passenger, status='approved')
+    db.session.commit()
+
+    seeded = {
+        'publisher': auth_headers(publisher),
+        'requestor': auth_headers(requestor),
+        'ride_id': rides[0].id,
+        'date': departs_at.date().isoformat(),
+    }
+    # Start the endpoints with an empty identity map, like a real request
+    db.session.remove()
+    return seeded
+
+
+def statements(client, count_sql, seeded, endpoint):
+    calls = {
+        'search_rides': lambda: client.post('/api/rides/search', json={'pickupCity': 'Panipat', 'dropCity': 'Chandigarh'}, headers=seeded['requestor']),
+        'search_rides_ranked': lambda: client.post('/api/rides/search', json={'pickupCity': 'Panipat', 'dropCity': 'Chandigarh', 'sort': 'best'}, headers=seeded['requestor']),
+        'search_rides_date_range': lambda: client.post('/api/rides/search', json={
+            'pickupCity': 'Panipat', 'dropCity': 'Chandigarh', 'date': seeded['date'], 'dateRange': 3,
+            'timeFrom': '06:00', 'timeTo': '22:00', 'limit': 100}, headers=seeded['requestor']),
+        'search_rides_nearby': lambda: client.post('/api/rides/search', json={
+            'pickupCity': 'Panipat', 'dropCity': 'Chandigarh', 'radiusKm': 30, 'sort': 'best'}, headers=seeded['requestor']),
+        'get_my_published_rides': lambda: client.get('/api/rides/my-published', headers=seeded['publisher']),
+        'get_my_requests': lambda: client.get('/api/requests/my-requests', headers=seeded['requestor']),
+        'get_ride_details': lambda: client.get(f"/api/rides/{seeded['ride_id']}", headers=seeded['publisher']),
+        'get_messages': lambda: client.get(f"/api/rides/{seeded['ride_id']}/messages", headers=seeded['publisher']),
+    }
+    with count_sql() as counter:
+        response = calls[endpoint]()
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return counter.count
+
+
+@pytest.mark.parametrize('endpoint', BUDGETS)
+def test_statements_do_not_grow_with_rows(db, client, count_sql, endpoint):
+    small = statements(client, count_sql, seed(db, 2), endpoint)
+    large = statements(client, count_sql, seed(db, 25), endpoint)
+    assert small == large <= BUDGETS[endpoint], \
+        f'{small} statements with 2 rides, {large} with 25 rides, budget {BUDGETS[endpoint]}'
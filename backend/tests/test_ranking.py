@@ -0,0 +1,44 @@
+"""
+The search ranking stage (ride_ranking.py) and sort=best.
+
+The NumPy path and the pure Python fallback give the same scores and ranking,
+and sort=best puts the ride matching the requested route and time first.
+benchmark_ranking.py times the stage against its budget.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmark_ranking import synthetic_candidates
+from ride_ranking import NUMPY_AVAILABLE, DEFAULT_WEIGHTS, score_candidates, rank
+from seed_data import auth_headers, make_users, make_ride
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason='numpy is not installed')
+def test_numpy_and_python_agree():
+    columns = synthetic_candidates(5000)
+    python_scores = score_candidates(*columns, DEFAULT_WEIGHTS, use_numpy=False)
+    numpy_scores = score_candidates(*columns, DEFAULT_WEIGHTS, use_numpy=True)
+    assert max(abs(a - b) for a, b in zip(numpy_scores, python_scores)) < 1e-9
+    assert rank(numpy_scores, use_numpy=True) == rank(python_scores, use_numpy=False)
+
+
+def test_best_sort_puts_the_matching_ride_first(db, client):
+    publisher, rider = make_users(2)
+    day = (datetime.now() + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Earlier, but a detour through the rider's cities at an odd hour
+    make_ride(publisher, 'Delhi', ['Panipat', 'Karnal'], 'Chandigarh', day + timedelta(hours=6), cost=250.0)
+    # Panipat -> Chandigarh exactly, at the requested time, median price
+    best = make_ride(publisher, 'Panipat', ['Karnal'], 'Chandigarh', day + timedelta(hours=17), cost=300.0)
+    # Right time but expensive and nearly full
+    make_ride(publisher, 'Panipat', [], 'Chandigarh', day + timedelta(hours=17, minutes=30), seats=1, cost=900.0)
+    db.session.commit()
+    best_id = best.id
+    headers = auth_headers(rider)
+    db.session.remove()
+
+    response = client.post('/api/rides/search', headers=headers, json={
+        'pickupCity': 'Panipat', 'dropCity': 'Chandigarh', 'date': day.strftime('%Y-%m-%d'), 'time': '17:00', 'sort': 'best'
+    })
+    assert response.status_code == 200
+    assert response.get_json()['rides'][0]['id'] == best_id
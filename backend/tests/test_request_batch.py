@@ -0,0 +1,94 @@
+"""
+The batch approve/reject endpoint (PUT /api/rides/<id>/requests).
+
+Approvals are taken in order while seats last and every item gets its own
+outcome; a batch commits once and ends where the single calls would; threads
+racing batches and single approvals never overbook a ride.
+"""
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import Ride, Request
+from seed_data import auth_headers, make_users, make_ride, make_request
+
+THREADS = 16
+
+
+def seed(db, seats, passengers, prefix='user'):
+    """A ride with `seats` seats and one pending request per entry of `passengers` (seats asked for)"""
+    publisher, *requestors = make_users(len(passengers) + 1, prefix)
+    ride = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', datetime.now() + timedelta(days=1), seats=seats)
+    other = make_ride(publisher, 'Delhi', [], 'Jaipur', datetime.now() + timedelta(days=1))
+    db.session.flush()
+    requests = [make_request(ride, requestor, num_passengers=n) for requestor, n in zip(requestors, passengers)]
+    foreign = make_request(other, requestors[0])
+    db.session.commit()
+    seeded = ride.id, [request_obj.id for request_obj in requests], foreign.id, auth_headers(publisher)
+    db.session.remove()
+    return seeded
+
+
+def state(db, ride_id):
+    """(seats left, seats approved)"""
+    db.session.remove()
+    seats = db.session.get(Ride, ride_id).available_seats
+    approved = Request.query.filter_by(ride_id=ride_id, status='approved').with_entities(Request.num_passengers).all()
+    db.session.remove()
+    return seats, sum(n for (n,) in approved)
+
+
+def test_every_item_gets_its_own_outcome(db, client):
+    ride_id, request_ids, foreign_id, headers = seed(db, 4, [1, 2, 2, 1, 1])
+    client.put(f'/api/requests/{request_ids[4]}/reject', headers=headers)
+    response = client.put(f'/api/rides/{ride_id}/requests', headers=headers, json={'decisions': [
+        {'requestId': request_ids[0], 'decision': 'approve'},
+        {'requestId': request_ids[1], 'decision': 'approve'},
+        {'requestId': request_ids[2], 'decision': 'approve'},  # only 1 seat left
+        {'requestId': request_ids[3], 'decision': 'reject'},
+        {'requestId': request_ids[4], 'decision': 'approve'},  # already rejected
+        {'requestId': foreign_id, 'decision': 'approve'},  # another ride's request
+    ]})
+    assert response.status_code == 200
+    assert [item.get('status') or item['error'] for item in response.get_json()['results']] == [
+        'approved', 'approved', 'Not enough seats available', 'rejected', 'Request is no longer pending',
+        'Request not found for this ride']
+    assert state(db, ride_id) == (1, 3)
+
+
+def test_one_batch_commits_once_and_matches_single_calls(db, client, count_sql):
+    results = {}
+    for mode in ('single', 'batch'):
+        ride_id, request_ids, _, headers = seed(db, 20, [1] * 10, mode)
+        decisions = [{'requestId': request_id, 'decision': 'approve' if i % 2 else 'reject'}
+                     for i, request_id in enumerate(request_ids)]
+        with count_sql() as counter:
+            if mode == 'batch':
+                assert client.put(f'/api/rides/{ride_id}/requests', headers=headers, json={'decisions': decisions}).status_code == 200
+            else:
+                for item in decisions:
+                    assert client.put(f"/api/requests/{item['requestId']}/{item['decision']}", headers=headers).status_code == 200
+        results[mode] = counter.commits, state(db, ride_id)
+    assert results['batch'][0] == 1
+    assert results['batch'][1] == results['single'][1] == (15, 5)
+
+
+def test_racing_batches_never_overbook(db, app):
+    seats = 10
+    ride_id, request_ids, _, headers = seed(db, seats, [1] * 60)
+    rng = random.Random(3)
+    jobs = [('single', rng.choice(request_ids)) if i % 2 else ('batch', rng.sample(request_ids, 8)) for i in range(THREADS * 2)]
+
+    def run(job):
+        mode, target = job
+        if mode == 'single':
+            return app.test_client().put(f'/api/requests/{target}/approve', headers=headers).status_code
+        return app.test_client().put(f'/api/rides/{ride_id}/requests', headers=headers, json={
+            'decisions': [{'requestId': request_id, 'decision': 'approve'} for request_id in target]
+        }).status_code
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        statuses = Counter(pool.map(run, jobs))
+    left, approved = state(db, ride_id)
+    assert left >= 0 and left + approved == seats, dict(statuses)
@@ -0,0 +1,180 @@
+"""
+Recurring ride templates and the rides materialized from them.
+
+Saving a weekday template creates its rides up to the horizon only; they are
+found by search, alert matching saved searches and work like one-off rides.
+materialize_rides() extends them as the horizon moves and a stale template
+creates nothing; deleting a template cancels its upcoming rides without open
+requests; migration 7 adds ride.template_id.
+"""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app import event_bus, EmailOutbox, materialize_batch, materialize_rides, Ride, RideStop, RideTemplate, RIDE_TEMPLATE_HORIZON_DAYS
+from migrations import MIGRATIONS
+from seed_data import auth_headers, make_users, make_saved_search
+
+TEMPLATE = {
+    'pickupCity': 'Delhi', 'dropCity': 'Chandigarh', 'onRouteCities': ['Panipat', 'Karnal'],
+    'pickupAddress': 'ISBT', 'dropAddress': 'Sector 17', 'time': '08:30', 'weekdays': ['mon', 'tue', 'wed', 'thu', 'fri'],
+    'availableSeats': 3, 'costPerPerson': 300, 'carModel': 'i20', 'licensePlate': 'DL 2C 0001'
+}
+
+
+def weekdays(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1) if (start + timedelta(days=i)).weekday() < 5]
+
+
+@pytest.fixture
+def saved(db, client):
+    """A weekday template saved by the driver; the passenger has a saved search over its first week,
+    the commuter one over its first two rides"""
+    today = datetime.now().date()
+    start, end = today + timedelta(days=1), today + timedelta(days=42)
+    driver, passenger, commuter = make_users(3)
+    db.session.commit()
+    # Covers the first week of the template
+    make_saved_search(passenger, 'Panipat', 'Chandigarh', start, start + timedelta(days=6))
+    make_saved_search(commuter, 'Delhi', 'Karnal', *weekdays(start, start + timedelta(days=6))[:2])
+    db.session.commit()
+    saved = {'today': today, 'start': start, 'end': end, 'horizon': today + timedelta(days=RIDE_TEMPLATE_HORIZON_DAYS),
+             'driver_id': driver.id, 'driver': auth_headers(driver), 'passenger': auth_headers(passenger),
+             'emails': {'passenger': passenger.email, 'commuter': commuter.email}}
+    db.session.remove()
+
+    stream = event_bus.subscribe(passenger.id)
+    try:
+        response = client.post('/api/ride-templates', headers=saved['driver'],
+                               json={**TEMPLATE, 'startDate': start.isoformat(), 'endDate': end.isoformat()})
+        alerted = []
+        while (alert := stream.get(timeout=0.1)) is not None:
+            alerted.append(alert.data['rideId'])
+    finally:
+        event_bus.unsubscribe(stream)
+    assert response.status_code == 201, response.get_data(as_text=True)
+    body = response.get_json()
+    return {**saved, 'alerted': alerted, 'template_id': body['template']['id'], 'ride_ids': body['rideIds']}
+
+
+def template_rides(saved):
+    return Ride.query.filter(Ride.id.in_(saved['ride_ids'])).order_by(Ride.date).all()
+
+
+def test_rides_are_created_up_to_the_horizon_on_the_weekdays(saved):
+    rides = template_rides(saved)
+    assert [ride.date for ride in rides] == weekdays(saved['start'], saved['horizon'])
+    for ride in rides:
+        assert ride.departs_at == datetime.combine(ride.date, ride.time) and ride.created_at
+        assert [stop.city for stop in ride.stops] == ['Delhi', 'Panipat', 'Karnal', 'Chandigarh']
+
+
+def test_matching_saved_searches_are_alerted(saved):
+    first_week = [ride.id for ride in template_rides(saved) if ride.date <= saved['start'] + timedelta(days=6)]
+    assert sorted(saved['alerted']) == first_week
+
+
+def test_one_alert_email_per_user_per_run(saved):
+    first_week = [ride for ride in template_rides(saved) if ride.date <= saved['start'] + timedelta(days=6)]
+    emails = {email.to_email: email for email in EmailOutbox.query.filter(EmailOutbox.to_email.in_(saved['emails'].values()))}
+    assert EmailOutbox.query.filter(EmailOutbox.to_email.in_(saved['emails'].values())).count() == len(emails) == 2
+
+    # Every ride of the run in one summary
+    summary = emails[saved['emails']['passenger']]
+    assert summary.subject == f'{len(first_week)} new rides match your saved searches'
+    assert summary.html.count('<li>') == len(first_week)
+    for ride in first_week:
+        assert ride.date.strftime('%d %b %Y') in summary.html
+    assert emails[saved['emails']['commuter']].subject == '2 new rides match your saved searches'
+
+
+def test_materialized_rides_work_like_one_off_rides(client, saved):
+    first = template_rides(saved)[0]
+    first_id, first_date = first.id, first.date.isoformat()
+    search = client.post('/api/rides/search', headers=saved['passenger'],
+                         json={'pickupCity': 'Panipat', 'dropCity': 'Chandigarh', 'date': first_date}).get_json()
+    assert [ride['id'] for ride in search['rides']] == [first_id]
+    request_id = client.post('/api/requests', headers=saved['passenger'], json={'rideId': first_id, 'numPassengers': 2}).get_json()['request']['id']
+    assert client.put(f'/api/requests/{request_id}/approve', headers=saved['driver']).status_code == 200
+    assert client.post(f'/api/rides/{first_id}/messages', headers=saved['passenger'], json={'message': 'See you at ISBT'}).status_code == 201
+    assert client.get(f'/api/rides/{first_id}', headers=saved['driver']).get_json()['ride']['availableSeats'] == 1
+    published = client.get('/api/rides/my-published', headers=saved['driver']).get_json()['rides']
+    assert published and all(ride['templateId'] == saved['template_id'] for ride in published)
+
+
+@pytest.mark.parametrize('change', [
+    {'weekdays': []}, {'weekdays': ['someday']}, {'endDate': -1}, {'endDate': 400}, {'time': '8am'}, {'dropCity': 'Atlantis'}
+])
+def test_invalid_templates_are_refused(client, saved, change):
+    if 'endDate' in change:
+        change = {'endDate': (saved['today'] + timedelta(days=change['endDate'])).isoformat()}
+    response = client.post('/api/ride-templates', headers=saved['driver'],
+                           json={**TEMPLATE, 'startDate': saved['start'].isoformat(), 'endDate': saved['end'].isoformat(), **change})
+    assert response.status_code == 400
+
+
+def test_the_job_extends_rides_with_the_horizon_once(saved):
+    assert materialize_rides() == []
+    materialize_rides(horizon_days=60)
+    assert materialize_rides(horizon_days=60) == []
+    assert Ride.query.filter(Ride.template_id == saved['template_id']).count() == len(weekdays(saved['start'], saved['end']))
+
+
+def test_a_stale_template_claims_nothing(db, saved):
+    stale = RideTemplate(publisher_id=saved['driver_id'], time=datetime.strptime('18:00', '%H:%M').time(),
+                         weekdays=0b1111111, start_date=saved['start'], end_date=saved['end'], seats=2, cost_per_person=100,
+                         car_model='Swift', license_plate='HR 26 0001', pickup_city='Delhi', drop_city='Jaipur',
+                         pickup_address='Dhaula Kuan', drop_address='Sindhi Camp')
+    db.session.add(stale)
+    db.session.commit()
+    db.session.execute(text('UPDATE ride_template SET materialized_until = :day WHERE id = :id'),
+                       {'day': saved['horizon'], 'id': stale.id})
+    # The session still holds materialized_until = None, as a run that loaded it just before would
+    assert materialize_batch([stale], datetime.now(), saved['horizon']) == []
+    assert Ride.query.filter(Ride.template_id == stale.id).count() == 0
+
+
+def test_deleting_a_template_keeps_rides_with_passengers(db, client, saved):
+    first_id = saved['ride_ids'][0]
+    request_id = client.post('/api/requests', headers=saved['passenger'], json={'rideId': first_id}).get_json()['request']['id']
+    client.put(f'/api/requests/{request_id}/approve', headers=saved['driver'])
+    response = client.delete(f"/api/ride-templates/{saved['template_id']}", headers=saved['driver']).get_json()
+    db.session.remove()
+    assert (response['cancelledRides'], response['keptRides']) == (len(saved['ride_ids']) - 1, 1)
+    assert db.session.get(Ride, first_id).template_id is None
+    assert RideStop.query.filter(RideStop.ride_id.in_(saved['ride_ids'][1:])).count() == 0
+
+
+def test_migration_adds_template_id(db, sqlite_only, saved):
+    migrate = next(fn for version, _, fn in MIGRATIONS if version == 7)
+    db.session.remove()
+    with db.engine.begin() as conn:
+        # SQLite cannot drop a foreign key column, so copy the table without it
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'ride'")).scalar()
+        ddl = re.sub(r',\s*\)$', '\n)', '\n'.join(line for line in ddl.splitlines() if 'template_id' not in line))
+        columns = ', '.join(column.name for column in Ride.__table__.columns if column.name != 'template_id')
+        conn.execute(text(ddl.replace('CREATE TABLE ride (', 'CREATE TABLE ride_old (')))
+        conn.execute(text(f'INSERT INTO ride_old ({columns}) SELECT {columns} FROM ride'))
+        conn.execute(text('DROP TABLE ride'))
+        conn.execute(text('ALTER TABLE ride_old RENAME TO ride'))
+        migrate(conn, db.metadata)
+    assert Ride.query.filter(Ride.template_id.is_(None)).count() == len(saved['ride_ids'])
+    assert {'ix_ride_template_date', 'ix_ride_departs_at'} <= {index['name'] for index in inspect(db.engine).get_indexes('ride')}
+
+
+def test_bulk_materialization_batches_its_inserts(db, count_sql, saved):
+    templates = 20
+    for i in range(templates):
+        db.session.add(RideTemplate(publisher_id=saved['driver_id'], time=datetime.strptime('07:00', '%H:%M').time(),
+                                    weekdays=0b0011111, start_date=saved['start'], end_date=saved['end'], seats=3, cost_per_person=250,
+                                    car_model='Swift', license_plate=f'HR 26 {i:04d}', pickup_city='Delhi', drop_city='Chandigarh',
+                                    pickup_address='ISBT', drop_address='Sector 17', on_route_cities='["Panipat", "Karnal"]'))
+    db.session.commit()
+    db.session.remove()
+    with count_sql() as counter:
+        bulk = materialize_rides()
+    inserts = sum(1 for statement in counter.statements if statement.startswith(('INSERT INTO ride ', 'INSERT INTO ride_stop ')))
+    assert len(bulk) == templates * len(weekdays(saved['start'], saved['horizon']))
+    assert inserts < len(bulk) // 10
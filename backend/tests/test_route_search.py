@@ -0,0 +1,88 @@
+"""
+Route matching through the ride_stop index.
+
+A search finds a ride when the pickup comes before the drop on its route - its
+own pickup and drop cities or any cities in between - and never in the reverse
+direction; create_ride writes the stops, cancel_ride removes them, and
+migration 1 backfills them from on_route_cities.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import Ride, RideStop
+from migrations import MIGRATIONS
+from seed_data import auth_headers, make_users
+
+ROUTE = ['Delhi', 'Panipat', 'Karnal', 'Ambala', 'Chandigarh']
+
+
+@pytest.fixture
+def seeded(db, client):
+    """Delhi -> Panipat -> Karnal -> Ambala -> Chandigarh, published through the API"""
+    driver, traveller = make_users(2)
+    db.session.commit()
+    seeded = {'driver': auth_headers(driver), 'traveller': auth_headers(traveller)}
+    db.session.remove()
+    response = client.post('/api/rides', headers=seeded['driver'], json={
+        'pickupCity': ROUTE[0], 'dropCity': ROUTE[-1], 'onRouteCities': ROUTE[1:-1],
+        'pickupAddress': 'ISBT', 'dropAddress': 'Sector 17', 'date': (datetime.now() + timedelta(days=2)).strftime('%Y-%m-%d'),
+        'time': '09:00', 'availableSeats': 3, 'costPerPerson': 300, 'carModel': 'i20', 'licensePlate': 'DL 2C 0001'
+    })
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return {**seeded, 'ride_id': response.get_json()['ride']['id']}
+
+
+def found(client, seeded, pickup_city, drop_city):
+    response = client.post('/api/rides/search', headers=seeded['traveller'], json={'pickupCity': pickup_city, 'dropCity': drop_city})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [ride['id'] for ride in response.get_json()['rides']]
+
+
+def test_create_ride_writes_ordered_stops(db, seeded):
+    stops = RideStop.query.filter_by(ride_id=seeded['ride_id']).order_by(RideStop.ordinal).all()
+    assert [(stop.city, stop.ordinal) for stop in stops] == [(city, ordinal) for ordinal, city in enumerate(ROUTE)]
+
+
+@pytest.mark.parametrize('pickup_city, drop_city', [
+    ('Delhi', 'Chandigarh'),  # end to end
+    ('Delhi', 'Karnal'),  # from the pickup city to a stop
+    ('Panipat', 'Chandigarh'),  # from a stop to the drop city
+    ('Panipat', 'Ambala'),  # between two intermediate stops
+    ('Karnal', 'Ambala'),  # adjacent intermediate stops
+])
+def test_forward_direction_matches(client, seeded, pickup_city, drop_city):
+    assert found(client, seeded, pickup_city, drop_city) == [seeded['ride_id']]
+
+
+@pytest.mark.parametrize('pickup_city, drop_city', [
+    ('Chandigarh', 'Delhi'),  # the whole route reversed
+    ('Ambala', 'Panipat'),  # intermediate stops reversed
+    ('Karnal', 'Delhi'),  # back to the pickup city
+    ('Delhi', 'Jaipur'),  # drop not on the route
+    ('Shimla', 'Chandigarh'),  # pickup not on the route
+])
+def test_reverse_direction_and_other_cities_do_not_match(client, seeded, pickup_city, drop_city):
+    assert found(client, seeded, pickup_city, drop_city) == []
+
+
+def test_cancel_ride_removes_its_stops(db, client, seeded):
+    assert client.delete(f"/api/rides/{seeded['ride_id']}", headers=seeded['driver']).status_code == 200
+    db.session.remove()
+    assert RideStop.query.filter_by(ride_id=seeded['ride_id']).count() == 0
+    assert found(client, seeded, 'Panipat', 'Ambala') == []
+
+
+def test_migration_backfills_stops_from_on_route_cities(db, client, seeded):
+    migrations = dict((version, fn) for version, _, fn in MIGRATIONS)
+    with db.engine.begin() as conn:
+        conn.execute(text('DELETE FROM ride_stop'))
+        migrations[1](conn, db.metadata)
+        migrations[1](conn, db.metadata)  # rides that have stops are skipped
+        migrations[4](conn, db.metadata)
+    db.session.remove()
+    assert RideStop.query.count() == len(ROUTE)
+    assert db.session.get(Ride, seeded['ride_id']).stops
+    assert found(client, seeded, 'Panipat', 'Ambala') == [seeded['ride_id']]
+    assert found(client, seeded, 'Ambala', 'Panipat') == []
@@ -0,0 +1,118 @@
+"""
+Saved searches and the ride alerts sent when a matching ride is published.
+
+Publishing Delhi -> Panipat -> Karnal -> Chandigarh alerts (SSE ride_alert and
+one queued email per user) exactly the users whose saved search covers a
+corridor of that route, date and seats; the endpoints validate input, enforce
+the per-user limit and only let owners delete; matching is one query however
+many searches are saved.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import event_bus, EmailOutbox, SAVED_SEARCH_MAX_PER_USER
+from cities import CITIES
+from seed_data import auth_headers, make_users, make_saved_search
+
+RIDE = {
+    'pickupCity': 'Delhi', 'dropCity': 'Chandigarh', 'onRouteCities': ['Panipat', 'Karnal'],
+    'pickupAddress': 'ISBT', 'dropAddress': 'Sector 17', 'time': '09:00', 'availableSeats': 3,
+    'costPerPerson': 300, 'carModel': 'i20', 'licensePlate': 'DL 2C 0001'
+}
+DAY = datetime.now().date() + timedelta(days=3)
+
+
+@pytest.fixture
+def seeded(db):
+    day = DAY
+    users = make_users(9)
+    publisher = users[0]
+    # Match: a middle corridor, the whole route, and two matching searches of one user (one alert)
+    make_saved_search(users[1], 'Panipat', 'Karnal', day, day)
+    make_saved_search(users[2], 'Delhi', 'Chandigarh', day - timedelta(days=2), day + timedelta(days=2), passengers=3)
+    make_saved_search(users[3], 'Karnal', 'Chandigarh', day, day)
+    make_saved_search(users[3], 'Delhi', 'Karnal', day, day)
+    # No match: reverse direction, another corridor, another day, too many passengers, women only, own search
+    make_saved_search(users[4], 'Chandigarh', 'Delhi', day, day)
+    make_saved_search(users[5], 'Delhi', 'Jaipur', day, day)
+    make_saved_search(users[6], 'Delhi', 'Chandigarh', day + timedelta(days=1), day + timedelta(days=5))
+    make_saved_search(users[7], 'Delhi', 'Chandigarh', day, day, passengers=4)
+    make_saved_search(users[8], 'Delhi', 'Chandigarh', day, day, women_only=True)
+    make_saved_search(publisher, 'Delhi', 'Chandigarh', day, day)
+    db.session.commit()
+    seeded = {'day': day, 'user_ids': [user.id for user in users], 'emails': {user.id: user.email for user in users},
+              'headers': [auth_headers(user) for user in users]}
+    seeded['expected'] = set(seeded['user_ids'][1:4])
+    db.session.remove()
+    return seeded
+
+
+def publish(client, seeded):
+    return client.post('/api/rides', headers=seeded['headers'][0], json={**RIDE, 'date': seeded['day'].isoformat()})
+
+
+def test_matching_users_get_one_alert_each(client, seeded):
+    streams = {user_id: event_bus.subscribe(user_id) for user_id in seeded['user_ids']}
+    try:
+        response = publish(client, seeded)
+        alerts = {}
+        for user_id, stream in streams.items():
+            alert = stream.get(timeout=0.1)
+            if alert is not None:
+                alerts[user_id] = alert.data
+    finally:
+        for stream in streams.values():
+            event_bus.unsubscribe(stream)
+    assert response.status_code == 201
+    assert set(alerts) == seeded['expected']
+    assert all(alert['rideId'] == response.get_json()['ride']['id'] for alert in alerts.values())
+    assert len(alerts[seeded['user_ids'][3]]['savedSearchIds']) == 2
+
+
+def test_matching_users_get_one_email_each(client, seeded):
+    publish(client, seeded)
+    queued = sorted(email.to_email for email in EmailOutbox.query.filter(EmailOutbox.subject.like('New ride:%')))
+    assert queued == sorted(seeded['emails'][user_id] for user_id in seeded['expected'])
+
+
+def save(client, seeded, user=5, **body):
+    day = seeded['day'].isoformat()
+    return client.post('/api/saved-searches', headers=seeded['headers'][user], json={
+        'pickupCity': 'Delhi', 'dropCity': 'Jaipur', 'dateFrom': day, 'dateTo': day, **body})
+
+
+@pytest.mark.parametrize('body', [
+    {'pickupCity': 'Atlantis'}, {'dropCity': 'Delhi'}, {'dateTo': 'soon'}, {'dateFrom': (DAY - timedelta(days=30)).isoformat()},
+    {'dateTo': (DAY + timedelta(days=60)).isoformat()}, {'passengers': 0}
+])
+def test_invalid_saved_searches_are_refused(client, seeded, body):
+    assert save(client, seeded, **body).status_code == 400
+
+
+def test_saved_searches_are_limited_per_user(client, seeded):
+    # User 5 already has one
+    created = [save(client, seeded) for _ in range(SAVED_SEARCH_MAX_PER_USER)]
+    assert [response.status_code for response in created] == [201] * (SAVED_SEARCH_MAX_PER_USER - 1) + [400]
+    listed = client.get('/api/saved-searches', headers=seeded['headers'][5]).get_json()['savedSearches']
+    assert len(listed) == SAVED_SEARCH_MAX_PER_USER
+
+
+def test_only_owners_delete_saved_searches(client, seeded):
+    saved_id = client.get('/api/saved-searches', headers=seeded['headers'][5]).get_json()['savedSearches'][0]['id']
+    assert client.delete(f'/api/saved-searches/{saved_id}', headers=seeded['headers'][4]).status_code == 403
+    assert client.delete(f'/api/saved-searches/{saved_id}', headers=seeded['headers'][5]).status_code == 200
+
+
+def test_matching_is_one_query(db, client, count_sql, seeded):
+    rng = random.Random(42)
+    others = make_users(100, prefix='saver')
+    for _ in range(2000):
+        pickup_city, drop_city = rng.sample(CITIES, 2)
+        make_saved_search(rng.choice(others), pickup_city, drop_city, seeded['day'], seeded['day'] + timedelta(days=rng.randrange(30)))
+    db.session.commit()
+    db.session.remove()
+    with count_sql() as counter:
+        assert publish(client, seeded).status_code == 201
+    assert len([statement for statement in counter.statements if 'saved_search' in statement]) == 1
@@ -0,0 +1,89 @@
+"""
+The search result cache.
+
+A repeated search is served without touching the database and one cached page
+is shared by users (each still never sees their own rides); every write that
+changes search results invalidates the cached pages for that route; the local
+LRU stays under its memory cap and keeps recently used pages.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import Ride, User
+from search_cache import LocalBackend
+from seed_data import auth_headers, make_users, make_ride, make_request
+
+SEARCH = {'pickupCity': 'Panipat', 'dropCity': 'Chandigarh'}
+
+
+@pytest.fixture
+def seeded(db, search_cache):
+    publisher, passenger, other = make_users(3)
+    departs_at = datetime.now() + timedelta(days=3)
+    ride = make_ride(publisher, 'Delhi', ['Panipat', 'Karnal'], 'Chandigarh', departs_at, seats=4)
+    db.session.flush()
+    pending = make_request(ride, passenger)
+    db.session.commit()
+    seeded = {'ride_id': ride.id, 'request_id': pending.id, 'other_id': other.id, 'date': departs_at.strftime('%Y-%m-%d'),
+              'publisher': auth_headers(publisher), 'other': auth_headers(other)}
+    db.session.remove()
+    return seeded
+
+
+@pytest.fixture
+def search(client, count_sql):
+    def search(headers, body=SEARCH):
+        """(ride id -> availableSeats, statements issued)"""
+        with count_sql() as counter:
+            response = client.post('/api/rides/search', json=body, headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return {ride['id']: ride['availableSeats'] for ride in response.get_json()['rides']}, counter.count
+    return search
+
+
+def test_one_cached_page_is_shared_by_users(seeded, search):
+    own, first = search(seeded['publisher'])
+    theirs, second = search(seeded['other'])
+    assert first > 0 and second == 0
+    assert seeded['ride_id'] not in own
+    assert theirs == {seeded['ride_id']: 4}
+
+
+def test_writes_invalidate_the_route(db, client, seeded, search):
+    ride_id, request_id, publisher, other = seeded['ride_id'], seeded['request_id'], seeded['publisher'], seeded['other']
+
+    def after(write, expected):
+        search(other)  # make sure the page is cached
+        response = write()
+        assert response.status_code in (200, 201), response.get_data(as_text=True)
+        rides, statements = search(other)
+        assert statements > 0 and expected(rides), rides
+        return response
+
+    response = after(lambda: client.post('/api/rides', headers=publisher, json={
+        'pickupCity': 'Delhi', 'dropCity': 'Chandigarh', 'onRouteCities': ['Panipat'],
+        'pickupAddress': 'ISBT', 'dropAddress': 'Sector 17', 'date': seeded['date'],
+        'time': '18:00', 'availableSeats': 2, 'costPerPerson': 300, 'carModel': 'i20', 'licensePlate': 'DL 2C 0001'
+    }), lambda rides: len(rides) == 2)
+    new_ride_id = response.get_json()['ride']['id']
+    after(lambda: client.put(f'/api/requests/{request_id}/approve', headers=publisher), lambda rides: rides[ride_id] == 3)
+    after(lambda: client.put(f'/api/requests/{request_id}/remove', headers=publisher), lambda rides: rides[ride_id] == 4)
+
+    request_obj = make_request(db.session.get(Ride, ride_id), db.session.get(User, seeded['other_id']), status='pending')
+    db.session.commit()
+    second_request_id = request_obj.id
+    db.session.remove()
+    client.put(f'/api/requests/{second_request_id}/approve', headers=publisher)
+    after(lambda: client.delete(f'/api/requests/{second_request_id}', headers=other), lambda rides: rides[ride_id] == 4)
+    after(lambda: client.delete(f'/api/rides/{new_ride_id}', headers=publisher), lambda rides: new_ride_id not in rides)
+
+
+def test_local_backend_keeps_hot_pages_under_its_cap():
+    backend = LocalBackend(max_bytes=10_000)
+    for i in range(100):
+        backend.set(('A', 'B'), f'key{i}', b'x' * 900, 60)
+        backend.get(('A', 'B'), 'key0')  # keep the first page hot
+    assert backend.stats()['bytes'] <= 10_000
+    assert backend.get(('A', 'B'), 'key0') and backend.get(('A', 'B'), 'key99')
+    assert not backend.get(('A', 'B'), 'key50')
@@ -0,0 +1,83 @@
+"""
+Keyset pagination of ride search.
+
+Pages follow (date, time, id) order, so rides sharing a departure continue
+across page boundaries by id: every ride is listed exactly once, in order,
+whatever the page size, even when rides are published between pages.
+"""
+import base64
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import User
+from seed_data import auth_headers, make_users, make_ride
+
+SEARCH = {'pickupCity': 'Panipat', 'dropCity': 'Chandigarh'}
+
+
+@pytest.fixture
+def seeded(db):
+    """Seven rides at each of three departures over two days, published in shuffled order"""
+    driver, traveller = make_users(2)
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=2)
+    departures = [departs_at for departs_at in (day + timedelta(hours=9), day + timedelta(hours=18), day + timedelta(days=1, hours=9))
+                  for _ in range(7)]
+    random.Random(4).shuffle(departures)
+    rides = [make_ride(driver, 'Delhi', ['Panipat'], 'Chandigarh', departs_at) for departs_at in departures]
+    db.session.commit()
+    seeded = {'driver_id': driver.id, 'day': day, 'order': [ride.id for ride in sorted(rides, key=lambda ride: (ride.departs_at, ride.id))],
+              'headers': auth_headers(traveller)}
+    db.session.remove()
+    return seeded
+
+
+def pages(client, headers, limit, **body):
+    """Every page of a search"""
+    pages = [client.post('/api/rides/search', headers=headers, json={**SEARCH, 'limit': limit, **body}).get_json()]
+    while pages[-1]['nextCursor']:
+        pages.append(client.post('/api/rides/search', headers=headers,
+                                 json={**SEARCH, 'limit': limit, **body, 'cursor': pages[-1]['nextCursor']}).get_json())
+    return pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 7, 20, 21, 50])
+def test_ties_continue_across_pages_by_id(client, seeded, limit):
+    result = pages(client, seeded['headers'], limit)
+    assert [ride['id'] for page in result for ride in page['rides']] == seeded['order']
+    assert all(page['hasMore'] for page in result[:-1]) and not result[-1]['hasMore']
+    assert all(len(page['rides']) == limit for page in result[:-1])
+
+
+def test_a_page_boundary_inside_a_tie(client, seeded):
+    first = client.post('/api/rides/search', headers=seeded['headers'], json={**SEARCH, 'limit': 3}).get_json()
+    date_str, time_str, ride_id = json.loads(base64.urlsafe_b64decode(first['nextCursor'] + '=' * (-len(first['nextCursor']) % 4)))
+    # The cursor carries the last ride's departure and id, which break the tie
+    assert ride_id == first['rides'][-1]['id'] == seeded['order'][2]
+    assert (date_str, time_str[:5]) == (first['rides'][-1]['date'], first['rides'][-1]['time'])
+
+
+def test_rides_published_between_pages(db, client, seeded):
+    first = client.post('/api/rides/search', headers=seeded['headers'], json={**SEARCH, 'limit': 5}).get_json()
+    # One more ride at the departure the first page ended in, and one before the cursor
+    driver = db.session.get(User, seeded['driver_id'])
+    tied = make_ride(driver, 'Delhi', ['Panipat'], 'Chandigarh', seeded['day'] + timedelta(hours=9))
+    earlier = make_ride(driver, 'Delhi', ['Panipat'], 'Chandigarh', seeded['day'] + timedelta(hours=8))
+    db.session.commit()
+    tied_id, earlier_id = tied.id, earlier.id
+    db.session.remove()
+
+    rest = pages(client, seeded['headers'], 5, cursor=first['nextCursor'])
+    listed = [ride['id'] for ride in first['rides']] + [ride['id'] for page in rest for ride in page['rides']]
+    assert len(listed) == len(set(listed))
+    # Same departure but a higher id: after the cursor; the earlier ride is behind it
+    assert tied_id in listed and earlier_id not in listed
+    assert listed == seeded['order'][:7] + [tied_id] + seeded['order'][7:]
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'W10', 'WyJiZXN0IiwgM10'])
+def test_invalid_cursors_are_refused(client, seeded, cursor):
+    response = client.post('/api/rides/search', headers=seeded['headers'], json={**SEARCH, 'cursor': cursor})
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+"""
+Date-range and departure-window search.
+
+A dateRange search returns exactly the rides the single-date searches for each
+day in the range return, in departure order, with per-date counts over the
+whole range whatever the page; timeFrom and
+timeTo keep only rides departing in the window, including windows that wrap
+past midnight; both work with sort=best too.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from seed_data import auth_headers, make_users, make_ride
+
+DAYS = 2
+RIDES_PER_DAY = 24
+CENTER = datetime.now().date() + timedelta(days=DAYS + 1)
+
+
+@pytest.fixture
+def search(db, client):
+    publisher, passenger = make_users(2)
+    # Rides every hour, over one more day either side than the range covers
+    for day in range(-DAYS - 1, DAYS + 2):
+        start = datetime.combine(CENTER + timedelta(days=day), datetime.min.time())
+        for i in range(RIDES_PER_DAY):
+            make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', start + timedelta(minutes=i * 24 * 60 // RIDES_PER_DAY))
+    db.session.commit()
+    headers = {'passenger': auth_headers(passenger), 'publisher': auth_headers(publisher)}
+    db.session.remove()
+
+    def search(status=200, user='passenger', **body):
+        response = client.post('/api/rides/search', headers=headers[user],
+                               json={'pickupCity': 'Panipat', 'dropCity': 'Chandigarh', 'limit': 50, **body})
+        assert response.status_code == status, response.get_json()
+        return response.get_json()
+    return search
+
+
+def search_all(search, **body):
+    """Every page of a search, and the first page"""
+    pages = [search(**body)]
+    while pages[-1]['nextCursor']:
+        pages.append(search(**body, cursor=pages[-1]['nextCursor']))
+    return [ride for page in pages for ride in page['rides']], pages[0]
+
+
+def test_date_range_matches_single_date_searches(search):
+    days = [(CENTER + timedelta(days=offset)).isoformat() for offset in range(-DAYS, DAYS + 1)]
+    per_day = [ride['id'] for day in days for ride in search_all(search, date=day)[0]]
+    ranged, first_page = search_all(search, date=CENTER.isoformat(), dateRange=DAYS)
+    assert [ride['id'] for ride in ranged] == per_day
+    assert len(per_day) == len(days) * RIDES_PER_DAY
+    # Counts cover the whole range, not only the first page
+    assert len(first_page['rides']) < len(per_day)
+    assert first_page['dates'] == [{'date': day, 'count': RIDES_PER_DAY} for day in days]
+    # ...and stay the same on later pages
+    second_page = search(date=CENTER.isoformat(), dateRange=DAYS, cursor=first_page['nextCursor'])
+    assert second_page['dates'] == first_page['dates']
+
+
+def test_date_counts_leave_out_own_rides(search):
+    assert search(date=CENTER.isoformat(), dateRange=DAYS)['dates']
+    assert search(date=CENTER.isoformat(), dateRange=DAYS, user='publisher')['dates'] == []
+
+
+def test_time_window(search):
+    window, _ = search_all(search, date=CENTER.isoformat(), dateRange=DAYS, timeFrom='08:00', timeTo='10:00')
+    assert sorted({ride['time'] for ride in window}) == ['08:00', '09:00', '10:00']
+    assert len(window) == (2 * DAYS + 1) * 3
+
+
+def test_time_window_past_midnight(search):
+    overnight, _ = search_all(search, date=CENTER.isoformat(), timeFrom='22:00', timeTo='02:00')
+    assert sorted({ride['time'] for ride in overnight}) == ['00:00', '01:00', '02:00', '22:00', '23:00']
+
+
+def test_best_sort_over_a_range(search):
+    window, _ = search_all(search, date=CENTER.isoformat(), dateRange=DAYS, timeFrom='08:00', timeTo='10:00')
+    best = search(date=CENTER.isoformat(), dateRange=DAYS, timeFrom='08:00', timeTo='10:00', sort='best', time='09:00')
+    assert {ride['id'] for ride in best['rides']} <= {ride['id'] for ride in window}
+    assert best['rides'][0]['time'] == '09:00'
+
+
+def test_invalid_time_is_refused(search):
+    search(status=400, timeFrom='25:00')
@@ -0,0 +1,69 @@
+"""
+Seat reservation under concurrent approvals and removals.
+
+Approving more one-passenger requests than there are seats from many threads at
+once approves exactly as many as there are seats and never takes
+available_seats below 0; removing every approved passenger twice in parallel
+releases each seat exactly once, and so does a passenger cancelling while the
+driver removes them. benchmark_seat_reservation.py times the same.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import Ride, Request
+from seed_data import auth_headers, make_users, make_ride, make_request
+
+SEATS = 10
+REQUESTS = 300
+THREADS = 32
+
+
+def test_racing_approvals_and_removals_keep_seats_exact(db, app):
+    publisher, *requestors = make_users(REQUESTS + 1)
+    ride = make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', datetime.now() + timedelta(days=1), seats=SEATS)
+    db.session.flush()
+    requests = [make_request(ride, requestor) for requestor in requestors]
+    db.session.commit()
+    request_ids = [request_obj.id for request_obj in requests]
+    requestor_headers = {request_obj.id: auth_headers(requestor) for request_obj, requestor in zip(requests, requestors)}
+    ride_id = ride.id
+    headers = auth_headers(publisher)
+    db.session.remove()
+
+    def call(method, path, call_headers=headers):
+        return app.test_client().open(path, method=method, headers=call_headers).status_code
+
+    def run(paths):
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            return Counter(pool.map(lambda path: call('PUT', path), paths))
+
+    def seats_and_approved():
+        db.session.remove()
+        return db.session.get(Ride, ride_id).available_seats, Request.query.filter_by(ride_id=ride_id, status='approved').count()
+
+    # Everyone races for the seats
+    statuses = run([f'/api/requests/{request_id}/approve' for request_id in request_ids])
+    assert set(statuses) <= {200, 400} and statuses[200] == SEATS
+    assert seats_and_approved() == (0, SEATS)
+
+    # Every approved passenger removed twice at once - seats are released once each
+    approved_ids = [request_id for (request_id,) in db.session.query(Request.id).filter_by(ride_id=ride_id, status='approved')]
+    db.session.remove()
+    statuses = run([f'/api/requests/{request_id}/remove' for request_id in approved_ids * 2])
+    assert set(statuses) <= {200, 400} and statuses[200] == SEATS
+    assert seats_and_approved() == (SEATS, 0)
+
+    # The requests that lost the first race are still pending: fill the ride from them again,
+    # then each approved passenger cancels while the driver removes them
+    statuses = run([f'/api/requests/{request_id}/approve' for request_id in request_ids if request_id not in approved_ids])
+    assert statuses[200] == SEATS
+    approved_ids = [request_id for (request_id,) in db.session.query(Request.id).filter_by(ride_id=ride_id, status='approved')]
+    db.session.remove()
+    calls = [('DELETE', f'/api/requests/{request_id}', requestor_headers[request_id]) for request_id in approved_ids]
+    calls += [('PUT', f'/api/requests/{request_id}/remove', headers) for request_id in approved_ids]
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        statuses = Counter(pool.map(lambda args: call(*args), calls))
+    # Exactly one of the two succeeds per passenger; the loser sees the new state (400/409)
+    assert set(statuses) <= {200, 400, 409} and statuses[200] == SEATS
+    assert seats_and_approved() == (SEATS, 0)
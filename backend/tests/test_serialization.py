@@ -0,0 +1,43 @@
+"""
+?fields on the ride listings (serializers.py).
+
+A listing asked for some fields returns exactly those for every ride, and an
+unknown field is refused. benchmark_serialization.py checks the full dicts
+against the old hand-built ones and times both.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from seed_data import auth_headers, make_users, make_ride, make_request
+
+
+@pytest.fixture
+def seeded(db):
+    publisher, passenger = make_users(2)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    rides = [make_ride(publisher, 'Delhi', ['Panipat'], 'Chandigarh', start + timedelta(hours=i)) for i in range(3)]
+    db.session.flush()
+    for ride in rides:
+        make_request(ride, passenger)
+    db.session.commit()
+    seeded = {'publisher': auth_headers(publisher), 'passenger': auth_headers(passenger)}
+    db.session.remove()
+    return seeded
+
+
+@pytest.mark.parametrize('path, user', [('/api/rides/my-published', 'publisher'), ('/api/requests/my-requests', 'passenger')])
+def test_fields_limits_each_ride_to_those_fields(client, seeded, path, user):
+    everything = client.get(path, headers=seeded[user]).get_json()
+    lean = client.get(f'{path}?fields=id,date,time', headers=seeded[user]).get_json()
+    key = 'rides' if 'rides' in everything else 'requests'
+    full_rides = [item.get('ride', item) for item in everything[key]]
+    lean_rides = [item.get('ride', item) for item in lean[key]]
+    assert len(lean_rides) == len(full_rides) == 3
+    assert lean_rides == [{name: ride[name] for name in ('id', 'date', 'time')} for ride in full_rides]
+
+
+def test_unknown_fields_are_refused(client, seeded):
+    response = client.get('/api/rides/my-published?fields=id,nope', headers=seeded['publisher'])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unknown fields: nope'
@@ -0,0 +1,71 @@
+import { useState, useEffect, useRef } from 'react'
+import api from '../services/api'
+
+// Wait for a pause in typing before asking the server, and ask for a short list
+const SUGGEST_DELAY_MS = 200
+const SUGGEST_LIMIT = 10
+
+// City picker backed by /cities/suggest instead of a dropdown of the whole catalog
+function CityInput({ id, name, value, onChange, placeholder, required, exclude = [], style }) {
+  const [suggestions, setSuggestions] = useState([])
+  const inputRef = useRef(null)
+
+  useEffect(() => {
+    const query = value.trim()
+    if (!query) {
+      setSuggestions([])
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(() => {
+      api.get('/cities/suggest', { params: { q: query, limit: SUGGEST_LIMIT } })
+        .then(response => { if (!cancelled) setSuggestions(response.data.cities) })
+        .catch(error => console.error('Failed to load city suggestions:', error))
+    }, SUGGEST_DELAY_MS)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [value])
+
+  // Only a city from the catalog can be submitted (an exact name is always the first suggestion)
+  useEffect(() => {
+    if (!inputRef.current) return
+    const known = !value || suggestions.includes(value)
+    inputRef.current.setCustomValidity(known ? '' : 'Please choose a city from the list')
+  }, [value, suggestions])
+
+  // "delhi" becomes "Delhi" once the suggestions confirm it
+  const handleBlur = () => {
+    const match = suggestions.find(city => city.toLowerCase() === value.trim().toLowerCase())
+    if (match && match !== value) {
+      onChange({ target: { name, value: match, type: 'text' } })
+    }
+  }
+
+  return (
+    <>
+      <input
+        ref={inputRef}
+        type="text"
+        id={id}
+        name={name}
+        value={value}
+        onChange={onChange}
+        onBlur={handleBlur}
+        list={`${id}-suggestions`}
+        autoComplete="off"
+        placeholder={placeholder}
+        required={required}
+        style={style}
+      />
+      <datalist id={`${id}-suggestions`}>
+        {suggestions.filter(city => !exclude.includes(city)).map(city => (
+          <option key={city} value={city} />
+        ))}
+      </datalist>
+    </>
+  )
+}
+
+export default CityInput
@@ -1,33 +1,39 @@
-import { useState, useEffect } from 'react'
+import { Fragment, useState } from 'react'
 import Navbar from '../components/Navbar'
+import CityInput from '../components/CityInput'
 import api from '../services/api'
 import '../styles/Dashboard.css'
 
+// "Search nearby dates" covers the chosen date ± this many days
+const NEARBY_DAYS = 3
+// "Include nearby cities" also matches rides from/to cities this close to pickup and drop
+const NEARBY_RADIUS_KM = 25
+
 function Dashboard() {
-  const [cities, setCities] = useState([])
   const [searchData, setSearchData] = useState({
     pickupCity: '',
     pickupAddress: '',
     dropCity: '',
     dropAddress: '',
     date: '',
+    time: '',
+    timeFrom: '',
+    timeTo: '',
     passengers: 1,
-    womenOnly: false
+    womenOnly: false,
+    nearbyCities: false,
+    sort: 'best'
   })
   const [results, setResults] = useState([])
+  const [lastSearch, setLastSearch] = useState(null) // Search body of the results shown, for loading more pages
+  const [nextCursor, setNextCursor] = useState(null)
+  const [itineraries, setItineraries] = useState(null) // Connecting rides, when no direct ride was found
   const [loading, setLoading] = useState(false)
   const [showResults, setShowResults] = useState(false)
   const [showRequestModal, setShowRequestModal] = useState(false)
   const [selectedRide, setSelectedRide] = useState(null)
   const [priceRequests, setPriceRequests] = useState({}) // Store price requests for each ride
 
-  useEffect(() => {
-    // Load cities list
-    api.get('/cities')
-      .then(response => setCities(response.data.cities))
-      .catch(error => console.error('Failed to load cities:', error))
-  }, [])
-
   const handleChange = (e) => {
     const { name, value, type, checked } = e.target
     setSearchData({
@@ -61,16 +67,25 @@ function Dashboard() {
     
     setLoading(true)
     try {
-      const response = await api.post('/rides/search', {
+      const search = {
         pickupCity: searchData.pickupCity,
         pickupAddress: searchData.pickupAddress.trim(),
         dropCity: searchData.dropCity,
         dropAddress: searchData.dropAddress.trim(),
         date: searchData.date,
+        time: searchData.time,
+        timeFrom: searchData.timeFrom,
+        timeTo: searchData.timeTo,
         passengers: searchData.passengers,
-        womenOnly: searchData.womenOnly
-      })
+        womenOnly: searchData.womenOnly,
+        radiusKm: searchData.nearbyCities ? NEARBY_RADIUS_KM : 0,
+        sort: searchData.sort
+      }
+      const response = await api.post('/rides/search', search)
       setResults(response.data.rides)
+      setLastSearch(search)
+      setNextCursor(response.data.nextCursor)
+      setItineraries(null)
       setShowResults(true)
       
       // Update search date display if provided by backend
@@ -130,34 +145,34 @@ function Dashboard() {
     }
   }
 
-  const handleNextDaySearch = async () => {
+  const handleNearbyDatesSearch = async () => {
     if (!searchData.date) return
     
-    // Calculate next day
-    const currentDate = new Date(searchData.date)
-    currentDate.setDate(currentDate.getDate() + 1)
-    const nextDate = currentDate.toISOString().split('T')[0]
-    
-    // Update search data with next date
-    const updatedSearchData = {
-      ...searchData,
-      date: nextDate
-    }
-    
-    setSearchData(updatedSearchData)
     setLoading(true)
     
     try {
-      const response = await api.post('/rides/search', {
-        pickupCity: updatedSearchData.pickupCity,
-        pickupAddress: updatedSearchData.pickupAddress.trim(),
-        dropCity: updatedSearchData.dropCity,
-        dropAddress: updatedSearchData.dropAddress.trim(),
-        date: nextDate,
-        passengers: updatedSearchData.passengers,
-        womenOnly: updatedSearchData.womenOnly
-      })
+      // One request for the whole week around the chosen date, earliest first so results group by day
+      const search = {
+        pickupCity: searchData.pickupCity,
+        pickupAddress: searchData.pickupAddress.trim(),
+        dropCity: searchData.dropCity,
+        dropAddress: searchData.dropAddress.trim(),
+        date: searchData.date,
+        dateRange: NEARBY_DAYS,
+        time: searchData.time,
+        timeFrom: searchData.timeFrom,
+        timeTo: searchData.timeTo,
+        passengers: searchData.passengers,
+        womenOnly: searchData.womenOnly,
+        radiusKm: searchData.nearbyCities ? NEARBY_RADIUS_KM : 0,
+        sort: 'departure',
+        limit: 50
+      }
+      const response = await api.post('/rides/search', search)
       setResults(response.data.rides)
+      setLastSearch(search)
+      setNextCursor(response.data.nextCursor)
+      setItineraries(null)
       setShowResults(true)
     } catch (error) {
       alert(error.response?.data?.error || 'Search failed')
@@ -166,6 +181,57 @@ function Dashboard() {
     }
   }
 
+  const loadMoreResults = async () => {
+    if (!lastSearch || !nextCursor) return
+    
+    setLoading(true)
+    try {
+      // Next page of the same search, continuing after the last ride shown
+      const response = await api.post('/rides/search', { ...lastSearch, cursor: nextCursor })
+      setResults(prev => [...prev, ...response.data.rides])
+      setNextCursor(response.data.nextCursor)
+    } catch (error) {
+      alert(error.response?.data?.error || 'Failed to load more rides')
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  const findConnectingRides = async () => {
+    if (!lastSearch) return
+    
+    setLoading(true)
+    try {
+      const response = await api.post('/rides/plan', lastSearch)
+      setItineraries(response.data.itineraries)
+    } catch (error) {
+      alert(error.response?.data?.error || 'Failed to find connecting rides')
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  const saveSearchAlert = async () => {
+    if (!lastSearch) return
+    
+    try {
+      // Alert me when a ride on this corridor is published for the searched date (or any day from today)
+      const response = await api.post('/saved-searches', {
+        pickupCity: lastSearch.pickupCity,
+        dropCity: lastSearch.dropCity,
+        dateFrom: lastSearch.date || undefined,
+        dateTo: lastSearch.date || undefined,
+        passengers: lastSearch.passengers,
+        womenOnly: lastSearch.womenOnly
+      })
+      alert(response.data.message)
+    } catch (error) {
+      alert(error.response?.data?.error || 'Failed to save search')
+    }
+  }
+
+  const formatDateTime = (value) => new Date(value).toLocaleString('en-IN', { dateStyle: 'medium', timeStyle: 'short' })
+
   const handleInvertCities = () => {
     setSearchData({
       ...searchData,
@@ -184,18 +250,14 @@ function Dashboard() {
             <div className="form-row">
               <div className="form-group">
                 <label htmlFor="pickupCity">Pickup City</label>
-                <select
+                <CityInput
                   id="pickupCity"
                   name="pickupCity"
                   value={searchData.pickupCity}
                   onChange={handleChange}
+                  placeholder="Start typing a city"
                   required
-                >
-                  <option value="">Select Pickup City</option>
-                  {cities.map((city, index) => (
-                    <option key={`${city}-${index}`} value={city}>{city}</option>
-                  ))}
-                </select>
+                />
               </div>
               <div style={{display: 'flex', alignItems: 'flex-end', paddingBottom: '5px'}}>
                 <button
@@ -231,18 +293,14 @@ function Dashboard() {
               </div>
               <div className="form-group">
                 <label htmlFor="dropCity">Drop City</label>
-                <select
+                <CityInput
                   id="dropCity"
                   name="dropCity"
                   value={searchData.dropCity}
                   onChange={handleChange}
+                  placeholder="Start typing a city"
                   required
-                >
-                  <option value="">Select Drop City</option>
-                  {cities.map((city, index) => (
-                    <option key={`${city}-${index}`} value={city}>{city}</option>
-                  ))}
-                </select>
+                />
               </div>
             </div>
             <div className="form-row">
@@ -300,6 +358,52 @@ function Dashboard() {
                 />
               </div>
             </div>
+            <div className="form-row">
+              <div className="form-group">
+                <label htmlFor="time">Preferred Time (Optional)</label>
+                <input
+                  type="time"
+                  id="time"
+                  name="time"
+                  value={searchData.time}
+                  onChange={handleChange}
+                />
+              </div>
+              <div className="form-group">
+                <label htmlFor="timeFrom">Leave After (Optional)</label>
+                <input
+                  type="time"
+                  id="timeFrom"
+                  name="timeFrom"
+                  value={searchData.timeFrom}
+                  onChange={handleChange}
+                />
+              </div>
+              <div className="form-group">
+                <label htmlFor="timeTo">Leave Before (Optional)</label>
+                <input
+                  type="time"
+                  id="timeTo"
+                  name="timeTo"
+                  value={searchData.timeTo}
+                  onChange={handleChange}
+                />
+              </div>
+            </div>
+            <div className="form-row">
+              <div className="form-group">
+                <label htmlFor="sort">Sort By</label>
+                <select
+                  id="sort"
+                  name="sort"
+                  value={searchData.sort}
+                  onChange={handleChange}
+                >
+                  <option value="best">Best match</option>
+                  <option value="departure">Earliest departure</option>
+                </select>
+              </div>
+            </div>
             <div className="form-group checkbox-group">
               <label className="checkbox-label">
                 <input
@@ -311,6 +415,16 @@ function Dashboard() {
                 />
                 <span>Women Only Rides</span>
               </label>
+              <label className="checkbox-label">
+                <input
+                  type="checkbox"
+                  id="nearbyCities"
+                  name="nearbyCities"
+                  checked={searchData.nearbyCities}
+                  onChange={handleChange}
+                />
+                <span>Include Nearby Cities (within {NEARBY_RADIUS_KM} km)</span>
+              </label>
             </div>
             <button type="submit" className="btn btn-primary btn-large" disabled={loading}>
               {loading ? 'Searching...' : 'Search Rides'}
@@ -324,7 +438,7 @@ function Dashboard() {
               <h3>Search Results</h3>
               {searchData.date && (
                 <div style={{fontSize: '1.1rem', color: 'var(--text-dark)', fontWeight: '600'}}>
-                  Date: {new Date(searchData.date).toLocaleDateString('en-IN', { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' })}
+                  {lastSearch?.dateRange ? `Around (±${lastSearch.dateRange} days): ` : 'Date: '}{new Date(searchData.date).toLocaleDateString('en-IN', { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' })}
                 </div>
               )}
             </div>
@@ -333,21 +447,76 @@ function Dashboard() {
                 <div className="empty-state-icon">🚗</div>
                 <h3>No rides found</h3>
                 <p>Try adjusting your search criteria or check back later.</p>
+                {itineraries === null && (
+                  <button 
+                    className="btn btn-secondary" 
+                    onClick={findConnectingRides}
+                    disabled={loading}
+                    style={{marginTop: '20px', marginRight: '10px'}}
+                  >
+                    {loading ? 'Searching...' : 'Find Connecting Rides'}
+                  </button>
+                )}
                 {searchData.date && (
                   <button 
                     className="btn btn-primary" 
-                    onClick={handleNextDaySearch}
+                    onClick={handleNearbyDatesSearch}
+                    disabled={loading}
                     style={{marginTop: '20px'}}
                   >
-                    Search for Next Day
+                    Search ±{NEARBY_DAYS} Days
                   </button>
                 )}
+                <button 
+                  className="btn btn-secondary" 
+                  onClick={saveSearchAlert}
+                  disabled={loading}
+                  style={{marginTop: '20px', marginLeft: '10px'}}
+                >
+                  Alert Me
+                </button>
+                {itineraries !== null && (
+                  <div style={{marginTop: '20px', textAlign: 'left'}}>
+                    {itineraries.length === 0 ? (
+                      <p>No connecting rides found either.</p>
+                    ) : (
+                      itineraries.map((itinerary, index) => (
+                        <div key={index} className="ride-card" style={{marginBottom: '15px'}}>
+                          <div className="ride-card-header">
+                            <div className="ride-creator">
+                              {itinerary.transfers === 0 ? 'Direct' : `${itinerary.transfers} transfer${itinerary.transfers > 1 ? 's' : ''}`}
+                              {' '}- arrives around {formatDateTime(itinerary.arrivesAt)}
+                            </div>
+                          </div>
+                          {itinerary.legs.map(leg => (
+                            <div key={leg.rideId} className="ride-detail-item">
+                              <div className="ride-detail-label">{leg.pickupCity} → {leg.dropCity} with {leg.publisher.name}</div>
+                              <div className="ride-detail-value">
+                                {leg.departureEstimated ? 'around ' : ''}{formatDateTime(leg.departsAt)}, ₹{(leg.costPerPerson || 0).toFixed(2)}, {leg.availableSeats} seats left
+                              </div>
+                            </div>
+                          ))}
+                          <p style={{fontSize: '0.75rem', color: 'var(--text-light)', marginBottom: 0}}>
+                            Times after a ride's starting city are estimates - confirm with the driver. Request each ride separately.
+                          </p>
+                        </div>
+                      ))
+                    )}
+                  </div>
+                )}
               </div>
             ) : (
               <>
                 <div className="results-container">
-                  {results.map(ride => (
-                    <div key={ride.id} className="ride-card">
+                  {results.map((ride, index) => (
+                    <Fragment key={ride.id}>
+                    {/* Nearby-date results are in date order - head each day */}
+                    {lastSearch?.dateRange !== undefined && (index === 0 || results[index - 1].date !== ride.date) && (
+                      <h4 style={{gridColumn: '1 / -1', margin: index === 0 ? 0 : '10px 0 0'}}>
+                        {new Date(ride.date).toLocaleDateString('en-IN', { weekday: 'long', month: 'long', day: 'numeric' })}
+                      </h4>
+                    )}
+                    <div className="ride-card">
                       <div className="ride-card-header">
                         <div className="ride-creator">{ride.publisher?.name || 'Unknown'}</div>
                       </div>
@@ -418,15 +587,28 @@ function Dashboard() {
                       </button>
                     </div>
                   </div>
+                  </Fragment>
                 ))}
                 </div>
+                {nextCursor && (
+                  <div style={{marginTop: '20px', textAlign: 'center'}}>
+                    <button 
+                      className="btn btn-secondary" 
+                      onClick={loadMoreResults}
+                      disabled={loading}
+                    >
+                      {loading ? 'Loading...' : 'Load more rides'}
+                    </button>
+                  </div>
+                )}
                 {searchData.date && (
                   <div style={{marginTop: '30px', textAlign: 'center'}}>
                     <button 
                       className="btn btn-primary btn-large" 
-                      onClick={handleNextDaySearch}
+                      onClick={handleNearbyDatesSearch}
+                      disabled={loading}
                     >
-                      Search for Next Day
+                      Search ±{NEARBY_DAYS} Days
                     </button>
                   </div>
                 )}
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useSearchParams } from 'react-router-dom'
 import Navbar from '../components/Navbar'
 import { useAuth } from '../contexts/AuthContext'
@@ -16,6 +16,9 @@ function MyRides() {
   const [selectedRide, setSelectedRide] = useState(null)
   const [showModal, setShowModal] = useState(false)
   const [chatMessages, setChatMessages] = useState([])
+  const [chatRideId, setChatRideId] = useState(null)
+  const [chatHasMore, setChatHasMore] = useState(false)
+  const chatRideIdRef = useRef(null)
   const [newMessage, setNewMessage] = useState('')
   const [loading, setLoading] = useState(false)
 
@@ -38,6 +41,78 @@ function MyRides() {
     }
   }, [])
 
+  // Live updates pushed by the server (Server-Sent Events) instead of refetching after every action
+  useEffect(() => {
+    if (!localStorage.getItem('token') || typeof EventSource === 'undefined') return
+    
+    let source = null
+    let lastEventId = null
+    let reconnectTimer = null
+    let attempts = 0
+    let closed = false
+    
+    const refreshLists = () => {
+      loadPublishedRides()
+      loadRequestedRides()
+      loadUpcomingRides()
+    }
+    const onChatMessage = (event) => {
+      const { rideId, message } = JSON.parse(event.data)
+      // Only the open chat needs the message; others load it when opened
+      if (Number(rideId) !== Number(chatRideIdRef.current)) return
+      setChatMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message])
+    }
+    const requestEvents = ['request_created', 'request_approved', 'request_rejected', 'passenger_removed', 'ride_cancelled']
+    
+    // Capped exponential backoff with jitter, never sooner than the server's Retry-After
+    const scheduleReconnect = (retryAfterMs = 0) => {
+      const backoff = Math.min(60000, 3000 * 2 ** attempts)
+      attempts += 1
+      reconnectTimer = setTimeout(connect, Math.max(retryAfterMs, backoff / 2 + Math.random() * backoff / 2))
+    }
+    
+    // The stream takes a short-lived token rather than the access JWT, so the JWT never ends up in a URL.
+    // EventSource can't see why a stream failed, so the token request also reports a full server (503 + Retry-After)
+    const connect = async () => {
+      try {
+        const { data } = await api.post('/events/token')
+        if (closed) return
+        const params = new URLSearchParams({ token: data.token })
+        if (lastEventId) params.set('lastEventId', lastEventId)
+        source = new EventSource(`${api.defaults.baseURL}/events/stream?${params}`)
+      } catch (error) {
+        if (closed) return
+        const retryAfter = Number(error.response?.headers?.['retry-after'])
+        scheduleReconnect(retryAfter > 0 ? retryAfter * 1000 : 0)
+        return
+      }
+      
+      source.onopen = () => { attempts = 0 }
+      
+      const track = (handler) => (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId
+        handler(event)
+      }
+      requestEvents.forEach(type => source.addEventListener(type, track(refreshLists)))
+      source.addEventListener('chat_message', track(onChatMessage))
+      
+      // The browser reconnects on its own after the server ends a stream; it gives up (CLOSED)
+      // when the token has expired or the server is at its stream limit (503) - back off, then fetch a new token
+      source.onerror = () => {
+        if (source.readyState !== EventSource.CLOSED) return
+        source.close()
+        scheduleReconnect()
+      }
+    }
+    connect()
+    
+    return () => {
+      closed = true
+      clearTimeout(reconnectTimer)
+      if (source) source.close()
+    }
+  }, [])
+
   const loadPublishedRides = async () => {
     try {
       const response = await api.get('/rides/my-published')
@@ -149,13 +224,46 @@ function MyRides() {
 
   const loadChatMessages = async (rideId) => {
     try {
+      // Same chat already loaded - only fetch messages newer than the last one we have
+      if (rideId === chatRideId && chatMessages.length > 0) {
+        let sinceId = chatMessages[chatMessages.length - 1].id
+        let newMessages = []
+        let hasMore = true
+        while (hasMore) {
+          const response = await api.get(`/rides/${rideId}/messages`, { params: { since_id: sinceId } })
+          newMessages = [...newMessages, ...response.data.messages]
+          hasMore = response.data.hasMore
+          if (response.data.messages.length > 0) {
+            sinceId = response.data.messages[response.data.messages.length - 1].id
+          }
+        }
+        if (newMessages.length > 0) {
+          setChatMessages(prev => [...prev, ...newMessages.filter(msg => !prev.some(m => m.id === msg.id))])
+        }
+        return
+      }
+      
       const response = await api.get(`/rides/${rideId}/messages`)
+      setChatRideId(rideId)
+      chatRideIdRef.current = rideId
       setChatMessages(response.data.messages)
+      setChatHasMore(response.data.hasMore)
     } catch (error) {
       console.error('Failed to load messages:', error)
     }
   }
 
+  const loadEarlierMessages = async (rideId) => {
+    if (chatMessages.length === 0) return
+    try {
+      const response = await api.get(`/rides/${rideId}/messages`, { params: { before_id: chatMessages[0].id } })
+      setChatMessages(prev => [...response.data.messages, ...prev])
+      setChatHasMore(response.data.hasMore)
+    } catch (error) {
+      console.error('Failed to load earlier messages:', error)
+    }
+  }
+
   const sendMessage = async (rideId) => {
     if (!newMessage.trim()) return
     
@@ -163,7 +271,7 @@ function MyRides() {
       const response = await api.post(`/rides/${rideId}/messages`, {
         message: newMessage
       })
-      setChatMessages([...chatMessages, response.data.message])
+      setChatMessages(prev => prev.some(m => m.id === response.data.message.id) ? prev : [...prev, response.data.message])
       setNewMessage('')
     } catch (error) {
       alert(error.response?.data?.error || 'Failed to send message')
@@ -197,6 +305,30 @@ function MyRides() {
     }
   }
 
+  const decideAllRequests = async (decision, rideId) => {
+    const pending = selectedRide?.pendingRequests || []
+    if (pending.length === 0) return
+    if (!window.confirm(`${decision === 'approve' ? 'Approve' : 'Reject'} all ${pending.length} pending request(s)?`)) return
+    try {
+      // One call for the whole list; approvals are taken in order while seats last
+      const response = await api.put(`/rides/${rideId}/requests`, {
+        decisions: pending.map(req => ({ requestId: req.id, decision }))
+      })
+      const failed = response.data.results.filter(result => !result.ok)
+      if (failed.length > 0) {
+        alert(`${pending.length - failed.length} done, ${failed.length} not: ${[...new Set(failed.map(result => result.error))].join(', ')}`)
+      } else {
+        alert(decision === 'approve' ? 'All requests approved!' : 'All requests rejected.')
+      }
+      await showRideDetails(rideId)
+      loadPublishedRides()
+      loadRequestedRides()
+      loadUpcomingRides()
+    } catch (error) {
+      alert(error.response?.data?.error || `Failed to ${decision} requests`)
+    }
+  }
+
   const cancelRequest = async (requestId, rideId = null) => {
     if (!window.confirm('Are you sure you want to cancel this request?')) return
     
@@ -930,6 +1062,16 @@ function MyRides() {
             {user && selectedRide.ride.publisher.id === user.id && (
               <div className="requests-section">
                 <h4>Incoming Seat Requests</h4>
+                {selectedRide.pendingRequests && selectedRide.pendingRequests.length > 1 && (
+                  <div className="request-actions" style={{marginBottom: '10px'}}>
+                    <button className="btn btn-success" onClick={() => decideAllRequests('approve', selectedRide.ride.id)}>
+                      Approve All
+                    </button>
+                    <button className="btn btn-danger" onClick={() => decideAllRequests('reject', selectedRide.ride.id)}>
+                      Reject All
+                    </button>
+                  </div>
+                )}
                 {selectedRide.pendingRequests && selectedRide.pendingRequests.length > 0 ? (
                   selectedRide.pendingRequests.map(req => (
                     <div key={req.id} className="request-item">
@@ -993,6 +1135,11 @@ function MyRides() {
             <div className="chat-section">
               <h4>In-App Chat</h4>
               <div className="chat-messages">
+                {chatHasMore && (
+                  <button className="btn btn-secondary" onClick={() => loadEarlierMessages(selectedRide.ride.id)}>
+                    Load earlier messages
+                  </button>
+                )}
                 {chatMessages.length === 0 ? (
                   <p style={{textAlign: 'center', color: 'var(--text-light)'}}>No messages yet. Start the conversation!</p>
                 ) : (
@@ -1,12 +1,22 @@
-import { useState, useEffect } from 'react'
+import { useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import Navbar from '../components/Navbar'
+import CityInput from '../components/CityInput'
 import api from '../services/api'
 import '../styles/Publish.css'
 
+const WEEKDAYS = [
+  { value: 'mon', label: 'Mon' },
+  { value: 'tue', label: 'Tue' },
+  { value: 'wed', label: 'Wed' },
+  { value: 'thu', label: 'Thu' },
+  { value: 'fri', label: 'Fri' },
+  { value: 'sat', label: 'Sat' },
+  { value: 'sun', label: 'Sun' }
+]
+
 function Publish() {
   const navigate = useNavigate()
-  const [cities, setCities] = useState([])
   const [formData, setFormData] = useState({
     pickupCity: '',
     dropCity: '',
@@ -19,18 +29,14 @@ function Publish() {
     costPerPerson: '',
     carModel: '',
     licensePlate: '',
-    womenOnly: false
+    womenOnly: false,
+    repeatWeekly: false,
+    weekdays: [],
+    endDate: ''
   })
   const [newRouteCity, setNewRouteCity] = useState('')
   const [loading, setLoading] = useState(false)
 
-  useEffect(() => {
-    // Load cities list
-    api.get('/cities')
-      .then(response => setCities(response.data.cities))
-      .catch(error => console.error('Failed to load cities:', error))
-  }, [])
-
   // Set minimum date to today
   const today = new Date().toISOString().split('T')[0]
 
@@ -42,6 +48,15 @@ function Publish() {
     })
   }
 
+  const toggleWeekday = (day) => {
+    setFormData({
+      ...formData,
+      weekdays: formData.weekdays.includes(day)
+        ? formData.weekdays.filter(d => d !== day)
+        : [...formData.weekdays, day]
+    })
+  }
+
   const handleSubmit = async (e) => {
     e.preventDefault()
     
@@ -60,24 +75,41 @@ function Publish() {
       return
     }
     
+    if (formData.repeatWeekly && formData.weekdays.length === 0) {
+      alert('Please pick the days the ride repeats on')
+      return
+    }
+    
     setLoading(true)
 
+    const ride = {
+      pickupCity: formData.pickupCity,
+      dropCity: formData.dropCity,
+      pickupAddress: formData.pickupAddress.trim(),
+      dropAddress: formData.dropAddress.trim(),
+      onRouteCities: formData.onRouteCities,
+      time: formData.time,
+      availableSeats: formData.availableSeats,
+      costPerPerson: formData.costPerPerson,
+      carModel: formData.carModel,
+      licensePlate: formData.licensePlate,
+      womenOnly: formData.womenOnly
+    }
+
     try {
-      await api.post('/rides', {
-        pickupCity: formData.pickupCity,
-        dropCity: formData.dropCity,
-        pickupAddress: formData.pickupAddress.trim(),
-        dropAddress: formData.dropAddress.trim(),
-        onRouteCities: formData.onRouteCities,
-        date: formData.date,
-        time: formData.time,
-        availableSeats: formData.availableSeats,
-        costPerPerson: formData.costPerPerson,
-        carModel: formData.carModel,
-        licensePlate: formData.licensePlate,
-        womenOnly: formData.womenOnly
-      })
-      alert('Ride published successfully!')
+      if (formData.repeatWeekly) {
+        // The server creates the upcoming rides now and the later ones as their dates come near
+        const response = await api.post('/ride-templates', {
+          ...ride,
+          startDate: formData.date,
+          endDate: formData.endDate,
+          weekdays: formData.weekdays
+        })
+        alert(`Recurring ride saved! ${response.data.rideIds.length} upcoming rides published.`)
+      } else {
+        await api.post('/rides', { ...ride, date: formData.date })
+        alert('Ride published successfully!')
+      }
       navigate('/my-rides')
     } catch (error) {
       alert(error.response?.data?.error || 'Failed to publish ride')
@@ -96,33 +128,25 @@ function Publish() {
             <div className="form-row">
               <div className="form-group">
                 <label htmlFor="pickupCity">Start City</label>
-                <select
+                <CityInput
                   id="pickupCity"
                   name="pickupCity"
                   value={formData.pickupCity}
                   onChange={handleChange}
+                  placeholder="Start typing a city"
                   required
-                >
-                  <option value="">Select Start City</option>
-                  {cities.map((city, index) => (
-                    <option key={`${city}-${index}`} value={city}>{city}</option>
-                  ))}
-                </select>
+                />
               </div>
               <div className="form-group">
                 <label htmlFor="dropCity">Destination City</label>
-                <select
+                <CityInput
                   id="dropCity"
                   name="dropCity"
                   value={formData.dropCity}
                   onChange={handleChange}
+                  placeholder="Start typing a city"
                   required
-                >
-                  <option value="">Select Destination City</option>
-                  {cities.map((city, index) => (
-                    <option key={`${city}-${index}`} value={city}>{city}</option>
-                  ))}
-                </select>
+                />
               </div>
             </div>
             <div className="form-row">
@@ -157,21 +181,21 @@ function Publish() {
                 Add cities in the order you'll be passing through them. Rides will be shown to users searching for these cities, but only if the route order is correct (pickup before drop).
               </p>
               <div style={{display: 'flex', gap: '10px', marginBottom: '10px'}}>
-                <select
+                <CityInput
                   id="newRouteCity"
+                  name="newRouteCity"
                   value={newRouteCity}
                   onChange={(e) => setNewRouteCity(e.target.value)}
+                  placeholder="Start typing a city to add"
+                  exclude={[formData.pickupCity, formData.dropCity, ...formData.onRouteCities]}
                   style={{flex: 1}}
-                >
-                  <option value="">Select a city to add</option>
-                  {cities.filter(city => city !== formData.pickupCity && city !== formData.dropCity && !formData.onRouteCities.includes(city)).map(city => (
-                    <option key={city} value={city}>{city}</option>
-                  ))}
-                </select>
+                />
                 <button
                   type="button"
                   className="btn btn-primary"
                   onClick={() => {
+                    // Only cities from the suggestions can be added
+                    if (!document.getElementById('newRouteCity').reportValidity()) return
                     if (newRouteCity && !formData.onRouteCities.includes(newRouteCity)) {
                       setFormData({...formData, onRouteCities: [...formData.onRouteCities, newRouteCity]})
                       setNewRouteCity('')
@@ -295,7 +319,7 @@ function Publish() {
             </div>
             <div className="form-row">
               <div className="form-group">
-                <label htmlFor="date">Date</label>
+                <label htmlFor="date">{formData.repeatWeekly ? 'First Date' : 'Date'}</label>
                 <input
                   type="date"
                   id="date"
@@ -318,6 +342,50 @@ function Publish() {
                 />
               </div>
             </div>
+            <div className="form-group checkbox-group">
+              <label className="checkbox-label">
+                <input
+                  type="checkbox"
+                  id="repeatWeekly"
+                  name="repeatWeekly"
+                  checked={formData.repeatWeekly}
+                  onChange={handleChange}
+                />
+                <span>Repeat Weekly</span>
+              </label>
+            </div>
+            {formData.repeatWeekly && (
+              <div className="form-row">
+                <div className="form-group">
+                  <label>Repeat On</label>
+                  <div style={{display: 'flex', gap: '6px', flexWrap: 'wrap'}}>
+                    {WEEKDAYS.map(day => (
+                      <button
+                        key={day.value}
+                        type="button"
+                        className={formData.weekdays.includes(day.value) ? 'btn btn-primary' : 'btn btn-secondary'}
+                        onClick={() => toggleWeekday(day.value)}
+                        style={{padding: '6px 10px'}}
+                      >
+                        {day.label}
+                      </button>
+                    ))}
+                  </div>
+                </div>
+                <div className="form-group">
+                  <label htmlFor="endDate">Until</label>
+                  <input
+                    type="date"
+                    id="endDate"
+                    name="endDate"
+                    value={formData.endDate}
+                    onChange={handleChange}
+                    min={formData.date || today}
+                    required
+                  />
+                </div>
+              </div>
+            )}
             <div className="form-row">
               <div className="form-group">
                 <label htmlFor="availableSeats">Available Seats</label>
@@ -387,7 +455,7 @@ function Publish() {
               </label>
             </div>
             <button type="submit" className="btn btn-primary btn-large" disabled={loading}>
-              {loading ? 'Publishing...' : 'Publish Ride'}
+              {loading ? 'Publishing...' : formData.repeatWeekly ? 'Publish Recurring Ride' : 'Publish Ride'}
             </button>
           </form>
         </div>